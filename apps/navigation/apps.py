@@ -1,6 +1,13 @@
-# from django.apps import AppConfig
+from django.apps import AppConfig
 
 
-# class NavigationConfig(AppConfig):
-#     default_auto_field = 'django.db.models.BigAutoField'
-#     name = 'apps.navigation'
+class NavigationConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.navigation'
+
+    def ready(self):
+        # register signal handlers (spatial index sync)
+        from . import signals  # noqa: F401
+        # read the gazetteer now rather than on the first broadcast
+        from .geocoder import load_geocoder
+        load_geocoder()
@@ -0,0 +1,140 @@
+"""
+apps/navigation/backfill.py
+
+Bulk upload of positions a driver buffered while offline.
+
+The body is NDJSON (optionally gzip-compressed), one point per line:
+    {"ts": 1760000000.5, "lat": 23.81, "lng": 90.41, "speed": 4.2, "heading": 87}
+`ts` is epoch seconds or milliseconds. The body is decompressed and parsed
+line by line from the request stream, points are deduplicated (within the
+upload and against rows already stored for the driver, at millisecond
+resolution) and inserted in chunks. Decompressed size and point count are
+capped so a small gzip body cannot expand without bound. The driver's daily
+rollups are rebuilt over the days the upload touched.
+"""
+import gzip
+import json
+import math
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+
+from . import rollups
+from .history import HISTORY_BATCH_SIZE, get_store, store_backfill
+
+BACKFILL_MAX_BYTES = getattr(settings, 'NAVIGATION_BACKFILL_MAX_BYTES', 20 * 1024 * 1024)
+BACKFILL_MAX_POINTS = getattr(settings, 'NAVIGATION_BACKFILL_MAX_POINTS', 50000)
+MAX_FUTURE_SECONDS = 300  # client clocks may run a little ahead, not more
+MAX_LINE_BYTES = 4096
+
+
+class BackfillError(ValueError):
+    """The upload as a whole is unusable (bad gzip, too large, too many points)."""
+
+
+def parse_point(line):
+    """One NDJSON line -> (ts, lat, lng, speed, heading) or None if invalid."""
+    try:
+        data = json.loads(line)
+        ts = float(data['ts'])
+        lat, lng = float(data['lat']), float(data['lng'])
+    except (ValueError, TypeError, KeyError):
+        return None
+    if ts > 1e11:
+        ts /= 1000.0
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180) or not 0 < ts <= time.time() + MAX_FUTURE_SECONDS:
+        return None
+    speed, heading = data.get('speed'), data.get('heading')
+    speed = float(speed) if isinstance(speed, (int, float)) and math.isfinite(speed) else None
+    heading = float(heading) % 360 if isinstance(heading, (int, float)) and math.isfinite(heading) else None
+    return ts, lat, lng, speed, heading
+
+
+def iter_lines(stream, compressed, max_bytes=BACKFILL_MAX_BYTES):
+    """Non-empty lines of the (decompressed) body, enforcing the size cap; a missing body has none."""
+    if stream is None:  # DRF leaves request.stream unset for an empty or length-less body
+        return
+    source = gzip.GzipFile(fileobj=stream, mode='rb') if compressed else stream
+    total = 0
+    try:
+        while True:
+            line = source.readline(MAX_LINE_BYTES + 1)
+            if not line:
+                return
+            total += len(line)
+            if total > max_bytes:
+                raise BackfillError(f"Body larger than {max_bytes} bytes once decompressed.")
+            if len(line) > MAX_LINE_BYTES:
+                raise BackfillError("Line too long.")
+            line = line.strip()
+            if line:
+                yield line
+    except (OSError, EOFError) as e:  # gzip.BadGzipFile is an OSError
+        raise BackfillError(f"Invalid gzip body: {e}")
+
+
+def _ms(ts):
+    return int(round(ts * 1000))
+
+
+def _chunks(points, size):
+    chunk = []
+    for point in points:
+        chunk.append(point)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def ingest(driver_id, team_id, stream, compressed=True, chunk_size=HISTORY_BATCH_SIZE):
+    """
+    Parse, dedupe and write a backfill body to the history store, then rebuild the driver's rollups
+    from the first touched day through the day of the next stored fix.
+    Returns {"received", "inserted", "duplicates", "invalid", "latest"}; latest is the newest
+    inserted (ts, lat, lng, speed, heading) or None.
+    """
+    store = get_store()
+    stats = {"received": 0, "inserted": 0, "duplicates": 0, "invalid": 0, "latest": None}
+    seen = set()
+
+    def points():
+        for line in iter_lines(stream, compressed):
+            stats['received'] += 1
+            if stats['received'] > BACKFILL_MAX_POINTS:
+                raise BackfillError(f"At most {BACKFILL_MAX_POINTS} points per upload.")
+            point = parse_point(line)
+            if point is None:
+                stats['invalid'] += 1
+                continue
+            if _ms(point[0]) in seen:
+                stats['duplicates'] += 1
+                continue
+            seen.add(_ms(point[0]))
+            yield point
+
+    span = None  # (oldest, newest) inserted ts
+    for chunk in _chunks(points(), chunk_size):
+        low = datetime.fromtimestamp(min(p[0] for p in chunk) - 0.001, tz=dt_timezone.utc)
+        high = datetime.fromtimestamp(max(p[0] for p in chunk) + 0.001, tz=dt_timezone.utc)
+        stored = {_ms(row[5].timestamp()) for row in store.scan(driver_id=driver_id, start=low, end=high)}
+        fresh = [p for p in chunk if _ms(p[0]) not in stored]
+        stats['duplicates'] += len(chunk) - len(fresh)
+        stats['inserted'] += len(fresh)
+        if fresh:
+            store_backfill([(driver_id, team_id, lat, lng, speed, heading, _ms(ts) / 1000.0)
+                            for ts, lat, lng, speed, heading in fresh])
+            newest = max(fresh, key=lambda p: p[0])
+            if stats['latest'] is None or newest[0] > stats['latest'][0]:
+                stats['latest'] = newest
+            oldest = min(p[0] for p in fresh)
+            span = (min(span[0], oldest), max(span[1], newest[0])) if span else (oldest, newest[0])
+    if span is not None:
+        # the fix after the upload now follows one of its points, so its day changes too
+        after = datetime.fromtimestamp(span[1] + 0.001, tz=dt_timezone.utc)
+        following = next(iter(store.scan(driver_id=driver_id, start=after)), None)
+        last = following[5].timestamp() if following is not None else span[1]
+        rollups.rebuild(rollups.local_day(span[0]), rollups.local_day(last), driver_id=driver_id)
+    return stats
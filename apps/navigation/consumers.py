@@ -1,10 +1,32 @@
+import asyncio
 import json
+import math
+import time
+from channels.generic.http import AsyncHttpConsumer
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from channels.exceptions import StopConsumer
 from django.contrib.auth import get_user_model
 
+from . import corridor, escorts, eta, geocoder, history, presence, tracking
+from .fleet import fleet
+from .matching import get_online_matcher
+from .roadgraph import get_road_graph
+from .reporting import policy as reporting
+from .smoothing import ACCEPTED, location_filter, valid_position
+from .outbox import SendQueue
+
 User = get_user_model()
 
+
+def fix_timestamp(data):
+    """Client fix time in epoch seconds (accepts seconds or milliseconds), None if absent."""
+    ts = data.get('ts')
+    if not isinstance(ts, (int, float)) or not math.isfinite(ts) or ts <= 0:
+        return None
+    return ts / 1000.0 if ts > 1e11 else float(ts)
+
+
 class DriverConsumer(AsyncWebsocketConsumer):
     """WebSocket Consumer for real-time driver location tracking."""
     
@@ -32,26 +54,57 @@ class DriverConsumer(AsyncWebsocketConsumer):
         # Accept the WebSocket connection
         await self.accept()
         
+        # Bounded outbound queue for group broadcasts, drained by a writer task
+        self.outbox = SendQueue()
+        self.outbox_writer = asyncio.ensure_future(self.drain_outbox())
+        self.reroute_task = None
+        
+        # Drivers this connection is watching as a dispatcher/viewer
+        self.watching = set()
+        
         print(f"[WS] Connected - User {self.user.email} ({self.user.id})")
         
+        # Presence: mark online and make sure the expiry loop is running
+        self.team_id = await database_sync_to_async(presence.team_id_for_user)(self.user.id)
+        presence.tracker.connect(self.user.id, self.team_id)
+        fleet.acquire(self.user.id, self.team_id)
+        presence.ensure_presence_loop(self.channel_layer)
+        escorts.ensure_escort_loop()
+        history.ensure_history_loop()
+        await self.load_route()
+        
         # Send initialization message to client
         await self.send(text_data=json.dumps({
             "type": "connection_established",
             "message": "Connected. Please send your location with type='initialize_location'.",
             "user_id": self.user.id,
-            "email": self.user.email
+            "email": self.user.email,
+            "heartbeat_interval": presence.tracker.timeout / 3,
+            "reporting_interval": reporting.current(self.user.id)
         }))
 
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection."""
         print(f"[WS Disconnect] User: {self.user}, Code: {close_code}")
         
+        # Rejected before joining a group
+        if not hasattr(self, 'room_group_name'):
+            return
+        
+        if hasattr(self, 'outbox_writer'):
+            self.outbox_writer.cancel()
+        if getattr(self, 'reroute_task', None) is not None:
+            self.reroute_task.cancel()
+        
         # Remove from group
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
         
+        for driver_id in list(self.watching):
+            await self.unwatch_driver(driver_id)
+        
         # Mark user as offline (optional)
         await self.update_user_offline()
 
@@ -66,6 +119,36 @@ class DriverConsumer(AsyncWebsocketConsumer):
         
         message_type = data.get('type')
         
+        # Any frame from the driver counts as a heartbeat
+        presence.tracker.touch(self.user.id)
+        
+        if message_type == 'heartbeat':
+            await self.send(text_data=json.dumps({"type": "heartbeat_ack"}))
+            return
+        
+        if message_type == 'queue_stats':
+            await self.send(text_data=json.dumps({"type": "queue_stats", **self.outbox.stats()}))
+            return
+        
+        if message_type in ('watch', 'unwatch'):
+            driver_id = data.get('driver_id')
+            if not isinstance(driver_id, int) or driver_id == self.user.id:
+                await self.send(text_data=json.dumps({
+                    "status": "error",
+                    "message": "driver_id must be another driver's id"
+                }))
+                return
+            if message_type == 'unwatch':
+                await self.unwatch_driver(driver_id)
+            elif not await self.can_watch(driver_id):
+                await self.send(text_data=json.dumps({
+                    "status": "error",
+                    "message": "Not allowed to watch this driver"
+                }))
+            else:
+                await self.watch_driver(driver_id)
+            return
+        
         # Initialize location on first connect
         if message_type == 'initialize_location':
             lat = data.get('lat')
@@ -80,8 +163,28 @@ class DriverConsumer(AsyncWebsocketConsumer):
                 }))
                 return
             
+            try:
+                lat, lng = float(lat), float(lng)
+            except (TypeError, ValueError):
+                await self.send(text_data=json.dumps({
+                    "status": "error",
+                    "message": "lat and lng must be numbers"
+                }))
+                return
+            if not valid_position(lat, lng):
+                await self.send(text_data=json.dumps({
+                    "status": "error",
+                    "message": "lat must be within -90..90 and lng within -180..180"
+                }))
+                return
+            
+            # Trusted starting fix for the smoothing filter
+            ts = fix_timestamp(data)
+            location_filter.reset(self.user.id, lat, lng, ts)
+            
             # Update location in database
             await self.update_user_location(lat, lng)
+            await self.observe_motion(lat, lng, ts)
             
             # Send confirmation
             await self.send(text_data=json.dumps({
@@ -105,8 +208,47 @@ class DriverConsumer(AsyncWebsocketConsumer):
                 }))
                 return
             
+            try:
+                lat, lng = float(lat), float(lng)
+            except (TypeError, ValueError):
+                await self.send(text_data=json.dumps({
+                    "status": "error",
+                    "message": "lat and lng must be numbers"
+                }))
+                return
+            if not valid_position(lat, lng):
+                await self.send(text_data=json.dumps({
+                    "status": "error",
+                    "message": "lat must be within -90..90 and lng within -180..180"
+                }))
+                return
+            
+            # Smooth the fix; jitter and implausible jumps are neither written nor broadcast
+            ts = fix_timestamp(data)
+            verdict, lat, lng = location_filter.update(
+                self.user.id, lat, lng, ts=ts, accuracy=data.get('accuracy')
+            )
+            if verdict != ACCEPTED:
+                print(f"[WS] Fix {verdict}: lat={lat}, lng={lng}")
+                return
+            
             # Update location
             await self.update_user_location(lat, lng)
+            await self.observe_motion(lat, lng, ts)
+            
+            # Corridor check against the active route assignment
+            deviation = corridor.monitor.check(self.user.id, lat, lng)
+            if deviation is not None:
+                await self.channel_layer.group_send(self.room_group_name, deviation)
+            
+            # Incremental ETA along the assigned route; reroute in the background on deviation
+            estimate, reroute = eta.engine.update(self.user.id, lat, lng, ts or time.time())
+            if reroute and (self.reroute_task is None or self.reroute_task.done()):
+                self.reroute_task = asyncio.ensure_future(self.reroute(lat, lng, ts or time.time()))
+            
+            # Snap to the road network when a local road graph is configured (path searches, off the loop)
+            matcher = get_online_matcher()
+            snapped = await database_sync_to_async(matcher.update)(self.user.id, lat, lng) if matcher else None
             
             # Broadcast to all users in this driver's group
             await self.channel_layer.group_send(
@@ -115,6 +257,9 @@ class DriverConsumer(AsyncWebsocketConsumer):
                     'type': 'location_update',
                     'lat': lat,
                     'lng': lng,
+                    'snapped': {"lat": snapped[0], "lng": snapped[1], "edge": snapped[2]} if snapped else None,
+                    'place': geocoder.describe(lat, lng),
+                    'eta': estimate,
                     'user_id': self.user.id,
                     'email': self.user.email
                 }
@@ -126,15 +271,132 @@ class DriverConsumer(AsyncWebsocketConsumer):
                 "error": f"Unknown message type: {message_type}"
             }))
 
+    async def observe_motion(self, lat, lng, ts=None):
+        """Update motion state, the fleet table, history and escort gaps; push a new reporting interval if it changed."""
+        interval = reporting.observe(self.user.id, lat, lng, ts)
+        motion = reporting.states.get(self.user.id)
+        fleet.update(self.user.id, lat, lng, ts, speed=motion.speed, heading=motion.heading)
+        history.record(self.user.id, self.team_id, lat, lng, ts, speed=motion.speed, heading=motion.heading)
+        await escorts.check_driver(self.channel_layer, self.user.id)
+        if interval is not None:
+            await self.send(text_data=json.dumps({"type": "reporting_interval", "interval": interval}))
+
+    async def watch_driver(self, driver_id):
+        """Join a driver's group as a viewer; the driver speeds up while watched."""
+        if driver_id in self.watching:
+            return
+        self.watching.add(driver_id)
+        await self.channel_layer.group_add(f'driver_{driver_id}', self.channel_name)
+        await self.push_interval(driver_id, reporting.watch(driver_id))
+        await self.send(text_data=json.dumps({"type": "watching", "driver_id": driver_id}))
+
+    async def unwatch_driver(self, driver_id):
+        if driver_id not in self.watching:
+            return
+        self.watching.discard(driver_id)
+        await self.channel_layer.group_discard(f'driver_{driver_id}', self.channel_name)
+        await self.push_interval(driver_id, reporting.unwatch(driver_id))
+
+    async def push_interval(self, driver_id, interval):
+        if interval is None:
+            return
+        await self.channel_layer.group_send(f'driver_{driver_id}', {
+            'type': 'reporting_interval',
+            'user_id': driver_id,
+            'interval': interval,
+        })
+
+    async def reporting_interval(self, event):
+        """Deliver a recommended reporting interval to the driver's own socket only."""
+        if event['user_id'] != self.user.id:
+            return
+        await self.send(text_data=json.dumps({"type": "reporting_interval", "interval": event['interval']}))
+
+    async def load_route(self):
+        """(Re)load the driver's active route corridor."""
+        active = await database_sync_to_async(corridor.load_assignment)(self.user.id)
+        if active is None:
+            corridor.monitor.clear(self.user.id)
+            eta.engine.clear(self.user.id)
+            if get_online_matcher():
+                get_online_matcher().forget(self.user.id)
+        else:
+            corridor.monitor.assign(self.user.id, *active)
+            profile = await database_sync_to_async(eta.TripProfile.build)(active[1])
+            eta.engine.assign(self.user.id, active[0], profile)
+
+    async def reroute(self, lat, lng, ts):
+        """Recompute the ETA path from an off-route position (road graph only)."""
+        graph = get_road_graph()
+        if graph is None:
+            return
+        try:
+            planned = await database_sync_to_async(eta.engine.plan_reroute)(self.user.id, lat, lng, ts, graph)
+        except Exception as e:
+            print(f"[ETA] Reroute failed for user {self.user.id}: {type(e).__name__}: {e}")
+            return
+        if planned is not None:
+            eta.engine.adopt_reroute(self.user.id, *planned)
+
+    async def assignment_changed(self, event):
+        """Assignment created/completed over HTTP; only the driver's own socket reloads."""
+        if event['user_id'] == self.user.id:
+            await self.load_route()
+
+    async def route_deviation(self, event):
+        """Broadcast deviation/return events to the driver and viewers."""
+        await self.enqueue({k: v for k, v in event.items() if k != 'type'} | {"type": "route_deviation"})
+
+    async def escort_alert(self, event):
+        """Deliver an escort gap alert to the team owner's own socket."""
+        if event['owner_id'] != self.user.id:
+            return
+        await self.send(text_data=json.dumps({k: v for k, v in event.items() if k != 'owner_id'}))
+
+    @database_sync_to_async
+    def can_watch(self, driver_id):
+        """Staff, or a member of the same team as the driver."""
+        if self.user.is_staff:
+            return True
+        team_id = presence.team_id_for_user(driver_id)
+        return team_id is not None and team_id == presence.team_id_for_user(self.user.id)
+
+    async def drain_outbox(self):
+        """Writer task: send queued frames one by one."""
+        while True:
+            text = await self.outbox.get()
+            await self.send(text_data=text)
+            self.outbox.sent += 1
+
+    async def enqueue(self, payload, key=None):
+        """Queue a broadcast frame; disconnect viewers that stay saturated."""
+        self.outbox.put(json.dumps(payload), key=key)
+        if self.outbox.is_stalled():
+            print(f"[WS] Send queue saturated for user {self.user.id}: {self.outbox.stats()}")
+            await self.close(code=4008)
+
     async def location_update(self, event):
         """Broadcast location update to group."""
-        await self.send(text_data=json.dumps({
+        # A newer position of the same driver supersedes a queued one
+        await self.enqueue({
             "type": "location_update",
             "user_id": event['user_id'],
             "email": event['email'],
             "lat": event['lat'],
-            "lng": event['lng']
-        }))
+            "lng": event['lng'],
+            "snapped": event.get('snapped'),
+            "place": event.get('place'),
+            "eta": event.get('eta')
+        }, key=('location', event['user_id']))
+
+    async def presence_update(self, event):
+        """Broadcast presence transition to group."""
+        await self.enqueue({
+            "type": "presence_update",
+            "user_id": event['user_id'],
+            "online": event['online'],
+            "last_seen": event['last_seen']
+        }, key=('presence', event['user_id']))
 
     @database_sync_to_async
     def update_user_location(self, lat, lng):
@@ -162,11 +424,110 @@ class DriverConsumer(AsyncWebsocketConsumer):
             import traceback
             traceback.print_exc()
 
-    @database_sync_to_async
-    def update_user_offline(self):
-        """Mark user as offline (optional)."""
-        try:
-            user = User.objects.get(id=self.user.id)
-            print(f"[Offline] User {user.email} disconnected")
-        except User.DoesNotExist:
-            print(f"[Offline] User not found: {self.user.id}")
\ No newline at end of file
+    async def update_user_offline(self):
+        """Mark user as offline; the transition is persisted and broadcast by the presence loop."""
+        # another socket of the same driver (which may have missed heartbeats) keeps the live state
+        if presence.tracker.disconnect(self.user.id):
+            reporting.forget(self.user.id)
+            location_filter.forget(self.user.id)
+            fleet.release(self.user.id)
+            corridor.monitor.clear(self.user.id)
+            eta.engine.clear(self.user.id)
+            if get_online_matcher():
+                get_online_matcher().forget(self.user.id)
+        print(f"[Offline] User {self.user.email} disconnected (online: {presence.tracker.is_online(self.user.id)})")
+
+
+class TrackingStreamConsumer(AsyncHttpConsumer):
+    """Read-only Server-Sent Events stream of one driver or delivery, opened with a share token."""
+
+    async def http_request(self, message):
+        """Keep the response open after handle(); only a rejected request ends here."""
+        if message.get("more_body"):
+            return
+        await self.handle(b"")
+        if not hasattr(self, 'group_name'):
+            raise StopConsumer()
+
+    async def handle(self, body):
+        shared = tracking.read_token(self.scope['url_route']['kwargs']['token'])
+        if self.scope['method'] != 'GET' or shared is None:
+            await self.send_response(404, b'{"error": "Unknown or expired tracking link"}',
+                                     headers=[(b"Content-Type", b"application/json")])
+            return
+        self.driver_id, self.assignment_id = shared
+        state = await database_sync_to_async(tracking.snapshot)(self.driver_id, self.assignment_id)
+        if state['assignment'] is not None and not state['assignment']['active']:
+            await self.send_response(410, b'{"error": "Delivery is complete"}',
+                                     headers=[(b"Content-Type", b"application/json")])
+            return
+        self.group_name = f'driver_{self.driver_id}'
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.send_headers(headers=[
+            (b"Content-Type", b"text/event-stream"),
+            (b"Cache-Control", b"no-cache"),
+            (b"X-Accel-Buffering", b"no"),
+        ])
+        await self.send_body(f"retry: {tracking.TRACKING_RETRY_MS}\n\n".encode() + tracking.frame("snapshot", state),
+                             more_body=True)
+        tracking.streams.add(self)
+        tracking.ensure_keepalive_loop()
+        await self.push_interval(reporting.watch(self.driver_id))
+
+    async def disconnect(self):
+        if not hasattr(self, 'group_name'):
+            return
+        tracking.streams.discard(self)
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        await self.push_interval(reporting.unwatch(self.driver_id))
+        del self.group_name
+
+    async def push_interval(self, interval):
+        """The driver reports faster while watched, as for WebSocket viewers."""
+        if interval is None:
+            return
+        await self.channel_layer.group_send(self.group_name, {
+            'type': 'reporting_interval',
+            'user_id': self.driver_id,
+            'interval': interval,
+        })
+
+    async def location_update(self, event):
+        estimate = event.get('eta')
+        if estimate is not None and self.assignment_id not in (None, estimate['assignment_id']):
+            estimate = None
+        await self.send_body(tracking.frame("location", {
+            "lat": event['lat'],
+            "lng": event['lng'],
+            "snapped": event.get('snapped'),
+            "place": event.get('place'),
+            "eta": estimate,
+        }), more_body=True)
+
+    async def presence_update(self, event):
+        await self.send_body(tracking.frame("presence", {
+            "online": event['online'],
+            "last_seen": event['last_seen'],
+        }), more_body=True)
+
+    async def assignment_changed(self, event):
+        """A delivery stream ends when its assignment is completed or replaced."""
+        if self.assignment_id is None:
+            return
+        from .models import RouteAssignment
+        active = await database_sync_to_async(
+            RouteAssignment.objects.filter(id=self.assignment_id, is_active=True).exists)()
+        if active:
+            return
+        await self.send_body(tracking.frame("end", {"assignment_id": self.assignment_id}))
+        await self.disconnect()
+        raise StopConsumer()
+
+    async def reporting_interval(self, event):
+        pass
+
+    async def route_deviation(self, event):
+        pass
+
+    async def escort_alert(self, event):
+        pass
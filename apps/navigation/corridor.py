@@ -0,0 +1,149 @@
+"""
+apps/navigation/corridor.py
+
+Route-deviation detection against a planned polyline.
+
+- RouteCorridor: the route projected to metres, densified so no segment is
+  longer than half the corridor width, with a KD-tree over the vertices.
+  A distance-to-route check is one O(log n) nearest-vertex lookup plus an
+  exact test against the few segments touching the nearest vertices.
+- DeviationMonitor: active assignment per driver, emits 'deviated' and
+  'returned' transitions (with hysteresis) for the driver's channel group.
+"""
+import math
+
+import numpy as np
+from django.conf import settings
+
+from .geo import decode_polyline, point_segment_distance, project
+from .spatial import KDTree
+
+
+DEFAULT_CORRIDOR_M = getattr(settings, 'NAVIGATION_CORRIDOR_M', 100)
+DEVIATION_CONFIRM_FIXES = getattr(settings, 'NAVIGATION_DEVIATION_CONFIRM_FIXES', 2)
+RETURN_RATIO = 0.8  # back on route below 80% of the corridor width
+
+
+class RouteCorridor:
+    """Planned route with O(log n) distance and along-route position queries."""
+
+    def __init__(self, coords, corridor_m=DEFAULT_CORRIDOR_M):
+        coords = np.asarray(coords, dtype=np.float64)
+        if coords.ndim != 2 or len(coords) < 2:
+            raise ValueError("A route needs at least two points.")
+        self.corridor_m = corridor_m
+        self.lat0 = float(coords[:, 0].mean())
+        x, y = project(coords[:, 0], coords[:, 1], self.lat0)
+        x, y = self._densify(x, y, max(corridor_m / 2.0, 5.0))
+        self.x, self.y = x, y
+        seg = np.hypot(np.diff(x), np.diff(y))
+        self.cumulative = np.concatenate(([0.0], np.cumsum(seg)))  # metres from start at each vertex
+        self.length_m = float(self.cumulative[-1])
+        self.tree = KDTree(x, y)
+
+    @staticmethod
+    def _densify(x, y, max_len):
+        xs, ys = [x[:1]], [y[:1]]
+        for i in range(len(x) - 1):
+            length = math.hypot(x[i + 1] - x[i], y[i + 1] - y[i])
+            pieces = max(1, int(math.ceil(length / max_len)))
+            t = np.arange(1, pieces + 1) / pieces
+            xs.append(x[i] + t * (x[i + 1] - x[i]))
+            ys.append(y[i] + t * (y[i + 1] - y[i]))
+        return np.concatenate(xs), np.concatenate(ys)
+
+    @classmethod
+    def from_polyline(cls, text, corridor_m=DEFAULT_CORRIDOR_M):
+        return cls(decode_polyline(text), corridor_m)
+
+    def locate(self, lat, lng, k=4):
+        """(distance_m, along_m, segment) of the closest point on the route."""
+        px, py = project(lat, lng, self.lat0)
+        _, vertices = self.tree.query(float(px), float(py), k=min(k, len(self.x)))
+        segments = np.unique(np.clip(np.concatenate((vertices - 1, vertices)), 0, len(self.x) - 2))
+        distance, t = point_segment_distance(
+            px, py, self.x[segments], self.y[segments], self.x[segments + 1], self.y[segments + 1]
+        )
+        best = int(np.argmin(distance))
+        segment = int(segments[best])
+        along = self.cumulative[segment] + t[best] * (self.cumulative[segment + 1] - self.cumulative[segment])
+        return float(distance[best]), float(along), segment
+
+    def distance_m(self, lat, lng):
+        return self.locate(lat, lng)[0]
+
+
+class ActiveRoute:
+    """Per-driver deviation state for one assignment."""
+    __slots__ = ('assignment_id', 'corridor', 'off_route', 'strikes', 'last_distance')
+
+    def __init__(self, assignment_id, corridor):
+        self.assignment_id = assignment_id
+        self.corridor = corridor
+        self.off_route = False
+        self.strikes = 0
+        self.last_distance = None
+
+
+class DeviationMonitor:
+    """Active route corridors keyed by driver id."""
+
+    def __init__(self):
+        self.routes = {}  # driver_id -> ActiveRoute
+
+    def assign(self, driver_id, assignment_id, corridor):
+        self.routes[driver_id] = ActiveRoute(assignment_id, corridor)
+
+    def clear(self, driver_id):
+        self.routes.pop(driver_id, None)
+
+    def get(self, driver_id):
+        return self.routes.get(driver_id)
+
+    def check(self, driver_id, lat, lng):
+        """Feed an accepted fix; return an event dict on deviation/return, else None."""
+        route = self.routes.get(driver_id)
+        if route is None:
+            return None
+        distance = route.corridor.distance_m(lat, lng)
+        route.last_distance = distance
+        limit = route.corridor.corridor_m
+        if not route.off_route:
+            route.strikes = route.strikes + 1 if distance > limit else 0
+            if route.strikes < DEVIATION_CONFIRM_FIXES:
+                return None
+            route.off_route, route.strikes = True, 0
+            state = 'deviated'
+        else:
+            if distance > limit * RETURN_RATIO:
+                return None
+            route.off_route = False
+            state = 'returned'
+        return {
+            'type': 'route_deviation',
+            'state': state,
+            'user_id': driver_id,
+            'assignment_id': route.assignment_id,
+            'distance_m': round(distance, 1),
+            'corridor_m': limit,
+        }
+
+
+monitor = DeviationMonitor()
+
+
+def load_assignment(driver_id):
+    """Build the corridor for the driver's active assignment (or None)."""
+    from .models import RouteAssignment
+
+    assignment = (RouteAssignment.objects
+                  .filter(driver_id=driver_id, is_active=True)
+                  .only('id', 'polyline', 'corridor_m')
+                  .order_by('-created_at').first())
+    if assignment is None:
+        return None
+    try:
+        return assignment.id, RouteCorridor.from_polyline(assignment.polyline, assignment.corridor_m)
+    except (ValueError, IndexError) as e:
+        print(f"[Route] Bad polyline on assignment {assignment.id}: {e}")
+        return None
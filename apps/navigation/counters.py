@@ -0,0 +1,28 @@
+"""
+apps/navigation/counters.py
+
+Additive counter tables (heatmap dwell cells, daily mileage rollups).
+
+A batch of increments is summed in memory first and then applied with one
+INSERT ... ON CONFLICT DO UPDATE SET col = col + excluded.col per key, in a
+single transaction (SQLite 3.24+ and PostgreSQL share the syntax). The key
+fields must match a unique constraint on the model.
+"""
+from django.db import connection, transaction
+
+
+def add_to_counters(model, key_fields, value_fields, increments):
+    """increments: {key tuple (in key_fields order): values (in value_fields order)}."""
+    if not increments:
+        return
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    keys = [quote(model._meta.get_field(name).column) for name in key_fields]
+    values = [quote(model._meta.get_field(name).column) for name in value_fields]
+    sql = (
+        f"INSERT INTO {table} ({', '.join(keys + values)}) VALUES ({', '.join(['%s'] * (len(keys) + len(values)))}) "
+        f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET "
+        + ', '.join(f"{v} = {table}.{v} + excluded.{v}" for v in values)
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, [tuple(key) + tuple(value) for key, value in increments.items()])
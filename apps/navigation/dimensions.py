@@ -0,0 +1,79 @@
+"""
+apps/navigation/dimensions.py
+
+Parse the free-text OversizedLoadDetail.dimensions into metres.
+
+Handles the shapes seen in practice:
+    "12 x 3.5 x 4.6", "12m x 3.5m x 4.6m", "1200x350x460 cm",
+    "40ft x 12ft x 14ft 6in", "40' x 12' x 14'6\"",
+    "L: 12m, W: 3.5m, H: 4.6m", "height 4.8 m; width 3.2 m"
+Labelled parts go to their slot, the rest fill length, width, height in
+order. A unit written once at the end applies to every bare number; no unit
+at all means metres.
+"""
+import re
+
+UNITS = {
+    'm': 1.0, 'meter': 1.0, 'meters': 1.0, 'metre': 1.0, 'metres': 1.0,
+    'cm': 0.01, 'mm': 0.001,
+    'ft': 0.3048, 'foot': 0.3048, 'feet': 0.3048, "'": 0.3048,
+    'in': 0.0254, 'inch': 0.0254, 'inches': 0.0254, '"': 0.0254,
+}
+UNIT_NAMES = {'meter': 'm', 'meters': 'm', 'metre': 'm', 'metres': 'm', 'foot': 'ft', 'feet': 'ft',
+              "'": 'ft', 'inch': 'in', 'inches': 'in', '"': 'in'}
+LABELS = (
+    ('length_m', re.compile(r'\b(?:length|len|long|l)\b')),
+    ('width_m', re.compile(r'\b(?:width|wide|w)\b')),
+    ('height_m', re.compile(r'\b(?:height|high|tall|h)\b')),
+)
+SLOTS = ('length_m', 'width_m', 'height_m')
+MAX_M = 100.0  # anything longer is a typo, not a load
+
+_UNIT = r"(meters?|metres?|mm|cm|m|feet|foot|ft|inch(?:es)?|in|'|\")"
+QUANTITY = re.compile(
+    r'(\d+(?:[.,]\d+)?)\s*' + _UNIT + r'?'
+    r"(?:\s*(\d+(?:[.,]\d+)?)\s*(inch(?:es)?|in|\"))?"
+)
+SPLIT = re.compile(r'\s*(?:[x×*,;/|]|\bby\b)\s*')
+
+
+def _number(text):
+    return float(text.replace(',', '.'))
+
+
+def parse_dimensions(text):
+    """
+    -> {"length_m", "width_m", "height_m", "dimension_unit"}; missing values are None.
+    dimension_unit is the unit as written ('m', 'cm', 'mm', 'ft', 'in') or '' if none.
+    """
+    result = {slot: None for slot in SLOTS}
+    result['dimension_unit'] = ''
+    if not text:
+        return result
+    text = text.lower().replace('’', "'").replace('”', '"')
+    # decimal commas ("4,5 m") would be read as separators otherwise
+    text = re.sub(r'(\d),(\d)(?!\d)', r'\1.\2', text)
+
+    parts = []
+    for part in SPLIT.split(text):
+        match = QUANTITY.search(part)
+        if match is None:
+            continue
+        label = next((slot for slot, pattern in LABELS if pattern.search(part[:match.start()] + ' ' + part[match.end():])), None)
+        parts.append((label, match))
+    if not parts:
+        return result
+
+    written_units = [m.group(2) for _, m in parts if m.group(2)]
+    default_unit = written_units[-1] if written_units else 'm'
+    result['dimension_unit'] = UNIT_NAMES.get(default_unit, default_unit) if written_units else ''
+
+    free = [slot for slot in SLOTS if not any(label == slot for label, _ in parts)]
+    for label, match in parts:
+        value = _number(match.group(1)) * UNITS[match.group(2) or default_unit]
+        if match.group(3):
+            value += _number(match.group(3)) * UNITS[match.group(4)]
+        slot = label if label and result[label] is None else (free.pop(0) if free else None)
+        if slot is not None and 0 < value <= MAX_M:
+            result[slot] = round(value, 3)
+    return result
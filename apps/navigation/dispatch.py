@@ -0,0 +1,155 @@
+"""
+apps/navigation/dispatch.py
+
+Batch nearest-available-driver assignment.
+
+1. Candidates: for each job, the k closest free drivers within a radius,
+   straight from the live fleet table (vectorised radius query).
+2. Costs: travel time from every candidate driver to every job in one
+   matrix call over the road graph (straight-line time when no graph).
+3. Solve: optimal min-cost assignment of jobs to drivers (scipy's
+   linear_sum_assignment when installed, the Hungarian method below
+   otherwise). Pairs that were never candidates are infeasible.
+"""
+import numpy as np
+from django.conf import settings
+
+from .fleet import fleet
+from .geo import haversine_m_np
+from .matrix import node_matrix
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # pure NumPy fallback
+    linear_sum_assignment = None
+
+
+DISPATCH_RADIUS_M = getattr(settings, 'NAVIGATION_DISPATCH_RADIUS_M', 15000)
+DISPATCH_CANDIDATES = getattr(settings, 'NAVIGATION_DISPATCH_CANDIDATES', 8)
+FALLBACK_SPEED = 8.0  # m/s used for straight-line ETAs without a road graph
+INFEASIBLE = 1e12
+
+
+def hungarian(cost):
+    """
+    Min-cost assignment for an n x m matrix with n <= m (shortest augmenting
+    paths with potentials, inner loops vectorised over columns).
+    Returns (rows, cols) like scipy.optimize.linear_sum_assignment.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)  # p[j]: row (1-based) matched to column j, 0 = free
+    way = np.zeros(m + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[1:][free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    cols = np.flatnonzero(p[1:])
+    rows = p[1:][cols] - 1
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+
+def solve_assignment(cost):
+    """Optimal assignment for any rectangular matrix -> (rows, cols)."""
+    cost = np.asarray(cost, dtype=np.float64)
+    if linear_sum_assignment is not None:
+        return linear_sum_assignment(cost)
+    if cost.shape[0] <= cost.shape[1]:
+        return hungarian(cost)
+    cols, rows = hungarian(cost.T)
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+
+def free_driver_slots(team_id=None, busy=()):
+    """Slots of positioned online drivers, optionally limited to a team and excluding busy ids."""
+    slots = fleet.online_slots(team_id)
+    if busy:
+        slots = slots[~np.isin(fleet.driver[slots], np.fromiter(busy, dtype=np.int64))]
+    return slots
+
+
+def assign_jobs(jobs, graph=None, team_id=None, busy=(), radius_m=DISPATCH_RADIUS_M, k=DISPATCH_CANDIDATES):
+    """
+    jobs: [{"id": ..., "lat": ..., "lng": ...}]
+    Returns {"assignments": [{job_id, driver_id, eta_s}], "unassigned": [job ids]}.
+    """
+    slots = free_driver_slots(team_id, busy)
+    if not len(slots) or not jobs:
+        return {"assignments": [], "unassigned": [job['id'] for job in jobs]}
+
+    job_lat = np.array([job['lat'] for job in jobs])
+    job_lng = np.array([job['lng'] for job in jobs])
+    driver_lat, driver_lng = fleet.lat[slots], fleet.lng[slots]
+
+    # candidate generation: k nearest free drivers within the radius, per job
+    candidate_pairs = []
+    for j in range(len(jobs)):
+        straight = haversine_m_np(driver_lat, driver_lng, job_lat[j], job_lng[j])
+        near = np.flatnonzero(straight <= radius_m)
+        near = near[np.argsort(straight[near])][:k]
+        candidate_pairs.extend((int(d), j) for d in near)
+    if not candidate_pairs:
+        return {"assignments": [], "unassigned": [job['id'] for job in jobs]}
+
+    drivers = sorted({d for d, _ in candidate_pairs})
+    row_of = {d: r for r, d in enumerate(drivers)}
+
+    # travel-time matrix for candidate drivers x jobs
+    if graph is not None:
+        origin_nodes = [graph.nearest_node(driver_lat[d], driver_lng[d])[0] for d in drivers]
+        dest_nodes = [graph.nearest_node(lat, lng)[0] for lat, lng in zip(job_lat, job_lng)]
+        times = node_matrix(graph, origin_nodes, dest_nodes, 'time_s')
+    else:
+        d_idx = np.array(drivers)
+        times = haversine_m_np(driver_lat[d_idx][:, None], driver_lng[d_idx][:, None],
+                               job_lat[None, :], job_lng[None, :]) / FALLBACK_SPEED
+
+    cost = np.full((len(drivers), len(jobs)), INFEASIBLE)
+    for d, j in candidate_pairs:
+        t = times[row_of[d], j]
+        if np.isfinite(t):
+            cost[row_of[d], j] = t
+
+    rows, cols = solve_assignment(cost)
+    assignments = []
+    assigned_jobs = set()
+    for r, j in zip(rows.tolist(), cols.tolist()):
+        if cost[r, j] >= INFEASIBLE:
+            continue
+        assigned_jobs.add(j)
+        assignments.append({
+            "job_id": jobs[j]['id'],
+            "driver_id": int(fleet.driver[slots[drivers[r]]]),
+            "eta_s": round(float(cost[r, j]), 1),
+        })
+    assignments.sort(key=lambda a: str(a['job_id']))
+    return {
+        "assignments": assignments,
+        "unassigned": [job['id'] for j, job in enumerate(jobs) if j not in assigned_jobs],
+    }
@@ -0,0 +1,153 @@
+"""
+apps/navigation/escorts.py
+
+Escort-proximity monitoring for oversized loads.
+
+Active load/escort pairs (approved loads, active LoadEscort rows) are cached
+as flat arrays, reloaded from the database every ESCORT_REFRESH seconds and
+soon after a pair or load changes (EscortMonitor.invalidate). Every accepted
+fix checks the pairs that driver belongs to: both positions come from the
+live fleet table and the gaps are computed in one vectorised pass, so the
+cost depends on the driver's pairs, not on how many drivers are online.
+Alerts are sent on transitions only (gap opened / closed) to the team
+owner's channel group.
+"""
+import asyncio
+
+import numpy as np
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from .fleet import fleet
+from .geo import haversine_m_np
+
+
+ESCORT_REFRESH = getattr(settings, 'NAVIGATION_ESCORT_REFRESH', 60.0)  # seconds between pair reloads
+ESCORT_HYSTERESIS = 0.9  # a breached pair recovers below 90% of the max gap
+ESCORT_RELOAD_POLL = 1.0  # seconds between checks for an invalidated pair cache
+
+
+class EscortMonitor:
+    """Vectorised load-to-escort gap checks over the live fleet table."""
+
+    def __init__(self):
+        self.pair_ids = np.zeros(0, dtype=np.int64)
+        self.breached = np.zeros(0, dtype=bool)
+        self.stale = True
+        self.set_pairs([])
+
+    def invalidate(self):
+        """Pairs or load statuses changed; the escort loop reloads them on its next poll."""
+        self.stale = True
+
+    def set_pairs(self, pairs):
+        """pairs: iterable of (pair_id, load_id, load_driver_id, escort_id, max_gap_m, owner_id)."""
+        pairs = list(pairs)
+        # keep breach state of pairs that survive the reload
+        previous = dict(zip(self.pair_ids.tolist(), self.breached.tolist()))
+        self.pair_ids = np.array([p[0] for p in pairs], dtype=np.int64)
+        self.load_ids = np.array([p[1] for p in pairs], dtype=np.int64)
+        self.load_drivers = np.array([p[2] for p in pairs], dtype=np.int64)
+        self.escorts = np.array([p[3] for p in pairs], dtype=np.int64)
+        self.max_gap = np.array([p[4] for p in pairs], dtype=np.float64)
+        self.owners = [p[5] for p in pairs]
+        self.breached = np.array([previous.get(pid, False) for pid in self.pair_ids.tolist()], dtype=bool)
+
+    def __len__(self):
+        return len(self.pair_ids)
+
+    def _slots(self, driver_ids):
+        slots = fleet.slots
+        return np.fromiter((slots.get(d, -1) for d in driver_ids.tolist()), dtype=np.int64, count=len(driver_ids))
+
+    def check(self, driver_id=None):
+        """Return alert events for pairs (of `driver_id`, default all) whose breach state changed."""
+        if driver_id is None:
+            idx = np.arange(len(self.pair_ids))
+        else:
+            idx = np.flatnonzero((self.load_drivers == driver_id) | (self.escorts == driver_id))
+        if not len(idx):
+            return []
+        load_slots = self._slots(self.load_drivers[idx])
+        escort_slots = self._slots(self.escorts[idx])
+        known = (load_slots >= 0) & (escort_slots >= 0)
+        gap = np.full(len(idx), np.nan)
+        if known.any():
+            ls, es = load_slots[known], escort_slots[known]
+            gap[known] = haversine_m_np(fleet.lat[ls], fleet.lng[ls], fleet.lat[es], fleet.lng[es])
+        measurable = ~np.isnan(gap)
+
+        breached = self.breached[idx]
+        opened = measurable & ~breached & (gap > self.max_gap[idx])
+        closed = measurable & breached & (gap <= self.max_gap[idx] * ESCORT_HYSTERESIS)
+        self.breached[idx] = (breached | opened) & ~closed
+
+        events = []
+        for j in np.flatnonzero(opened | closed):
+            i = idx[j]
+            events.append({
+                'type': 'escort_alert',
+                'owner_id': self.owners[i],
+                'state': 'breached' if opened[j] else 'recovered',
+                'load_id': int(self.load_ids[i]),
+                'load_driver_id': int(self.load_drivers[i]),
+                'escort_id': int(self.escorts[i]),
+                'gap_m': round(float(gap[j]), 1),
+                'max_gap_m': float(self.max_gap[i]),
+            })
+        return events
+
+
+monitor = EscortMonitor()
+_loop_task = None
+
+
+def load_pairs():
+    """Active pairs with the owner whose channel group receives the alerts."""
+    from apps.subscriptions.models import Team
+    from .models import LoadEscort
+    from .presence import team_id_for_user
+
+    rows = (LoadEscort.objects
+            .filter(is_active=True, load__status='approved')
+            .values_list('id', 'load_id', 'load__user_id', 'escort_id', 'max_gap_m'))
+    owners = {}
+    pairs = []
+    for pair_id, load_id, driver_id, escort_id, max_gap in rows:
+        if driver_id not in owners:
+            team_id = team_id_for_user(driver_id)
+            owner_id = None
+            if team_id is not None:
+                owner_id = Team.objects.filter(id=team_id).values_list('subscription__user_id', flat=True).first()
+            owners[driver_id] = owner_id or driver_id
+        pairs.append((pair_id, load_id, driver_id, escort_id, max_gap, owners[driver_id]))
+    return pairs
+
+
+async def escort_loop():
+    """Reload pairs periodically, and soon after they are invalidated."""
+    since_refresh = 0.0
+    while True:
+        if monitor.stale or since_refresh >= ESCORT_REFRESH:
+            monitor.stale = False
+            try:
+                monitor.set_pairs(await database_sync_to_async(load_pairs)())
+            except Exception as e:
+                print(f"[Escort] Pair reload error: {type(e).__name__}: {e}")
+            since_refresh = 0.0
+        await asyncio.sleep(ESCORT_RELOAD_POLL)
+        since_refresh += ESCORT_RELOAD_POLL
+
+
+async def check_driver(channel_layer, driver_id):
+    """Gap checks for the pairs of a driver whose live position just changed."""
+    for event in monitor.check(driver_id):
+        await channel_layer.group_send(f"driver_{event['owner_id']}", event)
+
+
+def ensure_escort_loop():
+    """Start the escort loop once per process (called from consumer connect)."""
+    global _loop_task
+    if _loop_task is None or _loop_task.done():
+        _loop_task = asyncio.get_running_loop().create_task(escort_loop())
+    return _loop_task
@@ -0,0 +1,193 @@
+"""
+apps/navigation/eta.py
+
+Continuously updated ETA for drivers with an active route assignment.
+
+When a route is loaded, TripProfile precomputes the remaining travel time at
+every vertex of its RouteCorridor from per-segment speeds, so each accepted
+fix costs one corridor.locate() plus an interpolation along that profile.
+Segment speeds are learned from history: moving ping speeds are summed per
+history cell and hour of week (CellSpeed) as batches are stored.
+
+A new path to the destination is computed on the road graph only after the
+driver has been outside the corridor for DEVIATION_CONFIRM_FIXES fixes, and
+at most once per NAVIGATION_ETA_REROUTE_SECONDS. Without a road graph the
+ETA adds the straight-line way back to the route instead.
+"""
+import math
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from . import history
+from .corridor import DEVIATION_CONFIRM_FIXES, RETURN_RATIO, RouteCorridor
+from .counters import add_to_counters
+from .geo import unproject
+from .rollups import ROLLUP_MOVING_MPS
+
+ETA_DEFAULT_SPEED_MPS = getattr(settings, 'NAVIGATION_ETA_DEFAULT_SPEED_MPS', 8.3)  # ~30 km/h
+ETA_MIN_SAMPLES = getattr(settings, 'NAVIGATION_ETA_MIN_SAMPLES', 5)
+ETA_REROUTE_SECONDS = getattr(settings, 'NAVIGATION_ETA_REROUTE_SECONDS', 30)
+MAX_CELLS_PER_QUERY = 500  # stays under SQLite's parameter limit
+
+
+def hour_of_week(ts):
+    moment = datetime.fromtimestamp(ts, tz=timezone.get_default_timezone())
+    return moment.weekday() * 24 + moment.hour
+
+
+def record(rows):
+    """Fold the speeds of moving pings in a history batch into CellSpeed."""
+    from .models import CellSpeed
+
+    increments = {}
+    for _, _, lat, lng, speed, _, ts in rows:
+        if speed is None or not math.isfinite(speed) or speed < ROLLUP_MOVING_MPS:
+            continue
+        entry = increments.setdefault((history.cell_of(lat, lng), hour_of_week(ts)), [0.0, 0])
+        entry[0] += speed
+        entry[1] += 1
+    add_to_counters(CellSpeed, ('cell', 'hour_of_week'), ('speed_sum', 'samples'), increments)
+
+
+def learned_speeds(cells, how):
+    """{cell: m/s} for the hour of week, falling back to the cell's all-week mean; cells without data are left out."""
+    from .models import CellSpeed
+
+    cells = list(set(cells))
+    exact, overall = {}, {}
+    for i in range(0, len(cells), MAX_CELLS_PER_QUERY):
+        rows = CellSpeed.objects.filter(cell__in=cells[i:i + MAX_CELLS_PER_QUERY]).values_list(
+            'cell', 'hour_of_week', 'speed_sum', 'samples')
+        for cell, hour, speed_sum, samples in rows:
+            if hour == how:
+                exact[cell] = (speed_sum, samples)
+            total = overall.get(cell, (0.0, 0))
+            overall[cell] = (total[0] + speed_sum, total[1] + samples)
+    speeds = {}
+    for cell in cells:
+        for source in (exact, overall):
+            speed_sum, samples = source.get(cell, (0.0, 0))
+            if samples >= ETA_MIN_SAMPLES:
+                speeds[cell] = speed_sum / samples
+                break
+    return speeds
+
+
+class TripProfile:
+    """A route corridor with the remaining travel time at each of its vertices."""
+
+    def __init__(self, corridor, segment_speeds):
+        self.corridor = corridor
+        seconds = np.diff(corridor.cumulative) / np.maximum(segment_speeds, 0.5)
+        self.remaining_s = np.concatenate((np.cumsum(seconds[::-1])[::-1], [0.0]))
+        lat, lng = unproject(corridor.x[-1], corridor.y[-1], corridor.lat0)
+        self.destination = (float(lat), float(lng))
+
+    @classmethod
+    def build(cls, corridor, ts=None):
+        """Segment speeds from CellSpeed at the hour of week of `ts` (default now); hits the database."""
+        lat, lng = unproject((corridor.x[:-1] + corridor.x[1:]) / 2, (corridor.y[:-1] + corridor.y[1:]) / 2,
+                             corridor.lat0)
+        cells = [history.cell_of(a, b) for a, b in zip(lat.tolist(), lng.tolist())]
+        speeds = learned_speeds(cells, hour_of_week(ts or timezone.now().timestamp()))
+        return cls(corridor, np.array([speeds.get(c, ETA_DEFAULT_SPEED_MPS) for c in cells]))
+
+    @property
+    def duration_s(self):
+        return float(self.remaining_s[0])
+
+    def remaining(self, along, segment):
+        """Seconds from a point `along` metres into `segment` to the destination."""
+        start, end = self.corridor.cumulative[segment], self.corridor.cumulative[segment + 1]
+        left = (end - along) / (end - start) if end > start else 0.0
+        return float(self.remaining_s[segment + 1] + left * (self.remaining_s[segment] - self.remaining_s[segment + 1]))
+
+
+class Trip:
+    """ETA state of one driver's assignment; `active` is the planned profile or a reroute."""
+    __slots__ = ('assignment_id', 'planned', 'active', 'strikes', 'rerouted_at', 'estimate')
+
+    def __init__(self, assignment_id, planned):
+        self.assignment_id = assignment_id
+        self.planned = planned
+        self.active = planned
+        self.strikes = 0
+        self.rerouted_at = None
+        self.estimate = None  # last estimate, for tracking snapshots
+
+
+class EtaEngine:
+    """Trips keyed by driver id."""
+
+    def __init__(self):
+        self.trips = {}
+
+    def assign(self, driver_id, assignment_id, profile):
+        self.trips[driver_id] = Trip(assignment_id, profile)
+
+    def clear(self, driver_id):
+        self.trips.pop(driver_id, None)
+
+    def get(self, driver_id):
+        return self.trips.get(driver_id)
+
+    def update(self, driver_id, lat, lng, ts):
+        """Feed an accepted fix -> (estimate dict or None, whether a reroute should be computed)."""
+        trip = self.trips.get(driver_id)
+        if trip is None:
+            return None, False
+        width = trip.planned.corridor.corridor_m
+        if trip.active is not trip.planned and trip.planned.corridor.distance_m(lat, lng) <= width * RETURN_RATIO:
+            trip.active, trip.strikes = trip.planned, 0  # back on the assigned route
+        profile = trip.active
+        distance, along, segment = profile.corridor.locate(lat, lng)
+        off_route = distance > width
+        trip.strikes = trip.strikes + 1 if off_route else 0
+        remaining_s = profile.remaining(along, segment)
+        remaining_m = profile.corridor.length_m - along
+        if off_route:  # way back to the route
+            remaining_s += distance / ETA_DEFAULT_SPEED_MPS
+            remaining_m += distance
+        reroute = trip.strikes >= DEVIATION_CONFIRM_FIXES and (
+            trip.rerouted_at is None or ts - trip.rerouted_at >= ETA_REROUTE_SECONDS)
+        if reroute:
+            trip.rerouted_at = ts
+        trip.estimate = {
+            "assignment_id": trip.assignment_id,
+            "remaining_s": round(remaining_s),
+            "remaining_m": round(remaining_m),
+            "arrival_ts": round(ts + remaining_s),
+            "progress": round(min(max(along / profile.corridor.length_m, 0.0), 1.0), 4) if profile.corridor.length_m else 1.0,
+            "rerouted": trip.active is not trip.planned,
+        }
+        return trip.estimate, reroute
+
+    def plan_reroute(self, driver_id, lat, lng, ts, graph):
+        """
+        Road-graph profile from (lat, lng) to the trip's destination -> (trip, profile), or None.
+        Reads the trip only, so it can run in a worker thread; apply it with adopt_reroute.
+        """
+        trip = self.trips.get(driver_id)
+        if trip is None:
+            return None
+        source, _ = graph.nearest_node(lat, lng)
+        target, _ = graph.nearest_node(*trip.planned.destination)
+        nodes = graph.path(source, target, weight='time_s')
+        if not nodes:
+            return None
+        coords = [(lat, lng)] + [(float(graph.node_lat[n]), float(graph.node_lng[n])) for n in nodes]
+        coords.append(trip.planned.destination)
+        return trip, TripProfile.build(RouteCorridor(coords, trip.planned.corridor.corridor_m), ts)
+
+    def adopt_reroute(self, driver_id, trip, profile):
+        """Make a planned reroute the active profile (on the event loop, like update)."""
+        if self.trips.get(driver_id) is not trip:  # replaced by a new assignment meanwhile
+            return False
+        trip.active, trip.strikes = profile, 0
+        return True
+
+
+engine = EtaEngine()
@@ -0,0 +1,115 @@
+"""
+apps/navigation/export.py
+
+Streaming renderers for location history exports.
+
+Rows come from `.values_list(...).iterator(chunk_size=...)` (a server-side
+cursor on PostgreSQL, chunked fetches on SQLite) and are rendered into text
+chunks one database chunk at a time, so memory stays flat however many
+months the export covers. Under ASGI a synchronous iterator given to
+StreamingHttpResponse is read into a list before the first byte is sent, so
+views wrap the renderer in aiterate(), which pulls one chunk at a time
+through sync_to_async.
+"""
+import math
+from itertools import groupby, islice
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+EXPORT_CHUNK_SIZE = getattr(settings, 'NAVIGATION_EXPORT_CHUNK_SIZE', 2000)
+EXPORT_FIELDS = ('driver_id', 'latitude', 'longitude', 'speed', 'heading', 'recorded_at')
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'geojson': 'application/geo+json',
+    'gpx': 'application/gpx+xml',
+}
+EXTENSIONS = {'ndjson': 'ndjson', 'geojson': 'geojson', 'gpx': 'gpx'}
+
+
+def iter_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Pings ordered by driver then time, as tuples in EXPORT_FIELDS order."""
+    return queryset.order_by('driver_id', 'recorded_at', 'id').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def chunked(rows, size=EXPORT_CHUNK_SIZE):
+    rows = iter(rows)
+    while True:
+        block = list(islice(rows, size))
+        if not block:
+            return
+        yield block
+
+
+def _num(value, digits=2):
+    return 'null' if value is None or not math.isfinite(value) else repr(round(value, digits))
+
+
+def _time(value):
+    return value.isoformat().replace('+00:00', 'Z')
+
+
+def render_ndjson(rows):
+    for block in chunked(rows):
+        yield ''.join(
+            f'{{"driver_id":{d},"lat":{lat!r},"lng":{lng!r},"speed":{_num(speed)},'
+            f'"heading":{_num(heading, 1)},"time":"{_time(ts)}"}}\n'
+            for d, lat, lng, speed, heading, ts in block
+        )
+
+
+def render_geojson(rows):
+    yield '{"type":"FeatureCollection","features":['
+    first = True
+    for block in chunked(rows):
+        parts = []
+        for d, lat, lng, speed, heading, ts in block:
+            parts.append(
+                f'{"" if first else ","}{{"type":"Feature","geometry":{{"type":"Point","coordinates":[{lng!r},{lat!r}]}},'
+                f'"properties":{{"driver_id":{d},"speed":{_num(speed)},"heading":{_num(heading, 1)},'
+                f'"time":"{_time(ts)}"}}}}'
+            )
+            first = False
+        yield '\n'.join(parts) + '\n'
+    yield ']}\n'
+
+
+def render_gpx(rows, names=None):
+    """One <trk> per driver (rows are ordered by driver); `names` maps driver id -> track name."""
+    names = names or {}
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<gpx version="1.1" creator="socialwifi" xmlns="http://www.topografix.com/GPX/1/1">\n')
+    for driver_id, track in groupby(rows, key=lambda row: row[0]):
+        yield f'<trk><name>{escape(str(names.get(driver_id, driver_id)))}</name><trkseg>\n'
+        for block in chunked(track):
+            yield ''.join(
+                f'<trkpt lat="{lat!r}" lon="{lng!r}"><time>{_time(ts)}</time></trkpt>\n'
+                for _, lat, lng, _, _, ts in block
+            )
+        yield '</trkseg></trk>\n'
+    yield '</gpx>\n'
+
+
+_DONE = object()
+
+
+async def aiterate(chunks):
+    """Async iterator over a blocking one (database cursor plus rendering), one item per thread hop."""
+    chunks = iter(chunks)
+    # thread_sensitive: every step runs on the same thread, which owns the cursor's connection
+    step = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            chunk = await step(chunks, _DONE)
+            if chunk is _DONE:
+                return
+            yield chunk
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=True)()
+
+
+RENDERERS = {'ndjson': render_ndjson, 'geojson': render_geojson, 'gpx': render_gpx}
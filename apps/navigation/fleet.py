@@ -0,0 +1,187 @@
+"""
+apps/navigation/fleet.py
+
+Process-wide live fleet state table.
+
+Every connected driver gets a dense slot; per-driver live state lives in
+parallel NumPy arrays indexed by that slot (about 45 bytes per driver).
+Freed slots go to a free-list and are reused. Bulk questions such as
+"who is inside this bbox", "who went stale" or "where is team X" are
+answered with vectorised masks instead of per-driver Python loops.
+"""
+import math
+import time
+
+import numpy as np
+
+from .geo import M_PER_DEG_LAT
+
+
+FREE = 0
+ONLINE = 1
+OFFLINE = 2  # socket open but heartbeat expired
+
+STATUS_NAMES = {ONLINE: 'online', OFFLINE: 'offline'}
+NO_TEAM = -1
+
+
+class FleetState:
+    """Struct-of-arrays table of live driver state."""
+
+    def __init__(self, capacity=1024):
+        self.size = 0  # high-water mark, slots [0, size) have been used
+        self.slots = {}  # driver_id -> slot
+        self.free = []  # released slots available for reuse
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = getattr(self, 'lat', None)
+        arrays = {
+            'driver': (np.int64, 0),
+            'lat': (np.float64, np.nan),
+            'lng': (np.float64, np.nan),
+            'ts': (np.float64, 0.0),
+            'speed': (np.float32, 0.0),
+            'heading': (np.float32, np.nan),
+            'team': (np.int32, NO_TEAM),
+            'status': (np.uint8, FREE),
+        }
+        for name, (dtype, fill) in arrays.items():
+            new = np.full(capacity, fill, dtype=dtype)
+            if old is not None:
+                new[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, driver_id):
+        return driver_id in self.slots
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in
+                   ('driver', 'lat', 'lng', 'ts', 'speed', 'heading', 'team', 'status'))
+
+    def acquire(self, driver_id, team_id=None):
+        """Slot for `driver_id`, allocating (or reusing a freed one) if needed."""
+        slot = self.slots.get(driver_id)
+        if slot is None:
+            if self.free:
+                slot = self.free.pop()
+            else:
+                if self.size == self.capacity:
+                    self._allocate(self.capacity * 2)
+                slot = self.size
+                self.size += 1
+            self.slots[driver_id] = slot
+            self.driver[slot] = driver_id
+            self.lat[slot] = np.nan
+            self.lng[slot] = np.nan
+            self.ts[slot] = 0.0
+            self.speed[slot] = 0.0
+            self.heading[slot] = np.nan
+        self.team[slot] = NO_TEAM if team_id is None else team_id
+        self.status[slot] = ONLINE
+        return slot
+
+    def release(self, driver_id):
+        slot = self.slots.pop(driver_id, None)
+        if slot is None:
+            return
+        self.status[slot] = FREE
+        self.team[slot] = NO_TEAM
+        self.lat[slot] = np.nan
+        self.lng[slot] = np.nan
+        self.free.append(slot)
+
+    def update(self, driver_id, lat, lng, ts=None, speed=None, heading=None):
+        slot = self.slots.get(driver_id)
+        if slot is None:
+            return None
+        self.lat[slot] = lat
+        self.lng[slot] = lng
+        self.ts[slot] = time.time() if ts is None else ts
+        if speed is not None:
+            self.speed[slot] = speed
+        if heading is not None:
+            self.heading[slot] = heading
+        return slot
+
+    def set_status(self, driver_id, status):
+        slot = self.slots.get(driver_id)
+        if slot is not None:
+            self.status[slot] = status
+
+    def position(self, driver_id):
+        slot = self.slots.get(driver_id)
+        if slot is None or np.isnan(self.lat[slot]):
+            return None
+        return float(self.lat[slot]), float(self.lng[slot])
+
+    # -- vectorised queries -------------------------------------------------
+
+    def _live(self):
+        return self.status[:self.size] != FREE
+
+    def _positioned(self):
+        return self._live() & ~np.isnan(self.lat[:self.size])
+
+    def in_bbox(self, min_lat, min_lng, max_lat, max_lng, team_id=None):
+        """Slots of drivers inside the bounding box."""
+        n = self.size
+        lat, lng = self.lat[:n], self.lng[:n]
+        mask = self._positioned() & (lat >= min_lat) & (lat <= max_lat) & (lng >= min_lng) & (lng <= max_lng)
+        if team_id is not None:
+            mask &= self.team[:n] == team_id
+        return np.flatnonzero(mask)
+
+    def within_radius(self, lat, lng, radius_m, team_id=None):
+        """Slots of drivers within `radius_m` metres (equirectangular distance)."""
+        dlat = radius_m / M_PER_DEG_LAT
+        dlng = radius_m / (M_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+        slots = self.in_bbox(lat - dlat, lng - dlng, lat + dlat, lng + dlng, team_id)
+        if not len(slots):
+            return slots
+        distance = self.distances_m(slots, lat, lng)
+        return slots[distance <= radius_m]
+
+    def distances_m(self, slots, lat, lng):
+        """Equirectangular distance in metres from (lat, lng) to each slot."""
+        y = (self.lat[slots] - lat) * M_PER_DEG_LAT
+        x = (self.lng[slots] - lng) * M_PER_DEG_LAT * math.cos(math.radians(lat))
+        return np.hypot(x, y)
+
+    def stale(self, older_than, now=None):
+        """Slots whose last fix is older than `older_than` seconds."""
+        now = time.time() if now is None else now
+        return np.flatnonzero(self._positioned() & (self.ts[:self.size] < now - older_than))
+
+    def online_slots(self, team_id=None):
+        """Slots of positioned drivers whose heartbeat is current, optionally limited to a team."""
+        mask = self._positioned() & (self.status[:self.size] == ONLINE)
+        if team_id is not None:
+            mask &= self.team[:self.size] == team_id
+        return np.flatnonzero(mask)
+
+    def team_slots(self, team_id):
+        return np.flatnonzero(self._positioned() & (self.team[:self.size] == team_id))
+
+    def rows(self, slots):
+        """Plain dicts for API responses."""
+        return [
+            {
+                "user_id": int(self.driver[s]),
+                "lat": float(self.lat[s]),
+                "lng": float(self.lng[s]),
+                "ts": float(self.ts[s]),
+                "speed": float(self.speed[s]),
+                "heading": None if np.isnan(self.heading[s]) else float(self.heading[s]),
+                "status": STATUS_NAMES.get(int(self.status[s]), 'free'),
+            }
+            for s in slots
+        ]
+
+
+fleet = FleetState()
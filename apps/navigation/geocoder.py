@@ -0,0 +1,128 @@
+"""
+apps/navigation/geocoder.py
+
+Local reverse geocoding: "near Mirpur, Dhaka" from a gazetteer file, no
+external API.
+
+NAVIGATION_GAZETTEER_PATH is a CSV with a header row and columns
+name, lat, lng[, region]. The places are loaded once into a KD-tree over
+projected coordinates; the few nearest candidates are re-ranked by
+great-circle distance. Answers are memoised per quantised cell
+(NAVIGATION_GEOCODER_CELL_DEG) in an LRU, so a moving fleet mostly hits the
+cache and the broadcast path pays a dictionary lookup. The file is read once
+at startup (NavigationConfig.ready).
+"""
+import csv
+import math
+import os
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from .geo import haversine_m_np, project
+from .spatial import KDTree
+
+GAZETTEER_PATH = getattr(settings, 'NAVIGATION_GAZETTEER_PATH', None)
+GEOCODER_CELL_DEG = getattr(settings, 'NAVIGATION_GEOCODER_CELL_DEG', 0.001)  # ~110 m
+GEOCODER_CACHE_SIZE = getattr(settings, 'NAVIGATION_GEOCODER_CACHE_SIZE', 65536)
+GEOCODER_MAX_DISTANCE_M = getattr(settings, 'NAVIGATION_GEOCODER_MAX_DISTANCE_M', 30000)
+CANDIDATES = 4  # nearest in the projection, re-ranked by haversine
+
+
+class ReverseGeocoder:
+    """Nearest named place for a position, memoised per grid cell."""
+
+    def __init__(self, names, regions, lat, lng, cell_deg=GEOCODER_CELL_DEG,
+                 cache_size=GEOCODER_CACHE_SIZE, max_distance_m=GEOCODER_MAX_DISTANCE_M):
+        self.names = names
+        self.regions = regions
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lng = np.asarray(lng, dtype=np.float64)
+        self.lat0 = float(np.mean(self.lat)) if len(self.lat) else 0.0
+        self.tree = KDTree(*project(self.lat, self.lng, self.lat0))
+        self.cell_deg = cell_deg
+        self.cache_size = cache_size
+        self.max_distance_m = max_distance_m
+        self.cache = OrderedDict()
+        self.hits = self.misses = 0
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        names, regions, lat, lng = [], [], [], []
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                try:
+                    lat.append(float(row['lat']))
+                    lng.append(float(row['lng']))
+                except (KeyError, TypeError, ValueError):
+                    continue
+                names.append(row['name'].strip())
+                regions.append((row.get('region') or '').strip())
+        return cls(names, regions, lat, lng, **kwargs)
+
+    def __len__(self):
+        return len(self.names)
+
+    def nearest(self, lat, lng):
+        """(place index, distance m) of the closest place, or (None, inf)."""
+        if not len(self.names):
+            return None, math.inf
+        x, y = project(lat, lng, self.lat0)
+        _, candidates = self.tree.query(float(x), float(y), k=min(CANDIDATES, len(self.names)))
+        distances = haversine_m_np(self.lat[candidates], self.lng[candidates], lat, lng)
+        best = int(np.argmin(distances))
+        return int(candidates[best]), float(distances[best])
+
+    def label(self, index):
+        name, region = self.names[index], self.regions[index]
+        return f"near {name}, {region}" if region and region != name else f"near {name}"
+
+    def describe(self, lat, lng):
+        """'near <place>[, <region>]' for the cell containing (lat, lng), or None when nothing is close."""
+        key = (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return self.cache[key]
+        self.misses += 1
+        # answer for the cell centre, so every position in the cell gets the same label
+        index, distance = self.nearest((key[0] + 0.5) * self.cell_deg, (key[1] + 0.5) * self.cell_deg)
+        text = self.label(index) if index is not None and distance <= self.max_distance_m else None
+        self.cache[key] = text
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return text
+
+    def stats(self):
+        return {"places": len(self.names), "cached_cells": len(self.cache), "hits": self.hits, "misses": self.misses}
+
+
+_geocoder = None
+_loaded = False
+
+
+def load_geocoder(path=GAZETTEER_PATH):
+    """
+    Load the process-wide geocoder (AppConfig.ready, so the event loop never reads the file).
+    A missing or unreadable gazetteer is remembered as "no geocoder" rather than retried.
+    """
+    global _geocoder, _loaded
+    _geocoder, _loaded = None, True
+    if path and os.path.exists(path):
+        try:
+            _geocoder = ReverseGeocoder.load(path)
+        except (OSError, UnicodeDecodeError, csv.Error, KeyError) as e:
+            print(f"[Geocoder] Could not load {path}: {type(e).__name__}: {e}")
+    return _geocoder
+
+
+def get_geocoder():
+    """Process-wide geocoder from NAVIGATION_GAZETTEER_PATH, or None if not configured."""
+    return _geocoder if _loaded else load_geocoder()
+
+
+def describe(lat, lng):
+    """Place label for a position, or None without a gazetteer."""
+    geocoder = get_geocoder()
+    return geocoder.describe(lat, lng) if geocoder is not None else None
@@ -0,0 +1,152 @@
+"""
+apps/navigation/heatmap.py
+
+Fleet density heatmap from pre-aggregated dwell counters.
+
+Every history batch adds, per ping, the time since the driver's previous
+ping (capped at NAVIGATION_HEATMAP_MAX_GAP_S) to a DwellCell keyed by
+(level, hour, row, col, team), at each grid size in NAVIGATION_HEATMAP_LEVELS.
+The increments of a batch are summed in memory and applied as upserts
+(counters.py), so the counters cost a few rows per batch instead of a scan
+over raw pings at query time.
+
+Pings that arrive late (offline backfill) are older than what the live
+accumulator has seen, so replay() re-runs each driver's affected stretch
+from the history store instead and applies the difference.
+
+grid() picks the coarsest-enough level for the requested zoom and bbox and
+sums the matching counters over the time window.
+"""
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Sum
+
+from .counters import add_to_counters
+
+HEATMAP_LEVELS = getattr(settings, 'NAVIGATION_HEATMAP_LEVELS', (0.005, 0.02, 0.08, 0.32))  # cell sizes in degrees
+HEATMAP_MAX_GAP_S = getattr(settings, 'NAVIGATION_HEATMAP_MAX_GAP_S', 120)
+HEATMAP_MAX_CELLS = getattr(settings, 'NAVIGATION_HEATMAP_MAX_CELLS', 4096)
+HEATMAP_MAX_DAYS = getattr(settings, 'NAVIGATION_HEATMAP_MAX_DAYS', 31)
+TILE_CELLS = 16  # cells across one 256 px map tile at the requested zoom
+
+
+def cell(lat, lng, size):
+    return math.floor((lat + 90) / size), math.floor((lng + 180) / size)
+
+
+class DwellAccumulator:
+    """Turns history batches into per-cell dwell increments; remembers each driver's last ping time."""
+
+    def __init__(self, levels=HEATMAP_LEVELS, max_gap=HEATMAP_MAX_GAP_S):
+        self.levels = levels
+        self.max_gap = max_gap
+        self.last_ts = {}  # driver_id -> newest ping time seen
+
+    def add(self, rows):
+        """History tuples (driver_id, team_id, lat, lng, speed, heading, ts) -> {key: [seconds, pings]}."""
+        increments = {}
+        for driver_id, team_id, lat, lng, _, _, ts in sorted(rows, key=lambda r: (r[0], r[6])):
+            previous = self.last_ts.get(driver_id)
+            dwell = min(ts - previous, self.max_gap) if previous is not None and ts > previous else 0.0
+            if previous is None or ts > previous:
+                self.last_ts[driver_id] = ts
+            hour = int(ts // 3600)
+            for level, size in enumerate(self.levels):
+                row, col = cell(lat, lng, size)
+                entry = increments.setdefault((level, hour, row, col, team_id or 0), [0.0, 0])
+                entry[0] += dwell
+                entry[1] += 1
+        return increments
+
+
+accumulator = DwellAccumulator()
+
+
+def record(rows):
+    """Fold a history batch into the heatmap counters."""
+    from .models import DwellCell
+
+    add_to_counters(DwellCell, ('level', 'hour', 'row', 'col', 'team'), ('seconds', 'pings'), accumulator.add(rows))
+
+
+def replay(rows, max_gap=HEATMAP_MAX_GAP_S):
+    """
+    Fold pings already appended to the history store out of order into the counters. Each driver's
+    stored pings within max_gap of the batch are accumulated with and without the batch, and the
+    difference is applied, so the pings around the batch give up the dwell it now claims. Counters
+    are keyed by the batch's team, which is also used for those neighbours.
+    """
+    from .history import get_store
+    from .models import DwellCell
+
+    def at(ts):
+        return datetime.fromtimestamp(ts, tz=dt_timezone.utc)
+
+    store = get_store()
+    by_driver = {}
+    for row in rows:
+        by_driver.setdefault(row[0], []).append(row)
+    increments = {}
+    for driver_id, batch in by_driver.items():
+        team_id = batch[0][1]
+        added = {round(row[6], 3) for row in batch}
+        start = min(row[6] for row in batch) - max_gap
+        end = max(row[6] for row in batch) + max_gap
+        stored = list(store.scan(driver_id=driver_id, start=at(start), end=at(end)))
+        # the next ping gains dwell when the batch gives it its first predecessor
+        following = next(iter(store.scan(driver_id=driver_id, start=at(end + 0.001))), None)
+        if following is not None:
+            stored.append(following)
+        stretch = [(driver_id, team_id, lat, lng, speed, heading, recorded_at.timestamp())
+                   for _, lat, lng, speed, heading, recorded_at in stored]
+        # a ping before the stretch is at least max_gap older than its first one
+        earlier = next(iter(store.scan(driver_id=driver_id, end=at(start - 0.001))), None) is not None
+        for sign, pings in ((1, stretch), (-1, [row for row in stretch if round(row[6], 3) not in added])):
+            replayed = DwellAccumulator(max_gap=max_gap)
+            if earlier:
+                replayed.last_ts[driver_id] = start - max_gap
+            for key, (seconds, count) in replayed.add(pings).items():
+                entry = increments.setdefault(key, [0.0, 0])
+                entry[0] += sign * seconds
+                entry[1] += sign * count
+    increments = {key: value for key, value in increments.items() if value[0] or value[1]}
+    add_to_counters(DwellCell, ('level', 'hour', 'row', 'col', 'team'), ('seconds', 'pings'), increments)
+
+
+def choose_level(min_lat, min_lng, max_lat, max_lng, zoom=None, levels=HEATMAP_LEVELS):
+    """Finest level at least as coarse as the zoom asks for and within HEATMAP_MAX_CELLS over the bbox."""
+    wanted = 360.0 / 2 ** zoom / TILE_CELLS if zoom is not None else 0.0
+    for level, size in enumerate(levels):
+        cells = (math.floor((max_lat + 90) / size) - math.floor((min_lat + 90) / size) + 1) * \
+                (math.floor((max_lng + 180) / size) - math.floor((min_lng + 180) / size) + 1)
+        if size >= wanted and cells <= HEATMAP_MAX_CELLS:
+            return level
+    return len(levels) - 1
+
+
+def grid(min_lat, min_lng, max_lat, max_lng, start, end, zoom=None, team_id=None):
+    """
+    Dwell per cell over [start, end] (aware datetimes, whole hours) inside the bbox.
+    -> {"level", "cell_deg", "cells": [[lat, lng, seconds, pings], ...]}; lat/lng is the cell centre.
+    """
+    from .models import DwellCell
+
+    level = choose_level(min_lat, min_lng, max_lat, max_lng, zoom)
+    size = HEATMAP_LEVELS[level]
+    row0, col0 = cell(min_lat, min_lng, size)
+    row1, col1 = cell(max_lat, max_lng, size)
+    counters = DwellCell.objects.filter(
+        level=level, hour__gte=int(start.timestamp() // 3600), hour__lte=int(end.timestamp() // 3600),
+        row__range=(row0, row1), col__range=(col0, col1),
+    )
+    if team_id is not None:
+        counters = counters.filter(team=team_id)
+    totals = counters.values('row', 'col').annotate(total_seconds=Sum('seconds'), total_pings=Sum('pings'))
+    cells = [
+        [round((t['row'] + 0.5) * size - 90, 6), round((t['col'] + 0.5) * size - 180, 6),
+         round(t['total_seconds'], 1), t['total_pings']]
+        for t in totals
+    ]
+    return {"level": level, "cell_deg": size, "cells": cells}
@@ -0,0 +1,280 @@
+"""
+apps/navigation/history.py
+
+Location history: accepted live fixes are appended to an in-process buffer
+and written as LocationPing rows in batches (one bulk INSERT per flush), so
+the hot WebSocket path never waits on a per-ping write.
+
+The buffer flushes when it reaches NAVIGATION_HISTORY_BATCH_SIZE rows or
+every NAVIGATION_HISTORY_FLUSH_SECONDS, whichever comes first.
+
+Where the pings end up is pluggable (NAVIGATION_HISTORY_STORE): 'orm' keeps
+LocationPing rows, 'segments' appends to binary day files (segments.py).
+Both offer append / scan / latest / compact, and everything reading or
+writing history goes through get_store(). store_pings() also feeds the
+derived aggregates (heatmap dwell counters, daily mileage rollups, cell
+speeds for ETAs).
+"""
+import asyncio
+import math
+import time
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db.models import Max
+
+from . import eta, heatmap, rollups
+from .geo import M_PER_DEG_LAT, haversine_m_np
+
+
+HISTORY_BATCH_SIZE = getattr(settings, 'NAVIGATION_HISTORY_BATCH_SIZE', 500)
+HISTORY_FLUSH_SECONDS = getattr(settings, 'NAVIGATION_HISTORY_FLUSH_SECONDS', 2.0)
+HISTORY_MAX_PENDING = HISTORY_BATCH_SIZE * 20  # drop the oldest rows past this if the database falls behind
+HISTORY_BUCKET_SECONDS = getattr(settings, 'NAVIGATION_HISTORY_BUCKET_SECONDS', 900)
+HISTORY_CELL_DEG = getattr(settings, 'NAVIGATION_HISTORY_CELL_DEG', 0.01)  # ~1.1 km north-south
+HISTORY_QUERY_MAX_HOURS = getattr(settings, 'NAVIGATION_HISTORY_QUERY_MAX_HOURS', 24)
+HISTORY_STORE = getattr(settings, 'NAVIGATION_HISTORY_STORE', 'orm')
+MAX_QUERY_CELLS = 400  # wider areas skip the cell filter and rely on the bucket + coordinate ranges
+_CELL_COLUMNS = int(round(360 / HISTORY_CELL_DEG)) + 1
+
+
+# -- spatio-temporal keys ----------------------------------------------------
+#
+# Each ping carries (bucket, cell): the time bucket it falls in and the grid
+# cell of its position. A "who was near here between t0 and t1" query becomes
+# `bucket IN (...) AND cell IN (...)` on the composite index, so it only
+# touches the few buckets and cells that can contain an answer.
+#
+# The keys are stored, so NAVIGATION_HISTORY_BUCKET_SECONDS and
+# NAVIGATION_HISTORY_CELL_DEG are fixed once any history exists: changing
+# either makes queries miss every row keyed under the old values. Migration
+# 0011 keys pre-existing rows with the defaults (900 s, 0.01 deg).
+
+def bucket_of(ts):
+    return int(ts // HISTORY_BUCKET_SECONDS)
+
+
+def cell_of(lat, lng):
+    row = math.floor((lat + 90) / HISTORY_CELL_DEG)
+    col = math.floor((lng + 180) / HISTORY_CELL_DEG)
+    return row * _CELL_COLUMNS + col
+
+
+def buckets_between(start_ts, end_ts):
+    return list(range(bucket_of(start_ts), bucket_of(end_ts) + 1))
+
+
+def cells_covering(min_lat, min_lng, max_lat, max_lng):
+    """Cell ids overlapping the box, or None when there are more than MAX_QUERY_CELLS."""
+    row0, row1 = math.floor((min_lat + 90) / HISTORY_CELL_DEG), math.floor((max_lat + 90) / HISTORY_CELL_DEG)
+    col0, col1 = math.floor((min_lng + 180) / HISTORY_CELL_DEG), math.floor((max_lng + 180) / HISTORY_CELL_DEG)
+    if (row1 - row0 + 1) * (col1 - col0 + 1) > MAX_QUERY_CELLS:
+        return None
+    return [row * _CELL_COLUMNS + col for row in range(row0, row1 + 1) for col in range(col0, col1 + 1)]
+
+
+def drivers_near(lat, lng, radius_m, start, end, team_id=None):
+    """
+    Drivers with a recorded fix within radius_m of (lat, lng) between start and end (aware datetimes).
+    -> [{"driver_id", "closest_m", "first_seen", "last_seen", "pings"}] sorted by closest approach.
+    """
+    dlat = radius_m / M_PER_DEG_LAT
+    dlng = radius_m / (M_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+    rows = list(get_store().scan(team_id=team_id, start=start, end=end,
+                                 bbox=(lat - dlat, lng - dlng, lat + dlat, lng + dlng)))
+    if not rows:
+        return []
+
+    drivers = np.array([r[0] for r in rows])
+    distance = haversine_m_np(np.array([r[1] for r in rows]), np.array([r[2] for r in rows]), lat, lng)
+    result = {}
+    for i in np.flatnonzero(distance <= radius_m):
+        driver_id, seen_at = int(drivers[i]), rows[i][5]
+        entry = result.get(driver_id)
+        if entry is None:
+            result[driver_id] = {"driver_id": driver_id, "closest_m": float(distance[i]),
+                                 "first_seen": seen_at, "last_seen": seen_at, "pings": 1}
+            continue
+        entry["closest_m"] = min(entry["closest_m"], float(distance[i]))
+        entry["first_seen"] = min(entry["first_seen"], seen_at)
+        entry["last_seen"] = max(entry["last_seen"], seen_at)
+        entry["pings"] += 1
+    for entry in result.values():
+        entry["closest_m"] = round(entry["closest_m"], 1)
+    return sorted(result.values(), key=lambda e: e["closest_m"])
+
+
+class PingBuffer:
+    """Pending history rows as plain tuples until the next flush."""
+
+    def __init__(self, batch_size=HISTORY_BATCH_SIZE, max_pending=HISTORY_MAX_PENDING):
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.pending = []
+        self.written = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, driver_id, team_id, lat, lng, ts=None, speed=None, heading=None):
+        """Queue one fix; returns True when a batch is ready to write."""
+        self.pending.append((driver_id, team_id, lat, lng, speed, heading, ts or time.time()))
+        if len(self.pending) > self.max_pending:
+            overflow = len(self.pending) - self.max_pending
+            del self.pending[:overflow]
+            self.dropped += overflow
+        return len(self.pending) >= self.batch_size
+
+    def drain(self):
+        rows, self.pending = self.pending, []
+        return rows
+
+    def stats(self):
+        return {"pending": len(self.pending), "written": self.written, "dropped": self.dropped}
+
+
+buffer = PingBuffer()
+
+
+def write_pings(rows):
+    """Insert a batch of buffered rows."""
+    from .models import LocationPing
+
+    LocationPing.objects.bulk_create([
+        LocationPing(
+            driver_id=driver_id, team_id=team_id, latitude=lat, longitude=lng, speed=speed, heading=heading,
+            recorded_at=datetime.fromtimestamp(ts, tz=dt_timezone.utc), bucket=bucket_of(ts), cell=cell_of(lat, lng),
+        )
+        for driver_id, team_id, lat, lng, speed, heading, ts in rows
+    ], batch_size=HISTORY_BATCH_SIZE)
+
+
+class OrmPingStore:
+    """History as LocationPing rows (the default store)."""
+
+    def append(self, rows):
+        """Write buffered tuples (driver_id, team_id, lat, lng, speed, heading, ts)."""
+        write_pings(rows)
+
+    def scan(self, driver_id=None, team_id=None, start=None, end=None, bbox=None):
+        """
+        Pings as export tuples (driver_id, lat, lng, speed, heading, recorded_at), ordered by driver
+        then time. `bbox` is (min_lat, min_lng, max_lat, max_lng); with start and end it is answered
+        from the (bucket, cell) index.
+        """
+        from .export import iter_rows
+        from .models import LocationPing
+
+        pings = LocationPing.objects.all()
+        if driver_id is not None:
+            pings = pings.filter(driver_id=driver_id)
+        if team_id is not None:
+            pings = pings.filter(team_id=team_id)
+        if start is not None:
+            pings = pings.filter(recorded_at__gte=start)
+        if end is not None:
+            pings = pings.filter(recorded_at__lte=end)
+        if bbox is not None:
+            min_lat, min_lng, max_lat, max_lng = bbox
+            pings = pings.filter(latitude__range=(min_lat, max_lat), longitude__range=(min_lng, max_lng))
+            if start is not None and end is not None:
+                pings = pings.filter(bucket__in=buckets_between(start.timestamp(), end.timestamp()))
+                cells = cells_covering(*bbox)
+                if cells is not None:
+                    pings = pings.filter(cell__in=cells)
+        return iter_rows(pings)
+
+    def latest(self, driver_id):
+        """Time of the driver's newest stored fix, or None."""
+        from .models import LocationPing
+
+        return LocationPing.objects.filter(driver_id=driver_id).aggregate(latest=Max('recorded_at'))['latest']
+
+    def compact(self, **options):
+        from .retention import compact
+
+        return compact(**options)
+
+
+_store = None
+
+
+def get_store():
+    """Process-wide history store selected by NAVIGATION_HISTORY_STORE."""
+    global _store
+    if _store is None:
+        if HISTORY_STORE == 'segments':
+            from .segments import SegmentPingStore
+            _store = SegmentPingStore()
+        else:
+            _store = OrmPingStore()
+    return _store
+
+
+def store_pings(rows):
+    """Persist a batch of buffered tuples and fold it into the aggregates."""
+    get_store().append(rows)
+    heatmap.record(rows)
+    rollups.record(rows)
+    eta.record(rows)
+
+
+def store_backfill(rows):
+    """
+    Persist pings uploaded after the fact (backfill.py). They predate what the live accumulators
+    have seen, so the dwell counters are replayed from the store instead of advanced; the caller
+    rebuilds the driver's rollups once the whole upload is stored.
+    """
+    get_store().append(rows)
+    heatmap.replay(rows)
+    eta.record(rows)
+
+
+async def flush():
+    rows = buffer.drain()
+    if not rows:
+        return
+    try:
+        await database_sync_to_async(store_pings)(rows)
+        buffer.written += len(rows)
+    except Exception as e:
+        print(f"[History] Write error ({len(rows)} pings): {type(e).__name__}: {e}")
+        buffer.dropped += len(rows)
+
+
+_flush_requested = None
+_loop_task = None
+
+
+def request_flush():
+    """Wake the history loop early (a full batch is waiting)."""
+    if _flush_requested is not None:
+        _flush_requested.set()
+
+
+async def history_loop():
+    while True:
+        try:
+            await asyncio.wait_for(_flush_requested.wait(), HISTORY_FLUSH_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _flush_requested.clear()
+        await flush()
+
+
+def ensure_history_loop():
+    """Start the history writer once per process (called from consumer connect)."""
+    global _loop_task, _flush_requested
+    if _loop_task is None or _loop_task.done():
+        _flush_requested = asyncio.Event()
+        _loop_task = asyncio.get_running_loop().create_task(history_loop())
+    return _loop_task
+
+
+def record(driver_id, team_id, lat, lng, ts=None, speed=None, heading=None):
+    """Buffer an accepted fix for the history table."""
+    if buffer.add(driver_id, team_id, lat, lng, ts, speed, heading):
+        request_flush()
@@ -0,0 +1,171 @@
+"""
+apps/navigation/isochrone.py
+
+Reachable-area polygons ("what can a driver reach in N minutes").
+
+One Dijkstra from the snapped origin node, bounded by the largest budget,
+gives the cost of every reachable node. For each budget the reached nodes
+plus the interpolated end points of edges cut by the budget are wrapped in
+a convex hull (projected metres) and simplified with Douglas-Peucker.
+Polygons are cached per (origin node, weight, budget), so repeated depot
+queries skip the search entirely.
+"""
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from .geo import unproject
+from .matrix import csgraph_dijkstra, sparse_graph
+
+ISOCHRONE_CACHE_SIZE = getattr(settings, 'NAVIGATION_ISOCHRONE_CACHE_SIZE', 512)
+ISOCHRONE_TOLERANCE_M = getattr(settings, 'NAVIGATION_ISOCHRONE_TOLERANCE_M', 50.0)
+ISOCHRONE_MAX_MINUTES = getattr(settings, 'NAVIGATION_ISOCHRONE_MAX_MINUTES', 120)
+
+
+def node_costs(graph, source, limit, weight='time_s'):
+    """Cost from `source` to every node (inf beyond `limit` or unreachable)."""
+    if csgraph_dijkstra is not None:
+        return csgraph_dijkstra(sparse_graph(graph, weight), directed=True, indices=source, limit=limit)
+    costs = np.full(graph.num_nodes, np.inf)
+    reached = graph.shortest_paths(source, weight=weight, limit=limit)
+    costs[list(reached)] = list(reached.values())
+    return costs
+
+
+def frontier_points(graph, costs, budget, weight='time_s'):
+    """(x, y) of reached nodes plus the point where the budget runs out along each cut edge."""
+    reached = costs <= budget
+    src = np.asarray(graph.edge_src, dtype=np.int64)
+    dst = np.asarray(graph.indices, dtype=np.int64)
+    cut = reached[src] & ~reached[dst]
+    src, dst = src[cut], dst[cut]
+    edge_cost = np.maximum(np.asarray(getattr(graph, weight), dtype=np.float64)[cut], 1e-3)
+    t = np.clip((budget - costs[src]) / edge_cost, 0.0, 1.0)
+    xs = np.concatenate((graph.node_x[reached], graph.node_x[src] + t * (graph.node_x[dst] - graph.node_x[src])))
+    ys = np.concatenate((graph.node_y[reached], graph.node_y[src] + t * (graph.node_y[dst] - graph.node_y[src])))
+    return xs, ys, int(reached.sum())
+
+
+def convex_hull(xs, ys):
+    """Monotone-chain hull -> counter-clockwise array of (x, y) without the closing point."""
+    points = np.unique(np.column_stack((xs, ys)), axis=0)
+    if len(points) < 3:
+        return points
+    # Akl-Toussaint: drop points strictly inside the octagon of extremes before the Python loop
+    sx, sy = points[:, 0], points[:, 1]
+    extremes = [np.argmin(sy), np.argmax(sx - sy), np.argmax(sx), np.argmax(sx + sy),
+                np.argmax(sy), np.argmax(sy - sx), np.argmin(sx), np.argmin(sx + sy)]
+    octagon = points[list(dict.fromkeys(int(i) for i in extremes))]
+    if len(octagon) >= 3:
+        inside = np.ones(len(points), dtype=bool)
+        for a, b in zip(octagon, np.roll(octagon, -1, axis=0)):
+            inside &= (b[0] - a[0]) * (sy - a[1]) - (b[1] - a[1]) * (sx - a[0]) > 0
+        points = points[~inside]
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    lower, upper = [], []
+    for p in points:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    for p in points[::-1]:
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    return np.array(lower[:-1] + upper[:-1])
+
+
+def douglas_peucker(points, tolerance):
+    """Simplify an open polyline of (x, y) rows, keeping both end points."""
+    if len(points) < 3:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = points[start], points[end]
+        inner = points[start + 1:end]
+        dx, dy = b - a
+        length = np.hypot(dx, dy)
+        if length == 0:
+            dist = np.hypot(inner[:, 0] - a[0], inner[:, 1] - a[1])
+        else:
+            dist = np.abs(dx * (inner[:, 1] - a[1]) - dy * (inner[:, 0] - a[0])) / length
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            split = start + 1 + i
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return points[keep]
+
+
+def simplify_ring(ring, tolerance):
+    """Douglas-Peucker on a closed ring; the ring is split at its farthest pair so both halves keep shape."""
+    if len(ring) < 4:
+        return ring
+    far = int(np.argmax(np.hypot(ring[:, 0] - ring[0, 0], ring[:, 1] - ring[0, 1])))
+    first = douglas_peucker(ring[:far + 1], tolerance)
+    second = douglas_peucker(np.vstack((ring[far:], ring[:1])), tolerance)
+    return np.vstack((first, second[1:-1]))
+
+
+class PolygonCache:
+    """LRU of isochrone results keyed by (origin node, weight, budget seconds)."""
+
+    def __init__(self, max_items=ISOCHRONE_CACHE_SIZE):
+        self.max_items = max_items
+        self.items = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        item = self.items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self.items.move_to_end(key)
+        self.hits += 1
+        return item
+
+    def put(self, key, item):
+        self.items[key] = item
+        self.items.move_to_end(key)
+        while len(self.items) > self.max_items:
+            self.items.popitem(last=False)
+
+
+cache = PolygonCache()
+
+
+def isochrones(graph, lat, lng, minutes, tolerance_m=ISOCHRONE_TOLERANCE_M):
+    """
+    Reachable-area polygons from (lat, lng) for each budget in `minutes`.
+    Returns {"origin_node", "origin_snap_m", "isochrones": [{"minutes", "reachable_nodes", "polygon": [[lat, lng], ...]}]}.
+    Polygons are closed rings (first point repeated at the end).
+    """
+    node, snap_m = graph.nearest_node(lat, lng)
+    budgets = sorted({int(m) for m in minutes})
+    found = {m: cache.get((node, 'time_s', m * 60)) for m in budgets}
+    missing = [m for m in budgets if found[m] is None]
+    if missing:
+        costs = node_costs(graph, node, limit=max(missing) * 60.0)
+        for m in missing:
+            xs, ys, count = frontier_points(graph, costs, m * 60.0)
+            ring = simplify_ring(convex_hull(xs, ys), tolerance_m)
+            if len(ring):
+                ring = np.vstack((ring, ring[:1]))
+            ring_lat, ring_lng = unproject(ring[:, 0], ring[:, 1], graph.lat0) if len(ring) else ([], [])
+            polygon = [[round(float(a), 6), round(float(b), 6)] for a, b in zip(ring_lat, ring_lng)]
+            found[m] = {"minutes": m, "reachable_nodes": count, "polygon": polygon}
+            cache.put((node, 'time_s', m * 60), found[m])
+    return {
+        "origin_node": node,
+        "origin_snap_m": round(snap_m, 1),
+        "isochrones": [found[m] for m in budgets],
+    }
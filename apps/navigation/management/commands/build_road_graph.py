@@ -0,0 +1,74 @@
+import csv
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.navigation.roadgraph import ROAD_GRAPH_DIR, RoadGraph
+
+
+class Command(BaseCommand):
+    help = "Build the local road graph (.npy files) from OpenStreetMap (osmnx) or an edge CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--place', help="OSM place name, e.g. 'Dhaka, Bangladesh' (requires osmnx)")
+        parser.add_argument('--edges-csv', help="CSV with src_lat,src_lng,dst_lat,dst_lng[,speed_kph][,oneway]")
+        parser.add_argument('--out', default=ROAD_GRAPH_DIR, help="Output directory")
+
+    def handle(self, *args, **options):
+        if not options['out']:
+            raise CommandError("Set NAVIGATION_ROAD_GRAPH_DIR or pass --out.")
+        if options['place']:
+            graph = self.from_osm(options['place'])
+        elif options['edges_csv']:
+            graph = self.from_csv(options['edges_csv'])
+        else:
+            raise CommandError("Pass --place or --edges-csv.")
+        graph.save(options['out'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Road graph written to {options['out']}: {graph.num_nodes} nodes, {graph.num_edges} edges"
+        ))
+
+    def from_osm(self, place):
+        try:
+            import osmnx as ox
+        except ImportError:
+            raise CommandError("osmnx is not installed.")
+        G = ox.graph_from_place(place, network_type='drive', simplify=False)
+        G = ox.add_edge_speeds(G)
+        nodes = list(G.nodes)
+        index = {n: i for i, n in enumerate(nodes)}
+        lat = [G.nodes[n]['y'] for n in nodes]
+        lng = [G.nodes[n]['x'] for n in nodes]
+        src, dst, length, speed = [], [], [], []
+        for u, v, data in G.edges(data=True):
+            src.append(index[u])
+            dst.append(index[v])
+            length.append(data.get('length', 0.0))
+            speed.append(data.get('speed_kph', 50.0) / 3.6)
+        return RoadGraph.from_edges(lat, lng, src, dst, length, np.array(speed))
+
+    def from_csv(self, path):
+        index, lat, lng = {}, [], []
+        src, dst, speed = [], [], []
+
+        def node(a, b):
+            key = (round(float(a), 7), round(float(b), 7))
+            if key not in index:
+                index[key] = len(lat)
+                lat.append(key[0])
+                lng.append(key[1])
+            return index[key]
+
+        with open(path, newline='') as fh:
+            for row in csv.DictReader(fh):
+                u = node(row['src_lat'], row['src_lng'])
+                v = node(row['dst_lat'], row['dst_lng'])
+                mps = float(row.get('speed_kph') or 50.0) / 3.6
+                src.append(u)
+                dst.append(v)
+                speed.append(mps)
+                if str(row.get('oneway', '')).lower() not in ('1', 'true', 'yes'):
+                    src.append(v)
+                    dst.append(u)
+                    speed.append(mps)
+        return RoadGraph.from_edges(lat, lng, src, dst, speed_mps=np.array(speed))
@@ -0,0 +1,37 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.navigation.history import get_store
+from apps.navigation.retention import HISTORY_RETENTION, plan
+
+
+class Command(BaseCommand):
+    help = "Downsample and expire location history per NAVIGATION_HISTORY_RETENTION (run from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Re-examine buckets from this date (YYYY-MM-DD), e.g. after an old backfill")
+        parser.add_argument('--pause', type=float, default=0.0, help="Seconds to sleep between buckets")
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        try:
+            plan(HISTORY_RETENTION)
+        except ValueError as e:
+            raise CommandError(f"NAVIGATION_HISTORY_RETENTION: {e}")
+        since = None
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').replace(tzinfo=dt_timezone.utc)
+            except ValueError:
+                raise CommandError("--since must be YYYY-MM-DD.")
+        stats = get_store().compact(since=since, dry_run=options['dry_run'], pause=options['pause'], log=self.stdout.write)
+        verb = "Would remove" if options['dry_run'] else "Removed"
+        for tier in stats['tiers']:
+            self.stdout.write(
+                f"{tier['resolution_s']}s tier: {tier['chunks']} chunks, {tier['scanned']} pings read, "
+                f"{verb.lower()} {tier['deleted']}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {sum(t['deleted'] for t in stats['tiers'])} downsampled and {stats['expired']} expired pings"
+        ))
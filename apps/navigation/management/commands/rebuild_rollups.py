@@ -0,0 +1,26 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.navigation.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute daily mileage rollups from location history (default: yesterday)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First day (YYYY-MM-DD)")
+        parser.add_argument('--end', help="Last day (YYYY-MM-DD), default yesterday")
+
+    def handle(self, *args, **options):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        try:
+            last_day = date.fromisoformat(options['end']) if options['end'] else yesterday
+            first_day = date.fromisoformat(options['start']) if options['start'] else last_day
+        except ValueError:
+            raise CommandError("--start and --end must be YYYY-MM-DD.")
+        if first_day > last_day:
+            raise CommandError("--start must not be after --end.")
+        rows = rebuild(first_day, last_day)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} driver-days for {first_day} .. {last_day}"))
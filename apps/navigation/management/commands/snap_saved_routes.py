@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.navigation.matching import match_tracks
+from apps.navigation.models import SavedRoute
+from apps.navigation.roadgraph import ROAD_GRAPH_DIR, get_road_graph
+
+
+class Command(BaseCommand):
+    help = "Snap SavedRoute points onto the local road graph using a process pool (raw coordinates are kept)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None)
+        parser.add_argument('--chunk', type=int, default=2000, help="Rows per batch")
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if get_road_graph() is None:
+            raise CommandError("No road graph found; run build_road_graph first.")
+        queryset = SavedRoute.objects.exclude(latitude=0.0, longitude=0.0).only('id', 'latitude', 'longitude', 'snapped_latitude', 'snapped_longitude')
+        snapped = moved = 0
+        batch = []
+        for route in queryset.iterator(chunk_size=options['chunk']):
+            batch.append(route)
+            if len(batch) >= options['chunk']:
+                s, m = self.snap(batch, options)
+                snapped, moved, batch = snapped + s, moved + m, []
+        if batch:
+            s, m = self.snap(batch, options)
+            snapped, moved = snapped + s, moved + m
+        self.stdout.write(self.style.SUCCESS(f"Snapped {snapped} saved routes, {moved} changed"))
+
+    def snap(self, routes, options):
+        # each saved place is an independent one-point track
+        results = match_tracks([[(r.latitude, r.longitude)] for r in routes], ROAD_GRAPH_DIR, options['workers'])
+        changed = []
+        for route, matched in zip(routes, results):
+            lat, lng = (round(matched[0][0], 6), round(matched[0][1], 6)) if matched[0] else (None, None)
+            if (lat, lng) != (route.snapped_latitude, route.snapped_longitude):
+                route.snapped_latitude, route.snapped_longitude = lat, lng
+                changed.append(route)
+        if changed and not options['dry_run']:
+            # the indexed latitude/longitude are untouched, so the spatial index needs no reindex()
+            SavedRoute.objects.bulk_update(changed, ['snapped_latitude', 'snapped_longitude'])
+        return len(routes), len(changed)
@@ -0,0 +1,173 @@
+"""
+apps/navigation/matching.py
+
+HMM map matching (Newson & Krumm style) over the local road graph.
+
+- Hidden states: candidate road edges near each GPS fix (segment KD-tree lookup)
+- Emission: Gaussian on the fix-to-edge distance
+- Transition: exponential on |route distance - great-circle distance|
+
+OnlineMatcher keeps one Viterbi column per driver so each live ping costs
+one column update. match_track runs full Viterbi over a whole track;
+match_tracks fans tracks out to a process pool whose workers memory-map the
+same graph files. Candidates that cannot be reached from the previous column
+stay at -inf; the chain restarts only when no candidate is reachable. Each
+column is shifted so its best score is 0, which keeps scores comparable
+between restarted and continuing chains.
+"""
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+from .geo import haversine_m
+from .roadgraph import ROAD_GRAPH_DIR, RoadGraph, get_road_graph
+
+
+SIGMA_M = getattr(settings, 'NAVIGATION_MATCH_SIGMA_M', 10.0)  # GPS noise
+BETA_M = getattr(settings, 'NAVIGATION_MATCH_BETA_M', 50.0)  # tolerance for route/straight-line mismatch
+SEARCH_RADIUS_M = getattr(settings, 'NAVIGATION_MATCH_RADIUS_M', 60.0)
+MAX_CANDIDATES = 5
+
+
+def emission_logp(distance_m):
+    return -0.5 * (distance_m / SIGMA_M) ** 2
+
+
+def route_distance(graph, a, b, limit):
+    """Network metres from candidate a to candidate b (same tuple layout as candidate_edges)."""
+    edge_a, _, offset_a = a[0], a[1], a[2]
+    edge_b, _, offset_b = b[0], b[1], b[2]
+    if edge_a == edge_b and offset_b >= offset_a:
+        return offset_b - offset_a
+    to_end = float(graph.length_m[edge_a]) - offset_a
+    start = int(graph.indices[edge_a])
+    target = int(graph.edge_src[edge_b])
+    costs = graph.shortest_paths(start, weight='length_m', limit=limit, targets=[target])
+    if target not in costs:
+        return None
+    return to_end + costs[target] + offset_b
+
+
+def transition_logps(graph, prev_candidates, candidates, straight_m):
+    """Matrix [prev][cur] of transition log-probabilities (-inf when unreachable)."""
+    limit = 2.0 * straight_m + 4 * BETA_M
+    table = []
+    for a in prev_candidates:
+        row = []
+        for b in candidates:
+            routed = route_distance(graph, a, b, limit)
+            row.append(-math.inf if routed is None else -abs(routed - straight_m) / BETA_M)
+        table.append(row)
+    return table
+
+
+def viterbi_step(prev_scores, trans, emissions):
+    """Next column -> (scores normalised to a max of 0, back-pointers; all None after an HMM break)."""
+    scores, back = [], []
+    for j, emission in enumerate(emissions):
+        best_i = max(range(len(prev_scores)), key=lambda i: prev_scores[i] + trans[i][j])
+        scores.append(prev_scores[best_i] + trans[best_i][j] + emission)
+        back.append(best_i)
+    top = max(scores)
+    if top == -math.inf:
+        # HMM break: no candidate is reachable, restart the chain at this point
+        scores, back, top = list(emissions), [None] * len(emissions), max(emissions)
+    return [s - top for s in scores], back
+
+
+def match_track(graph, points):
+    """Viterbi over a whole track [(lat, lng), ...] -> [(lat, lng, edge) or None per point]."""
+    columns = []  # per point: (candidates, scores, back-pointers)
+    prev_point = None
+    for lat, lng in points:
+        candidates = graph.candidate_edges(lat, lng, SEARCH_RADIUS_M, MAX_CANDIDATES)
+        if not candidates:
+            columns.append(([], [], []))
+            continue
+        emissions = [emission_logp(c[1]) for c in candidates]
+        prev = next((col for col in reversed(columns) if col[0]), None)
+        if prev is None:
+            top = max(emissions)
+            columns.append((candidates, [e - top for e in emissions], [None] * len(candidates)))
+        else:
+            straight = haversine_m(prev_point[0], prev_point[1], lat, lng)
+            trans = transition_logps(graph, prev[0], candidates, straight)
+            columns.append((candidates, *viterbi_step(prev[1], trans, emissions)))
+        prev_point = (lat, lng)
+
+    # backtrack across the non-empty columns
+    result = [None] * len(columns)
+    j = None
+    for t in range(len(columns) - 1, -1, -1):
+        candidates, scores, back = columns[t]
+        if not candidates:
+            continue
+        if j is None:
+            j = max(range(len(scores)), key=scores.__getitem__)
+        edge, _, _, slat, slng = candidates[j]
+        result[t] = (slat, slng, edge)
+        j = back[j]
+    return result
+
+
+class OnlineMatcher:
+    """Incremental matcher for live pings, one Viterbi column per driver."""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.state = {}  # driver_id -> (last point, candidates, scores)
+
+    def forget(self, driver_id):
+        self.state.pop(driver_id, None)
+
+    def update(self, driver_id, lat, lng):
+        """Match the newest fix given the previous column -> (lat, lng, edge) or None if off-network."""
+        candidates = self.graph.candidate_edges(lat, lng, SEARCH_RADIUS_M, MAX_CANDIDATES)
+        if not candidates:
+            return None
+        emissions = [emission_logp(c[1]) for c in candidates]
+        previous = self.state.get(driver_id)
+        if previous is None:
+            top = max(emissions)
+            scores = [e - top for e in emissions]
+        else:
+            prev_point, prev_candidates, prev_scores = previous
+            straight = haversine_m(prev_point[0], prev_point[1], lat, lng)
+            trans = transition_logps(self.graph, prev_candidates, candidates, straight)
+            scores, _ = viterbi_step(prev_scores, trans, emissions)
+        j = max(range(len(scores)), key=scores.__getitem__)
+        edge, _, _, slat, slng = candidates[j]
+        self.state[driver_id] = ((lat, lng), candidates, scores)
+        return slat, slng, edge
+
+
+_worker_graph = None
+
+
+def _init_worker(path):
+    global _worker_graph
+    _worker_graph = RoadGraph.load(path)
+
+
+def _match_in_worker(points):
+    return match_track(_worker_graph, points)
+
+
+def match_tracks(tracks, graph_dir=ROAD_GRAPH_DIR, workers=None):
+    """Batch-match many tracks in a process pool; each worker memory-maps the graph once."""
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(str(graph_dir),)) as pool:
+        return list(pool.map(_match_in_worker, tracks, chunksize=4))
+
+
+_online = None
+
+
+def get_online_matcher():
+    """Process-wide OnlineMatcher, or None when no road graph is configured."""
+    global _online
+    if _online is None:
+        graph = get_road_graph()
+        if graph is not None:
+            _online = OnlineMatcher(graph)
+    return _online
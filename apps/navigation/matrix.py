@@ -0,0 +1,195 @@
+"""
+apps/navigation/matrix.py
+
+Many-to-many travel time / distance matrix over the local road graph.
+
+Each origin is one one-to-many search (scipy's C Dijkstra when available,
+the pure-Python RoadGraph.shortest_paths otherwise); when there are far
+fewer destinations than origins the searches run backwards from the
+destinations instead, on a cached transposed graph. Forward searches stop
+at a cost bound derived through one of the destinations, so requests
+clustered in one area do not explore the whole graph. Origins that are not in
+the per-origin row cache are split into chunks and solved in a persistent
+process pool whose workers memory-map the graph; small requests are solved
+in-process to skip the pool round trip.
+"""
+import math
+import os
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.conf import settings
+
+from .roadgraph import ROAD_GRAPH_DIR, RoadGraph
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra as csgraph_dijkstra
+except ImportError:  # pure-Python fallback
+    csr_matrix = csgraph_dijkstra = None
+
+
+MATRIX_WORKERS = getattr(settings, 'NAVIGATION_MATRIX_WORKERS', None) or os.cpu_count() or 1
+MATRIX_CACHE_ROWS = getattr(settings, 'NAVIGATION_MATRIX_CACHE_ROWS', 2048)
+MATRIX_MAX_POINTS = getattr(settings, 'NAVIGATION_MATRIX_MAX_POINTS', 500)
+IN_PROCESS_ORIGINS = 8  # below this many uncached origins the pool is not worth it
+
+METRIC_WEIGHTS = {'duration': 'time_s', 'distance': 'length_m'}
+
+_sparse = weakref.WeakKeyDictionary()  # graph -> {(weight, transposed): csr_matrix}
+
+
+def sparse_graph(graph, weight, transposed=False):
+    """The road graph as a cached scipy CSR matrix of `weight` (reversed edges with transposed=True)."""
+    # keyed on the graph itself: an id() could be reused by a later graph once this one is freed
+    matrices = _sparse.setdefault(graph, {})
+    key = (weight, transposed)
+    if key not in matrices:
+        if transposed:
+            matrices[key] = sparse_graph(graph, weight).T.tocsr()
+        else:
+            n = graph.num_nodes
+            matrices[key] = csr_matrix(
+                # csgraph treats explicit zeros as missing edges, so floor the weights
+                (np.maximum(np.asarray(getattr(graph, weight), dtype=np.float64), 1e-3),
+                 np.asarray(graph.indices), np.asarray(graph.indptr)),
+                shape=(n, n),
+            )
+    return matrices[key]
+
+
+def search_limit(graph, origins, destinations, weight):
+    """
+    Cost bound covering every origin -> destination pair, via the destination h nearest their
+    centroid: cost(o, d) <= cost(o, h) + cost(h, d). Two extra searches let the per-origin searches
+    of a request clustered in one city stop near its edge instead of covering the whole graph.
+    """
+    x, y = graph.node_x[destinations], graph.node_y[destinations]
+    hub = int(destinations[np.argmin(np.hypot(x - x.mean(), y - y.mean()))])
+    to_hub = csgraph_dijkstra(sparse_graph(graph, weight, transposed=True), directed=True, indices=hub)
+    from_hub = csgraph_dijkstra(sparse_graph(graph, weight), directed=True, indices=hub)
+    bound = float(to_hub[origins].max() + from_hub[destinations].max())
+    return bound * (1 + 1e-9) if math.isfinite(bound) else np.inf
+
+
+def one_to_many(graph, origins, destinations, weight):
+    """Costs [len(origins), len(destinations)] (inf when unreachable)."""
+    destinations = np.asarray(destinations, dtype=np.int64)
+    if csgraph_dijkstra is not None:
+        origins = np.asarray(origins, dtype=np.int64)
+        unique_dest, dest_index = np.unique(destinations, return_inverse=True)
+        if len(unique_dest) * 2 < len(origins):
+            # far fewer targets than sources: search backwards from each target on the transposed graph
+            rows = csgraph_dijkstra(sparse_graph(graph, weight, transposed=True), directed=True, indices=unique_dest)
+            return np.atleast_2d(rows)[:, origins].T[:, dest_index]
+        rows = csgraph_dijkstra(sparse_graph(graph, weight), directed=True, indices=origins,
+                                limit=search_limit(graph, origins, unique_dest, weight))
+        return np.atleast_2d(rows)[:, destinations]
+    out = np.full((len(origins), len(destinations)), np.inf)
+    targets = set(destinations.tolist())
+    for i, origin in enumerate(origins):
+        costs = graph.shortest_paths(int(origin), weight=weight, targets=targets)
+        out[i] = [costs.get(int(d), math.inf) for d in destinations]
+    return out
+
+
+class RowCache:
+    """LRU of {destination node: cost} rows keyed by (weight, origin node)."""
+
+    def __init__(self, max_rows=MATRIX_CACHE_ROWS):
+        self.max_rows = max_rows
+        self.rows = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, weight, origin, destinations):
+        row = self.rows.get((weight, origin))
+        if row is None or any(d not in row for d in destinations):
+            self.misses += 1
+            return None
+        self.rows.move_to_end((weight, origin))
+        self.hits += 1
+        return [row[d] for d in destinations]
+
+    def put(self, weight, origin, destinations, costs):
+        row = self.rows.setdefault((weight, origin), {})
+        row.update(zip(destinations, costs))
+        self.rows.move_to_end((weight, origin))
+        while len(self.rows) > self.max_rows:
+            self.rows.popitem(last=False)
+
+
+cache = RowCache()
+_pool = None
+_worker_graph = None
+
+
+def _init_worker(path):
+    global _worker_graph
+    _worker_graph = RoadGraph.load(path)
+
+
+def _solve_chunk(args):
+    origins, destinations, weight = args
+    return one_to_many(_worker_graph, origins, destinations, weight)
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=MATRIX_WORKERS, initializer=_init_worker,
+                                    initargs=(str(ROAD_GRAPH_DIR),))
+    return _pool
+
+
+def node_matrix(graph, origin_nodes, dest_nodes, weight, use_pool=True):
+    """Cost matrix between graph nodes, filling the row cache as it goes."""
+    origin_nodes = [int(n) for n in origin_nodes]
+    dest_nodes = [int(n) for n in dest_nodes]
+    out = np.empty((len(origin_nodes), len(dest_nodes)))
+    missing = {}
+    for i, origin in enumerate(origin_nodes):
+        row = cache.get(weight, origin, dest_nodes)
+        if row is None:
+            missing.setdefault(origin, []).append(i)
+        else:
+            out[i] = row
+    if not missing:
+        return out
+
+    todo = list(missing)
+    if use_pool and len(todo) >= IN_PROCESS_ORIGINS and MATRIX_WORKERS > 1:
+        size = max(1, math.ceil(len(todo) / MATRIX_WORKERS))
+        chunks = [todo[i:i + size] for i in range(0, len(todo), size)]
+        results = get_pool().map(_solve_chunk, [(chunk, dest_nodes, weight) for chunk in chunks])
+        rows = np.vstack(list(results))
+    else:
+        rows = one_to_many(graph, todo, dest_nodes, weight)
+
+    for origin, row in zip(todo, rows):
+        cache.put(weight, origin, dest_nodes, row.tolist())
+        for i in missing[origin]:
+            out[i] = row
+    return out
+
+
+def travel_matrix(graph, origins, destinations, metrics=('duration',)):
+    """
+    Matrix between coordinates: snaps each point to its nearest node, then
+    returns {"durations": [[s]], "distances": [[m]]} for the requested metrics
+    (None where unreachable) plus the snap distances.
+    """
+    origin_snaps = [graph.nearest_node(lat, lng) for lat, lng in origins]
+    dest_snaps = [graph.nearest_node(lat, lng) for lat, lng in destinations]
+    origin_nodes = [n for n, _ in origin_snaps]
+    dest_nodes = [n for n, _ in dest_snaps]
+    result = {}
+    for metric in metrics:
+        costs = node_matrix(graph, origin_nodes, dest_nodes, METRIC_WEIGHTS[metric])
+        result[f'{metric}s'] = [
+            [None if math.isinf(c) else round(c, 1) for c in row] for row in costs.tolist()
+        ]
+    result['origin_snap_m'] = [round(d, 1) for _, d in origin_snaps]
+    result['destination_snap_m'] = [round(d, 1) for _, d in dest_snaps]
+    return result
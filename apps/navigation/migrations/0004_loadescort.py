@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('navigation', '0003_driverpresence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoadEscort',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('max_gap_m', models.PositiveIntegerField(default=500)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('escort', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='escorted_loads', to=settings.AUTH_USER_MODEL)),
+                ('load', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='escorts', to='navigation.oversizedloaddetail')),
+            ],
+            options={
+                'unique_together': {('load', 'escort')},
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('navigation', '0005_routeassignment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savedroute',
+            name='duration_s',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='savedroute',
+            name='polyline',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.CreateModel(
+            name='RouteStop',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField(default=0)),
+                ('name', models.CharField(blank=True, default='', max_length=255)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('service_s', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stops', to='navigation.savedroute')),
+            ],
+            options={
+                'ordering': ['route', 'sequence'],
+                'indexes': [models.Index(fields=['route', 'sequence'], name='navigation__route_i_7266e8_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:57
+
+import math
+
+from django.db import migrations, models
+
+# Frozen copy of spatial_index at the time of this migration; runtime code may change later.
+INDEXED = ('SavedRoute', 'OversizedLoadDetail')
+GRID_DEG = 0.05
+GRID_MAX_CELLS = 1024
+WIDE = 1 << 30
+
+
+def rtree_table(model):
+    return f'{model._meta.db_table}_rtree'
+
+
+def rtree_supported(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute('CREATE VIRTUAL TABLE temp.navigation_rtree_probe USING rtree(id, a, b)')
+            cursor.execute('DROP TABLE temp.navigation_rtree_probe')
+        except Exception:
+            return False
+    return True
+
+
+def bbox_of(apps, name, instance):
+    lats, lngs = [], []
+    if name == 'SavedRoute':
+        stops = apps.get_model('navigation', 'RouteStop').objects.filter(route_id=instance.pk)
+        for lat, lng in stops.values_list('latitude', 'longitude'):
+            lats.append(lat)
+            lngs.append(lng)
+    if not lats or (instance.latitude, instance.longitude) != (0.0, 0.0):
+        lats.append(instance.latitude)
+        lngs.append(instance.longitude)
+    return min(lats), max(lats), min(lngs), max(lngs)
+
+
+def grid_cells(bbox):
+    min_lat, max_lat, min_lng, max_lng = bbox
+    lat0, lat1 = math.floor(min_lat / GRID_DEG), math.floor(max_lat / GRID_DEG)
+    lng0, lng1 = math.floor(min_lng / GRID_DEG), math.floor(max_lng / GRID_DEG)
+    if (lat1 - lat0 + 1) * (lng1 - lng0 + 1) > GRID_MAX_CELLS:
+        return [(WIDE, WIDE)]
+    return [(a, b) for a in range(lat0, lat1 + 1) for b in range(lng0, lng1 + 1)]
+
+
+def build_index(apps, schema_editor):
+    connection = schema_editor.connection
+    grid_model = apps.get_model('navigation', 'SpatialGridEntry')
+    use_rtree = rtree_supported(connection)
+    for name in INDEXED:
+        model = apps.get_model('navigation', name)
+        if use_rtree:
+            with connection.cursor() as cursor:
+                cursor.execute(f'CREATE VIRTUAL TABLE IF NOT EXISTS {rtree_table(model)} '
+                               f'USING rtree(id, min_lat, max_lat, min_lng, max_lng)')
+        for instance in model.objects.all().iterator():
+            bbox = bbox_of(apps, name, instance)
+            if use_rtree:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'INSERT OR REPLACE INTO {rtree_table(model)} '
+                                   f'(id, min_lat, max_lat, min_lng, max_lng) VALUES (%s, %s, %s, %s, %s)',
+                                   [instance.pk, *bbox])
+                continue
+            grid_model.objects.bulk_create([
+                grid_model(kind=model._meta.db_table, object_id=instance.pk, cell_lat=a, cell_lng=b,
+                           min_lat=bbox[0], max_lat=bbox[1], min_lng=bbox[2], max_lng=bbox[3])
+                for a, b in grid_cells(bbox)
+            ])
+
+
+def drop_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for name in INDEXED:
+            cursor.execute(f'DROP TABLE IF EXISTS {rtree_table(apps.get_model("navigation", name))}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('navigation', '0006_routestop'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpatialGridEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=64)),
+                ('object_id', models.BigIntegerField()),
+                ('cell_lat', models.IntegerField()),
+                ('cell_lng', models.IntegerField()),
+                ('min_lat', models.FloatField()),
+                ('max_lat', models.FloatField()),
+                ('min_lng', models.FloatField()),
+                ('max_lng', models.FloatField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'cell_lat', 'cell_lng'], name='navigation__kind_a385c4_idx'), models.Index(fields=['kind', 'object_id'], name='navigation__kind_501293_idx')],
+            },
+        ),
+        migrations.RunPython(build_index, drop_index),
+    ]
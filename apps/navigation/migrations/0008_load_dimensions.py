@@ -0,0 +1,131 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:59
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of apps.navigation.dimensions.parse_dimensions as of this migration; the values
+# backfilled here must not follow later edits to the runtime parser.
+UNITS = {
+    'm': 1.0, 'meter': 1.0, 'meters': 1.0, 'metre': 1.0, 'metres': 1.0,
+    'cm': 0.01, 'mm': 0.001,
+    'ft': 0.3048, 'foot': 0.3048, 'feet': 0.3048, "'": 0.3048,
+    'in': 0.0254, 'inch': 0.0254, 'inches': 0.0254, '"': 0.0254,
+}
+UNIT_NAMES = {'meter': 'm', 'meters': 'm', 'metre': 'm', 'metres': 'm', 'foot': 'ft', 'feet': 'ft',
+              "'": 'ft', 'inch': 'in', 'inches': 'in', '"': 'in'}
+LABELS = (
+    ('length_m', re.compile(r'\b(?:length|len|long|l)\b')),
+    ('width_m', re.compile(r'\b(?:width|wide|w)\b')),
+    ('height_m', re.compile(r'\b(?:height|high|tall|h)\b')),
+)
+SLOTS = ('length_m', 'width_m', 'height_m')
+MAX_M = 100.0  # anything longer is a typo, not a load
+
+_UNIT = r"(meters?|metres?|mm|cm|m|feet|foot|ft|inch(?:es)?|in|'|\")"
+QUANTITY = re.compile(
+    r'(\d+(?:[.,]\d+)?)\s*' + _UNIT + r'?'
+    r"(?:\s*(\d+(?:[.,]\d+)?)\s*(inch(?:es)?|in|\"))?"
+)
+SPLIT = re.compile(r'\s*(?:[x×*,;/|]|\bby\b)\s*')
+
+
+def _number(text):
+    return float(text.replace(',', '.'))
+
+
+def parse_dimensions(text):
+    result = {slot: None for slot in SLOTS}
+    result['dimension_unit'] = ''
+    if not text:
+        return result
+    text = text.lower().replace('’', "'").replace('”', '"')
+    # decimal commas ("4,5 m") would be read as separators otherwise
+    text = re.sub(r'(\d),(\d)(?!\d)', r'\1.\2', text)
+
+    parts = []
+    for part in SPLIT.split(text):
+        match = QUANTITY.search(part)
+        if match is None:
+            continue
+        label = next((slot for slot, pattern in LABELS if pattern.search(part[:match.start()] + ' ' + part[match.end():])), None)
+        parts.append((label, match))
+    if not parts:
+        return result
+
+    written_units = [m.group(2) for _, m in parts if m.group(2)]
+    default_unit = written_units[-1] if written_units else 'm'
+    result['dimension_unit'] = UNIT_NAMES.get(default_unit, default_unit) if written_units else ''
+
+    free = [slot for slot in SLOTS if not any(label == slot for label, _ in parts)]
+    for label, match in parts:
+        value = _number(match.group(1)) * UNITS[match.group(2) or default_unit]
+        if match.group(3):
+            value += _number(match.group(3)) * UNITS[match.group(4)]
+        slot = label if label and result[label] is None else (free.pop(0) if free else None)
+        if slot is not None and 0 < value <= MAX_M:
+            result[slot] = round(value, 3)
+    return result
+
+
+def backfill_dimensions(apps, schema_editor):
+    OversizedLoadDetail = apps.get_model('navigation', 'OversizedLoadDetail')
+    batch = []
+    for load in OversizedLoadDetail.objects.exclude(dimensions='').only('id', 'dimensions').iterator(chunk_size=2000):
+        for field, value in parse_dimensions(load.dimensions).items():
+            setattr(load, field, value)
+        batch.append(load)
+        if len(batch) >= 2000:
+            OversizedLoadDetail.objects.bulk_update(batch, ['length_m', 'width_m', 'height_m', 'dimension_unit'])
+            batch = []
+    if batch:
+        OversizedLoadDetail.objects.bulk_update(batch, ['length_m', 'width_m', 'height_m', 'dimension_unit'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('navigation', '0007_spatial_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='oversizedloaddetail',
+            name='dimension_unit',
+            field=models.CharField(blank=True, default='', max_length=8),
+        ),
+        migrations.AddField(
+            model_name='oversizedloaddetail',
+            name='height_m',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='oversizedloaddetail',
+            name='length_m',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='oversizedloaddetail',
+            name='width_m',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='oversizedloaddetail',
+            index=models.Index(fields=['status', 'height_m'], name='navigation__status_056059_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='oversizedloaddetail',
+            index=models.Index(fields=['status', 'width_m'], name='navigation__status_5926ec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='oversizedloaddetail',
+            index=models.Index(fields=['status', 'length_m'], name='navigation__status_c26e07_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='oversizedloaddetail',
+            index=models.Index(fields=['status', 'weight'], name='navigation__status_3c01d1_idx'),
+        ),
+        migrations.RunPython(backfill_dimensions, migrations.RunPython.noop),
+    ]
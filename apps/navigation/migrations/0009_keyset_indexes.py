@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('navigation', '0008_load_dimensions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='oversizedloaddetail',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='navigation__user_id_a160ac_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savedroute',
+            index=models.Index(fields=['user', '-updated_at', '-id'], name='navigation__user_id_9119b5_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:08
+
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copies of history.bucket_of / cell_of as of this migration; the keys
+# written here must not follow later edits to the runtime code.
+BUCKET_SECONDS = 900
+CELL_DEG = 0.01
+CELL_COLUMNS = int(round(360 / CELL_DEG)) + 1
+
+
+def bucket_of(ts):
+    return int(ts // BUCKET_SECONDS)
+
+
+def cell_of(lat, lng):
+    return math.floor((lat + 90) / CELL_DEG) * CELL_COLUMNS + math.floor((lng + 180) / CELL_DEG)
+
+
+def fill_keys(apps, schema_editor):
+    LocationPing = apps.get_model('navigation', 'LocationPing')
+    batch = []
+    for ping in LocationPing.objects.only('id', 'latitude', 'longitude', 'recorded_at').iterator(chunk_size=5000):
+        ping.bucket = bucket_of(ping.recorded_at.timestamp())
+        ping.cell = cell_of(ping.latitude, ping.longitude)
+        batch.append(ping)
+        if len(batch) >= 5000:
+            LocationPing.objects.bulk_update(batch, ['bucket', 'cell'])
+            batch = []
+    if batch:
+        LocationPing.objects.bulk_update(batch, ['bucket', 'cell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('navigation', '0010_locationping'),
+        ('subscriptions', '0004_team_teammember'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='locationping',
+            name='bucket',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='locationping',
+            name='cell',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='locationping',
+            index=models.Index(fields=['bucket', 'cell'], name='navigation__bucket_0beaaa_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('navigation', '0012_historycompaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DwellCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField()),
+                ('hour', models.IntegerField()),
+                ('row', models.IntegerField()),
+                ('col', models.IntegerField()),
+                ('team', models.IntegerField(default=0)),
+                ('seconds', models.FloatField(default=0.0)),
+                ('pings', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('level', 'hour', 'row', 'col', 'team'), name='navigation_dwellcell_key')],
+            },
+        ),
+    ]
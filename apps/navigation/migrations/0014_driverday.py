@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('navigation', '0013_dwellcell'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriverDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('team', models.IntegerField(default=0)),
+                ('day', models.DateField()),
+                ('distance_m', models.FloatField(default=0.0)),
+                ('driving_s', models.FloatField(default=0.0)),
+                ('pings', models.IntegerField(default=0)),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('team', 'day', 'driver'), name='navigation_driverday_key')],
+            },
+        ),
+    ]
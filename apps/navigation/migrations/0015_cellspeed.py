@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('navigation', '0014_driverday'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CellSpeed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cell', models.BigIntegerField()),
+                ('hour_of_week', models.PositiveSmallIntegerField()),
+                ('speed_sum', models.FloatField(default=0.0)),
+                ('samples', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('cell', 'hour_of_week'), name='navigation_cellspeed_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('navigation', '0015_cellspeed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savedroute',
+            name='snapped_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='savedroute',
+            name='snapped_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
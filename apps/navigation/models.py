@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from .spatial_index import SpatialQuerySet
+
 User = get_user_model()
 
 class SavedRoute(models.Model):
@@ -9,12 +11,19 @@ class SavedRoute(models.Model):
     name = models.CharField(max_length=255)
     latitude = models.FloatField(default=0.0)  # Add default
     longitude = models.FloatField(default=0.0)  # Add default
+    snapped_latitude = models.FloatField(null=True, blank=True)  # latitude/longitude matched onto the road graph
+    snapped_longitude = models.FloatField(null=True, blank=True)
+    polyline = models.TextField(blank=True, default='')  # road geometry through the stops, in stop order
+    duration_s = models.FloatField(null=True, blank=True)  # travel time of that geometry
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = SpatialQuerySet.as_manager()
     
     class Meta:
         unique_together = ('user', 'name')
         ordering = ['-updated_at']
+        indexes = [models.Index(fields=['user', '-updated_at', '-id'])]  # keyset pagination
     
     def __str__(self):
         return f"{self.user.email} - {self.name}"
@@ -27,6 +36,11 @@ class OversizedLoadDetail(models.Model):
     description = models.TextField(blank=True, default='')
     weight = models.FloatField(null=True, blank=True)  # in kg
     dimensions = models.CharField(max_length=255, blank=True, default='')
+    # numeric dimensions in metres, parsed from `dimensions` when not given explicitly
+    length_m = models.FloatField(null=True, blank=True)
+    width_m = models.FloatField(null=True, blank=True)
+    height_m = models.FloatField(null=True, blank=True)
+    dimension_unit = models.CharField(max_length=8, blank=True, default='')  # unit the dimensions were written in
     latitude = models.FloatField(default=0.0)
     longitude = models.FloatField(default=0.0)
     status = models.CharField(max_length=50, choices=[
@@ -36,9 +50,192 @@ class OversizedLoadDetail(models.Model):
     ], default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = SpatialQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id']),  # keyset pagination
+            models.Index(fields=['status', 'height_m']),
+            models.Index(fields=['status', 'width_m']),
+            models.Index(fields=['status', 'length_m']),
+            models.Index(fields=['status', 'weight']),
+        ]
     
     def __str__(self):
-        return f"{self.user.email} - {self.title}"
\ No newline at end of file
+        return f"{self.user.email} - {self.title}"
+
+class DriverPresence(models.Model):
+    """Last known online/offline state of a driver (written in batches by the presence loop)."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='presence')
+    is_online = models.BooleanField(default=False)
+    last_seen = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.email} - {'online' if self.is_online else 'offline'}"
+
+
+class LoadEscort(models.Model):
+    """Escort vehicle (driver) travelling with an oversized load."""
+    load = models.ForeignKey(OversizedLoadDetail, on_delete=models.CASCADE, related_name='escorts')
+    escort = models.ForeignKey(User, on_delete=models.CASCADE, related_name='escorted_loads')
+    max_gap_m = models.PositiveIntegerField(default=500)  # alert when the escort falls further behind
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('load', 'escort')
+
+    def __str__(self):
+        return f"{self.load.title} - escort {self.escort.email}"
+
+
+class RouteAssignment(models.Model):
+    """Planned route assigned to a driver; live pings are checked against its corridor."""
+    driver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='route_assignments')
+    saved_route = models.ForeignKey(SavedRoute, on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='assignments')
+    polyline = models.TextField()  # Google encoded polyline, precision 5
+    corridor_m = models.PositiveIntegerField(default=100)
+    is_active = models.BooleanField(default=True)
+    assigned_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='route_assignments_made')
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['driver', 'is_active'])]
+
+    def __str__(self):
+        return f"{self.driver.email} - assignment {self.id}"
+
+
+class RouteStop(models.Model):
+    """One drop on a multi-stop saved route, visited in `sequence` order."""
+    route = models.ForeignKey(SavedRoute, on_delete=models.CASCADE, related_name='stops')
+    sequence = models.PositiveIntegerField(default=0)
+    name = models.CharField(max_length=255, blank=True, default='')
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    service_s = models.PositiveIntegerField(default=0)  # time spent at the stop
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['route', 'sequence']
+        indexes = [models.Index(fields=['route', 'sequence'])]
+
+    def __str__(self):
+        return f"{self.route.name} - stop {self.sequence}"
+
+
+class SpatialGridEntry(models.Model):
+    """Grid-cell fallback of the R-tree index: one row per cell an object's box covers."""
+    kind = models.CharField(max_length=64)  # db_table of the indexed model
+    object_id = models.BigIntegerField()
+    cell_lat = models.IntegerField()
+    cell_lng = models.IntegerField()
+    min_lat = models.FloatField()
+    max_lat = models.FloatField()
+    min_lng = models.FloatField()
+    max_lng = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'cell_lat', 'cell_lng']),
+            models.Index(fields=['kind', 'object_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} @ ({self.cell_lat}, {self.cell_lng})"
+
+
+class LocationPing(models.Model):
+    """One accepted GPS fix from a driver (append-only history, written in batches)."""
+    driver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='location_pings')
+    team = models.ForeignKey('subscriptions.Team', on_delete=models.SET_NULL, null=True, blank=True,
+                             related_name='+', db_index=False)  # team at the time of the fix
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    speed = models.FloatField(null=True, blank=True)  # m/s
+    heading = models.FloatField(null=True, blank=True)  # degrees from north
+    recorded_at = models.DateTimeField()  # fix time (client clock when sent, else server receipt)
+    bucket = models.IntegerField(default=0)  # history.bucket_of(recorded_at)
+    cell = models.BigIntegerField(default=0)  # history.cell_of(latitude, longitude)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['driver', 'recorded_at']),
+            models.Index(fields=['team', 'recorded_at']),
+            models.Index(fields=['bucket', 'cell']),  # spatio-temporal lookups
+        ]
+
+    def __str__(self):
+        return f"{self.driver_id} @ {self.recorded_at:%Y-%m-%d %H:%M:%S}"
+
+
+
+class HistoryCompaction(models.Model):
+    """Progress of retention.compact(): pings before `compacted_until` are already at `resolution_s`."""
+    resolution_s = models.PositiveIntegerField(unique=True)
+    compacted_until = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.resolution_s}s until {self.compacted_until:%Y-%m-%d %H:%M}"
+
+
+class DwellCell(models.Model):
+    """Driver time spent in one heatmap grid cell during one hour (maintained incrementally by heatmap.py)."""
+    level = models.PositiveSmallIntegerField()  # index into NAVIGATION_HEATMAP_LEVELS
+    hour = models.IntegerField()  # epoch seconds // 3600
+    row = models.IntegerField()
+    col = models.IntegerField()
+    team = models.IntegerField(default=0)  # team id of the pings, 0 = none
+    seconds = models.FloatField(default=0.0)
+    pings = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['level', 'hour', 'row', 'col', 'team'], name='navigation_dwellcell_key'),
+        ]
+
+    def __str__(self):
+        return f"L{self.level} h{self.hour} ({self.row}, {self.col}): {self.seconds:.0f}s"
+
+
+class DriverDay(models.Model):
+    """Mileage and driving time of one driver on one day (TIME_ZONE), maintained by rollups.py."""
+    team = models.IntegerField(default=0)  # team id of the pings, 0 = none
+    day = models.DateField()
+    driver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rollups')
+    distance_m = models.FloatField(default=0.0)
+    driving_s = models.FloatField(default=0.0)
+    pings = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # (team, day) first: a team dashboard is one range read
+            models.UniqueConstraint(fields=['team', 'day', 'driver'], name='navigation_driverday_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.driver_id} {self.day}: {self.distance_m / 1000:.1f} km"
+
+
+class CellSpeed(models.Model):
+    """Moving ping speeds summed per history cell and hour of week (segment speeds for eta.py)."""
+    cell = models.BigIntegerField()  # history.cell_of(lat, lng)
+    hour_of_week = models.PositiveSmallIntegerField()  # 0 = Monday 00:00 in TIME_ZONE
+    speed_sum = models.FloatField(default=0.0)  # m/s
+    samples = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cell', 'hour_of_week'], name='navigation_cellspeed_key'),
+        ]
+
+    def __str__(self):
+        return f"cell {self.cell} h{self.hour_of_week}: {self.speed_sum / max(self.samples, 1):.1f} m/s"
@@ -0,0 +1,98 @@
+"""
+apps/navigation/outbox.py
+
+Bounded outbound queue for a single WebSocket connection.
+
+Frames pushed with a key (e.g. ('location', driver_id)) replace the queued frame
+with the same key instead of being appended, so a slow viewer only ever gets
+the latest position of each driver. When the queue is full the oldest frame is
+dropped. A connection that stays saturated longer than the threshold should be
+closed by its consumer.
+"""
+import asyncio
+import itertools
+import time
+import weakref
+
+from django.conf import settings
+
+
+SEND_QUEUE_SIZE = getattr(settings, 'NAVIGATION_SEND_QUEUE_SIZE', 64)
+SEND_QUEUE_SATURATION_SECONDS = getattr(settings, 'NAVIGATION_SEND_QUEUE_SATURATION_SECONDS', 10)
+
+_queues = weakref.WeakSet()
+
+
+class SendQueue:
+    """Insertion-ordered frame queue with per-key replacement and drop-oldest overflow."""
+
+    def __init__(self, maxsize=SEND_QUEUE_SIZE, saturation_seconds=SEND_QUEUE_SATURATION_SECONDS, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.saturation_seconds = saturation_seconds
+        self.clock = clock
+        self._frames = {}  # key -> text, dict keeps FIFO order
+        self._seq = itertools.count()
+        self._ready = asyncio.Event()
+        self.sent = 0
+        self.replaced = 0
+        self.dropped = 0
+        self.saturated_since = None
+        _queues.add(self)
+
+    def __len__(self):
+        return len(self._frames)
+
+    def put(self, text, key=None):
+        """Queue a frame; a keyed frame overwrites the pending frame with the same key."""
+        if key is not None and key in self._frames:
+            self._frames[key] = text
+            self.replaced += 1
+            return
+        if len(self._frames) >= self.maxsize:
+            del self._frames[next(iter(self._frames))]
+            self.dropped += 1
+        self._frames[next(self._seq) if key is None else key] = text
+        self._ready.set()
+        self._update_saturation()
+
+    async def get(self):
+        while not self._frames:
+            self._ready.clear()
+            await self._ready.wait()
+        text = self._frames.pop(next(iter(self._frames)))
+        self._update_saturation()
+        return text
+
+    def _update_saturation(self):
+        if len(self._frames) >= self.maxsize:
+            if self.saturated_since is None:
+                self.saturated_since = self.clock()
+        else:
+            self.saturated_since = None
+
+    def is_stalled(self):
+        """True when the queue has been full for longer than the saturation threshold."""
+        return (self.saturated_since is not None
+                and self.clock() - self.saturated_since > self.saturation_seconds)
+
+    def stats(self):
+        return {
+            "depth": len(self._frames),
+            "max_depth": self.maxsize,
+            "sent": self.sent,
+            "replaced": self.replaced,
+            "dropped": self.dropped,
+        }
+
+
+def totals():
+    """Aggregate queue counters across every live connection in this process."""
+    data = {"connections": 0, "depth": 0, "sent": 0, "replaced": 0, "dropped": 0, "saturated": 0}
+    for queue in list(_queues):
+        data["connections"] += 1
+        data["depth"] += len(queue)
+        data["sent"] += queue.sent
+        data["replaced"] += queue.replaced
+        data["dropped"] += queue.dropped
+        data["saturated"] += queue.saturated_since is not None
+    return data
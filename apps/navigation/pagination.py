@@ -0,0 +1,91 @@
+"""
+apps/navigation/pagination.py
+
+Keyset (seek) pagination for the SavedRoute / OversizedLoadDetail APIs.
+
+The cursor is the (timestamp, id) of the last row on the page; the next page
+is `WHERE (ts, id) < (cursor)` in the same descending order, served straight
+from a (user, ts, id) composite index. Every page costs the same, however
+deep, unlike OFFSET which reads and discards all earlier rows.
+"""
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(BasePagination):
+    """Forward-only cursor over a descending (ordering_field, id) key."""
+    ordering_field = 'updated_at'
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, instance):
+        key = [getattr(instance, self.ordering_field).isoformat(), instance.pk]
+        return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, value):
+        try:
+            ts, pk = json.loads(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)))
+            ts = parse_datetime(ts)
+            if ts is None:
+                raise ValueError
+            return ts, int(pk)
+        except (ValueError, TypeError):
+            raise NotFound('Invalid cursor.')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        field = self.ordering_field
+        queryset = queryset.order_by(f'-{field}', '-id')
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            ts, pk = self.decode_cursor(cursor)
+            # the redundant `<=` bound lets the database seek the index instead of scanning the OR
+            queryset = queryset.filter(Q(**{f'{field}__lte': ts}),
+                                       Q(**{f'{field}__lt': ts}) | Q(**{field: ts, 'id__lt': pk}))
+        size = self.get_page_size(request)
+        rows = list(queryset[:size + 1])  # one extra row tells whether a next page exists
+        self.has_next = len(rows) > size
+        self.page = rows[:size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        params = self.request.query_params.copy()
+        params[self.cursor_query_param] = self.encode_cursor(self.page[-1])
+        return self.request.build_absolute_uri(self.request.path) + '?' + params.urlencode()
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class SavedRoutePagination(KeysetPagination):
+    ordering_field = 'updated_at'
+
+
+class OversizedLoadPagination(KeysetPagination):
+    ordering_field = 'created_at'
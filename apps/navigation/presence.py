@@ -0,0 +1,245 @@
+"""
+apps/navigation/presence.py
+
+Driver presence (online/offline) kept in process memory.
+
+- TimingWheel: hierarchical timing wheel, schedule/cancel O(1), advance O(1) per tick
+- PresenceTracker: last-seen timestamps, per-team online counters, pending transitions
+- presence_loop: background task that expires stale drivers, persists transitions
+  in batches and broadcasts them to the driver's channel group
+"""
+import asyncio
+import time
+from collections import Counter
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from .fleet import OFFLINE, ONLINE, fleet
+
+
+PRESENCE_TIMEOUT = getattr(settings, 'NAVIGATION_PRESENCE_TIMEOUT', 30)  # seconds without heartbeat
+PRESENCE_TICK = getattr(settings, 'NAVIGATION_PRESENCE_TICK', 1.0)  # seconds per wheel slot
+
+
+class TimingWheel:
+    """Hierarchical timing wheel keyed by arbitrary hashable keys."""
+
+    def __init__(self, tick=1.0, slots=64, levels=3, now=None):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._wheels = [[set() for _ in range(slots)] for _ in range(levels)]
+        self._where = {}  # key -> (level, slot, deadline_tick)
+        self._current = int((time.monotonic() if now is None else now) // tick)
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    def schedule(self, key, deadline):
+        """(Re)schedule `key` to expire at monotonic time `deadline`."""
+        self.cancel(key)
+        target = max(int(-(-deadline // self.tick)), self._current + 1)
+        self._place(key, target)
+
+    def cancel(self, key):
+        where = self._where.pop(key, None)
+        if where is not None:
+            self._wheels[where[0]][where[1]].discard(key)
+
+    def _place(self, key, target):
+        delta = target - self._current
+        level, span = 0, self.slots
+        while level < self.levels - 1 and delta >= span:
+            level += 1
+            span *= self.slots
+        # beyond the top wheel: park in the furthest slot, it cascades again later
+        slot_tick = min(target, self._current + span - 1)
+        slot = (slot_tick // (self.slots ** level)) % self.slots
+        self._wheels[level][slot].add(key)
+        self._where[key] = (level, slot, target)
+
+    def advance(self, now):
+        """Move the wheel forward to `now` and return the keys that expired."""
+        target = int(now // self.tick)
+        expired = []
+        while self._current < target:
+            self._current += 1
+            current = self._current
+            # cascade higher wheels whose slot boundary we just crossed
+            for level in range(self.levels - 1, 0, -1):
+                width = self.slots ** level
+                if current % width:
+                    continue
+                slot = (current // width) % self.slots
+                bucket = self._wheels[level][slot]
+                if not bucket:
+                    continue
+                self._wheels[level][slot] = set()
+                for key in bucket:
+                    deadline = self._where.pop(key)[2]
+                    if deadline <= current:
+                        expired.append(key)
+                    else:
+                        self._place(key, deadline)
+            slot = current % self.slots
+            bucket = self._wheels[0][slot]
+            if bucket:
+                self._wheels[0][slot] = set()
+                for key in bucket:
+                    del self._where[key]
+                    expired.append(key)
+        return expired
+
+
+class PresenceTracker:
+    """In-memory presence state for every driver connected to this process."""
+
+    def __init__(self, timeout=PRESENCE_TIMEOUT, tick=PRESENCE_TICK, clock=time.monotonic, wall=time.time):
+        self.timeout = timeout
+        self.clock = clock
+        self.wall = wall
+        self.wheel = TimingWheel(tick=tick, now=clock())
+        self.last_seen = {}  # user_id -> epoch seconds
+        self.teams = {}  # user_id -> team_id (None for solo drivers)
+        self.online = set()
+        self.online_by_team = Counter()
+        self.connections = Counter()  # user_id -> open sockets
+        self._pending = {}  # user_id -> (is_online, last_seen), coalesced until flush
+
+    def connect(self, user_id, team_id=None):
+        self.connections[user_id] += 1
+        self.teams[user_id] = team_id
+        self.touch(user_id)
+
+    def touch(self, user_id):
+        """Record a heartbeat (or any frame) from the driver."""
+        self.last_seen[user_id] = self.wall()
+        self.wheel.schedule(user_id, self.clock() + self.timeout)
+        if user_id not in self.online:
+            self._set_online(user_id, True)
+
+    def disconnect(self, user_id):
+        """Close one of the user's sockets -> True when it was the last one."""
+        self.connections[user_id] -= 1
+        if self.connections[user_id] > 0:
+            return False
+        del self.connections[user_id]
+        self.wheel.cancel(user_id)
+        if user_id in self.online:
+            self._set_online(user_id, False)
+        # already expired by the wheel, or just marked offline: drop the per-driver state either way
+        self.teams.pop(user_id, None)
+        self.last_seen.pop(user_id, None)
+        return True
+
+    def tick(self):
+        """Expire drivers whose heartbeat is older than the timeout."""
+        expired = self.wheel.advance(self.clock())
+        for user_id in expired:
+            if user_id in self.online:
+                self._set_online(user_id, False)
+        return expired
+
+    def _set_online(self, user_id, is_online):
+        team_id = self.teams.get(user_id)
+        self._pending[user_id] = (is_online, self.last_seen.get(user_id))
+        if is_online:
+            self.online.add(user_id)
+            self.online_by_team[team_id] += 1
+            return
+        self.online.discard(user_id)
+        self.online_by_team[team_id] -= 1
+        if self.online_by_team[team_id] <= 0:
+            del self.online_by_team[team_id]
+        if user_id not in self.connections:
+            # socket gone: nothing left to track until the driver reconnects
+            self.teams.pop(user_id, None)
+            self.last_seen.pop(user_id, None)
+
+    def drain(self):
+        """Return and clear the transitions recorded since the last drain."""
+        pending, self._pending = self._pending, {}
+        return pending
+
+    def is_online(self, user_id):
+        return user_id in self.online
+
+    def counts(self, team_id=None):
+        data = {"online": len(self.online)}
+        if team_id is not None:
+            data["team_online"] = self.online_by_team.get(team_id, 0)
+        return data
+
+
+tracker = PresenceTracker()
+_loop_task = None
+
+
+def team_id_for_user(user_id):
+    """Team the driver belongs to, either as an active member or as the subscription owner."""
+    from apps.subscriptions.models import Team, TeamMember
+
+    team_id = (TeamMember.objects.filter(user_id=user_id, status='active')
+               .values_list('team_id', flat=True).first())
+    if team_id is None:
+        team_id = Team.objects.filter(subscription__user_id=user_id).values_list('id', flat=True).first()
+    return team_id
+
+
+def persist_transitions(pending):
+    """Write a batch of presence transitions with a single upsert."""
+    from datetime import datetime, timezone as dt_timezone
+    from .models import DriverPresence
+
+    rows = [
+        DriverPresence(
+            user_id=user_id,
+            is_online=is_online,
+            last_seen=datetime.fromtimestamp(last_seen, tz=dt_timezone.utc) if last_seen else None,
+        )
+        for user_id, (is_online, last_seen) in pending.items()
+    ]
+    DriverPresence.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['is_online', 'last_seen', 'updated_at'],
+    )
+
+
+async def flush(channel_layer):
+    pending = tracker.drain()
+    if not pending:
+        return
+    try:
+        await database_sync_to_async(persist_transitions)(pending)
+    except Exception as e:
+        print(f"[Presence] Persist error: {type(e).__name__}: {e}")
+    for user_id, (is_online, last_seen) in pending.items():
+        fleet.set_status(user_id, ONLINE if is_online else OFFLINE)
+        await channel_layer.group_send(f'driver_{user_id}', {
+            'type': 'presence_update',
+            'user_id': user_id,
+            'online': is_online,
+            'last_seen': last_seen,
+        })
+
+
+async def presence_loop(channel_layer):
+    """Tick the timing wheel and flush transitions once per tick."""
+    while True:
+        await asyncio.sleep(tracker.wheel.tick)
+        tracker.tick()
+        await flush(channel_layer)
+
+
+def ensure_presence_loop(channel_layer):
+    """Start the presence loop once per process (called from consumer connect)."""
+    global _loop_task
+    if _loop_task is None or _loop_task.done():
+        _loop_task = asyncio.get_running_loop().create_task(presence_loop(channel_layer))
+    return _loop_task
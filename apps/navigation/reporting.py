@@ -0,0 +1,121 @@
+"""
+apps/navigation/reporting.py
+
+Adaptive reporting interval for driver clients.
+
+The server keeps a tiny motion state per driver (last fix, speed, heading) and
+how many viewers are watching that driver. From those it recommends how often
+the client should send `live_tracking`: slow when parked or crawling in a
+straight line, fast during turns or when a dispatcher has the tracker open.
+The recommendation is snapped to a few fixed steps and only pushed when the
+step changes, so clients are not spammed.
+"""
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from .geo import bearing_deg, haversine_m, heading_delta
+
+
+INTERVAL_STEPS = getattr(settings, 'NAVIGATION_REPORTING_STEPS', (1, 2, 3, 5, 10, 15, 30))  # seconds
+DEFAULT_INTERVAL = getattr(settings, 'NAVIGATION_REPORTING_DEFAULT', 5)
+WATCHED_MAX_INTERVAL = getattr(settings, 'NAVIGATION_REPORTING_WATCHED_MAX', 3)
+TARGET_SPACING_M = getattr(settings, 'NAVIGATION_REPORTING_SPACING_M', 75)  # desired distance between pings
+STATIONARY_SPEED = 0.8  # m/s, below this the driver is treated as parked
+TURN_DEGREES = 30.0  # heading change that counts as a turn
+
+
+def snap_interval(seconds):
+    """Largest configured step that does not exceed `seconds`."""
+    best = INTERVAL_STEPS[0]
+    for step in INTERVAL_STEPS:
+        if step <= seconds:
+            best = step
+    return best
+
+
+class MotionState:
+    """Last fix and derived motion for one driver."""
+    __slots__ = ('lat', 'lng', 'ts', 'speed', 'heading', 'turning', 'interval')
+
+    def __init__(self, lat, lng, ts):
+        self.lat = lat
+        self.lng = lng
+        self.ts = ts
+        self.speed = 0.0
+        self.heading = None
+        self.turning = False
+        self.interval = DEFAULT_INTERVAL
+
+
+class ReportingPolicy:
+    """Per-driver motion states and viewer counts for this process."""
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.states = {}  # driver_id -> MotionState
+        self.watchers = Counter()  # driver_id -> viewers other than the driver
+
+    def recommend(self, state, watched):
+        if state.turning:
+            seconds = INTERVAL_STEPS[0]
+        elif state.speed < STATIONARY_SPEED:
+            seconds = INTERVAL_STEPS[-1]
+        else:
+            seconds = TARGET_SPACING_M / state.speed
+        if watched:
+            seconds = min(seconds, WATCHED_MAX_INTERVAL)
+        return snap_interval(seconds)
+
+    def observe(self, driver_id, lat, lng, ts=None):
+        """Feed a fix; return the new interval if the recommendation changed, else None."""
+        ts = self.clock() if ts is None else ts
+        state = self.states.get(driver_id)
+        if state is None:
+            # no motion known yet, keep the default until the second fix
+            self.states[driver_id] = MotionState(lat, lng, ts)
+            return None
+        dt = ts - state.ts
+        if dt <= 0:
+            return None
+        distance = haversine_m(state.lat, state.lng, lat, lng)
+        state.speed = distance / dt
+        state.turning = False
+        if distance > 5.0:
+            heading = bearing_deg(state.lat, state.lng, lat, lng)
+            if state.heading is not None:
+                state.turning = heading_delta(state.heading, heading) >= TURN_DEGREES
+            state.heading = heading
+        state.lat, state.lng, state.ts = lat, lng, ts
+        return self._update(driver_id, state)
+
+    def _update(self, driver_id, state):
+        interval = self.recommend(state, self.watchers[driver_id] > 0)
+        if interval == state.interval:
+            return None
+        state.interval = interval
+        return interval
+
+    def watch(self, driver_id):
+        """Register a viewer; return the new interval if it changed."""
+        self.watchers[driver_id] += 1
+        state = self.states.get(driver_id)
+        return self._update(driver_id, state) if state else None
+
+    def unwatch(self, driver_id):
+        self.watchers[driver_id] -= 1
+        if self.watchers[driver_id] <= 0:
+            del self.watchers[driver_id]
+        state = self.states.get(driver_id)
+        return self._update(driver_id, state) if state else None
+
+    def forget(self, driver_id):
+        self.states.pop(driver_id, None)
+
+    def current(self, driver_id):
+        state = self.states.get(driver_id)
+        return state.interval if state else DEFAULT_INTERVAL
+
+
+policy = ReportingPolicy()
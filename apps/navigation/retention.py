@@ -0,0 +1,157 @@
+"""
+apps/navigation/retention.py
+
+Retention tiers for location history.
+
+NAVIGATION_HISTORY_RETENTION lists (max_age_days, resolution_s) tiers,
+youngest first. The default keeps raw fixes (resolution 0) for 7 days, one
+fix per driver per 15 s up to 90 days and one per minute after that. A last
+tier with a max age instead of None drops everything older than it.
+
+compact() downsamples one history bucket (NAVIGATION_HISTORY_BUCKET_SECONDS)
+at a time: it keeps the first fix of every (driver, resolution window) and
+deletes the rest, each bucket in its own short transaction so live writers
+never wait long. Progress is stored per resolution in HistoryCompaction, so
+a run only reads buckets that aged into a tier since the previous run.
+"""
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .history import HISTORY_BUCKET_SECONDS, bucket_of
+
+HISTORY_RETENTION = getattr(settings, 'NAVIGATION_HISTORY_RETENTION', ((7, 0), (90, 15), (None, 60)))
+DELETE_BATCH = 500  # ids per DELETE statement (stays under SQLite's parameter limit)
+
+
+def plan(retention=HISTORY_RETENTION):
+    """
+    -> ([(resolution_s, older_than_days)], drop_after_days or None), coarsest resolution first.
+    A fix older than `older_than_days` is kept at no finer than `resolution_s`.
+    """
+    steps, previous_age, previous_resolution = [], 0, 0
+    for max_age, resolution in retention:
+        if resolution < previous_resolution:
+            raise ValueError("Retention tiers must not get finer with age.")
+        if resolution > previous_resolution:
+            steps.append((resolution, previous_age))
+        if max_age is None:
+            return steps[::-1], None
+        if max_age <= previous_age:
+            raise ValueError("Retention tier ages must increase.")
+        previous_age, previous_resolution = max_age, resolution
+    return steps[::-1], previous_age
+
+
+def keep_mask(driver_ids, timestamps, resolution):
+    """For rows ordered by (driver, time): True for the first fix of each (driver, resolution window)."""
+    driver_ids = np.asarray(driver_ids)
+    windows = np.floor(np.asarray(timestamps, dtype=np.float64) / resolution)
+    keep = np.ones(len(driver_ids), dtype=bool)
+    keep[1:] = (driver_ids[1:] != driver_ids[:-1]) | (windows[1:] != windows[:-1])
+    return keep
+
+
+def _bucket_start(bucket):
+    return datetime.fromtimestamp(bucket * HISTORY_BUCKET_SECONDS, tz=dt_timezone.utc)
+
+
+def _next_bucket(after, before):
+    """Lowest non-empty bucket in [after, before), or None (an index seek on (bucket, cell))."""
+    from .models import LocationPing
+
+    return LocationPing.objects.filter(bucket__gte=after, bucket__lt=before).aggregate(b=Min('bucket'))['b']
+
+
+def _delete(ids):
+    from .models import LocationPing
+
+    for i in range(0, len(ids), DELETE_BATCH):
+        LocationPing.objects.filter(id__in=ids[i:i + DELETE_BATCH]).delete()
+
+
+def compact_bucket(bucket, resolution, dry_run=False):
+    """Downsample one bucket to `resolution`; returns (rows read, rows deleted)."""
+    from .models import LocationPing
+
+    with transaction.atomic():
+        rows = list(LocationPing.objects.filter(bucket=bucket).order_by('driver_id', 'recorded_at', 'id')
+                    .values_list('id', 'driver_id', 'recorded_at'))
+        if rows:
+            keep = keep_mask([r[1] for r in rows], [r[2].timestamp() for r in rows], resolution)
+            doomed = [rows[i][0] for i in np.flatnonzero(~keep)]
+        else:
+            doomed = []
+        if not dry_run:
+            _delete(doomed)
+    return len(rows), len(doomed)
+
+
+def _advance(marks, resolution, until, dry_run=False):
+    from .models import HistoryCompaction
+
+    if marks.get(resolution) is None or until > marks[resolution]:
+        if not dry_run:
+            HistoryCompaction.objects.update_or_create(resolution_s=resolution, defaults={'compacted_until': until})
+        marks[resolution] = until
+
+
+def expire(before, dry_run=False):
+    """Delete pings recorded before `before` (whole buckets), in batches. Returns the count."""
+    from .models import LocationPing
+
+    older = LocationPing.objects.filter(bucket__lt=bucket_of(before.timestamp()))
+    if dry_run:
+        return older.count()
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(older.values_list('id', flat=True)[:DELETE_BATCH * 10])
+            _delete(ids)
+        deleted += len(ids)
+        if len(ids) < DELETE_BATCH * 10:
+            return deleted
+
+
+def compact(now=None, retention=HISTORY_RETENTION, since=None, dry_run=False, pause=0.0, log=None):
+    """
+    Apply the retention tiers. `since` (aware datetime) re-examines older buckets, e.g. after a
+    backfill of old data; `pause` sleeps between buckets to leave room for writers.
+    -> {"expired": n, "tiers": [{"resolution_s", "chunks", "scanned", "deleted"}]}
+    """
+    from .models import HistoryCompaction
+
+    now = now or timezone.now()
+    steps, drop_after = plan(retention)
+    marks = dict(HistoryCompaction.objects.values_list('resolution_s', 'compacted_until'))
+    stats = {"expired": expire(now - timedelta(days=drop_after), dry_run) if drop_after else 0, "tiers": []}
+
+    for resolution, older_than in steps:
+        # a bucket already at a coarser resolution is also done for this one
+        done = [mark for res, mark in marks.items() if res >= resolution]
+        start = bucket_of(max(done).timestamp()) if done else 0
+        if since is not None:
+            start = min(start, bucket_of(since.timestamp()))
+        end = bucket_of((now - timedelta(days=older_than)).timestamp())  # only whole buckets
+        tier = {"resolution_s": resolution, "chunks": 0, "scanned": 0, "deleted": 0}
+        bucket = _next_bucket(start, end)
+        while bucket is not None:
+            scanned, deleted = compact_bucket(bucket, resolution, dry_run)
+            tier["chunks"] += 1
+            tier["scanned"] += scanned
+            tier["deleted"] += deleted
+            _advance(marks, resolution, _bucket_start(bucket + 1), dry_run)
+            if log and tier["chunks"] % 100 == 0:
+                log(f"{resolution}s: {tier['chunks']} buckets, {tier['deleted']} pings removed")
+            if pause:
+                time.sleep(pause)
+            bucket = _next_bucket(bucket + 1, end)
+        if end > start:
+            _advance(marks, resolution, _bucket_start(end), dry_run)
+        stats["tiers"].append(tier)
+    return stats
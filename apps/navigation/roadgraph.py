@@ -0,0 +1,222 @@
+"""
+apps/navigation/roadgraph.py
+
+Local road graph used by map matching and server-side routing.
+
+On-disk format: a directory of .npy files (loaded with mmap_mode='r' so every
+worker process shares the same pages):
+- node_lat, node_lng : float64[n]
+- indptr             : int64[n + 1], CSR offsets of outgoing edges
+- indices            : int32[m], target node of each edge
+- edge_src           : int32[m], source node of each edge
+- length_m, time_s   : float32[m], edge length and free-flow travel time
+
+Edges are straight lines between their two nodes.
+"""
+import heapq
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .geo import point_segment_distance, project, unproject
+from .spatial import KDTree
+
+
+ROAD_GRAPH_DIR = getattr(settings, 'NAVIGATION_ROAD_GRAPH_DIR', None)
+EDGE_SAMPLE_M = 25.0  # spacing of the points indexing each edge in the segment KD-tree
+ARRAYS = ('node_lat', 'node_lng', 'indptr', 'indices', 'edge_src', 'length_m', 'time_s')
+
+
+class RoadGraph:
+    """Directed road graph in CSR form with node and segment KD-trees."""
+
+    def __init__(self, node_lat, node_lng, indptr, indices, edge_src, length_m, time_s):
+        self.node_lat = node_lat
+        self.node_lng = node_lng
+        self.indptr = indptr
+        self.indices = indices
+        self.edge_src = edge_src
+        self.length_m = length_m
+        self.time_s = time_s
+        self.lat0 = float(np.mean(node_lat)) if len(node_lat) else 0.0
+        self.node_x, self.node_y = project(node_lat, node_lng, self.lat0)
+        self._node_tree = None
+        self._edge_tree = None
+        self._edge_sample_edge = None
+
+    @property
+    def num_nodes(self):
+        return len(self.node_lat)
+
+    @property
+    def num_edges(self):
+        return len(self.indices)
+
+    # -- construction / persistence -----------------------------------------
+
+    @classmethod
+    def from_edges(cls, node_lat, node_lng, src, dst, length_m=None, speed_mps=None):
+        """Build from an edge list; length defaults to straight-line metres, speed to 13.9 m/s (50 km/h)."""
+        node_lat = np.asarray(node_lat, dtype=np.float64)
+        node_lng = np.asarray(node_lng, dtype=np.float64)
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        if length_m is None:
+            lat0 = float(np.mean(node_lat))
+            x, y = project(node_lat, node_lng, lat0)
+            length_m = np.hypot(x[dst] - x[src], y[dst] - y[src])
+        length_m = np.asarray(length_m, dtype=np.float32)
+        speed = np.broadcast_to(np.asarray(13.9 if speed_mps is None else speed_mps, dtype=np.float32), length_m.shape)
+        time_s = (length_m / np.maximum(speed, 0.1)).astype(np.float32)
+        # one edge per (src, dst), sorted by source; parallel edges keep the shortest length and the
+        # fastest time separately, so distance and duration searches each see their own minimum
+        order = np.lexsort((dst, src))
+        src, dst, length_m, time_s = src[order], dst[order], length_m[order], time_s[order]
+        first = np.ones(len(src), dtype=bool)
+        first[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+        starts = np.flatnonzero(first)
+        if len(starts):
+            length_m = np.minimum.reduceat(length_m, starts)
+            time_s = np.minimum.reduceat(time_s, starts)
+        src, dst = src[first], dst[first]
+        indptr = np.zeros(len(node_lat) + 1, dtype=np.int64)
+        np.add.at(indptr, src + 1, 1)
+        indptr = np.cumsum(indptr)
+        return cls(node_lat, node_lng, indptr, dst.astype(np.int32), src.astype(np.int32), length_m, time_s)
+
+    def save(self, path):
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ARRAYS:
+            np.save(path / f'{name}.npy', np.asarray(getattr(self, name)))
+        (path / 'meta.json').write_text(json.dumps({'nodes': self.num_nodes, 'edges': self.num_edges}))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        path = Path(path)
+        arrays = [np.load(path / f'{name}.npy', mmap_mode='r' if mmap else None) for name in ARRAYS]
+        return cls(*arrays)
+
+    # -- spatial lookups ----------------------------------------------------
+
+    @property
+    def node_tree(self):
+        if self._node_tree is None:
+            self._node_tree = KDTree(self.node_x, self.node_y)
+        return self._node_tree
+
+    def _build_edge_tree(self):
+        src = np.asarray(self.edge_src, dtype=np.int64)
+        dst = np.asarray(self.indices, dtype=np.int64)
+        pieces = np.maximum(1, np.ceil(np.asarray(self.length_m) / EDGE_SAMPLE_M).astype(np.int64))
+        edge_of_sample = np.repeat(np.arange(len(src)), pieces + 1)
+        starts = np.repeat(np.cumsum(pieces + 1) - (pieces + 1), pieces + 1)
+        t = (np.arange(len(edge_of_sample)) - starts) / np.repeat(pieces, pieces + 1)
+        xs = self.node_x[src[edge_of_sample]] + t * (self.node_x[dst[edge_of_sample]] - self.node_x[src[edge_of_sample]])
+        ys = self.node_y[src[edge_of_sample]] + t * (self.node_y[dst[edge_of_sample]] - self.node_y[src[edge_of_sample]])
+        self._edge_sample_edge = edge_of_sample
+        self._edge_tree = KDTree(xs, ys)
+
+    def nearest_node(self, lat, lng):
+        """(node, distance_m) of the closest graph node."""
+        x, y = project(lat, lng, self.lat0)
+        dist, idx = self.node_tree.query(float(x), float(y), k=1)
+        return int(idx[0]), float(dist[0])
+
+    def snap_nodes(self, lats, lngs):
+        """Closest node for each coordinate."""
+        return np.array([self.nearest_node(lat, lng)[0] for lat, lng in zip(lats, lngs)], dtype=np.int64)
+
+    def candidate_edges(self, lat, lng, radius_m=50.0, k=5):
+        """Up to k edges within radius: list of (edge, distance_m, offset_m, snapped_lat, snapped_lng)."""
+        if self._edge_tree is None:
+            self._build_edge_tree()
+        x, y = project(lat, lng, self.lat0)
+        x, y = float(x), float(y)
+        samples = self._edge_tree.query_radius(x, y, radius_m + EDGE_SAMPLE_M / 2)
+        if not len(samples):
+            return []
+        edges = np.unique(self._edge_sample_edge[samples])
+        src, dst = np.asarray(self.edge_src)[edges], np.asarray(self.indices)[edges]
+        ax, ay, bx, by = self.node_x[src], self.node_y[src], self.node_x[dst], self.node_y[dst]
+        dist, t = point_segment_distance(x, y, ax, ay, bx, by)
+        keep = np.flatnonzero(dist <= radius_m)
+        keep = keep[np.argsort(dist[keep])][:k]
+        sx, sy = ax[keep] + t[keep] * (bx[keep] - ax[keep]), ay[keep] + t[keep] * (by[keep] - ay[keep])
+        slat, slng = unproject(sx, sy, self.lat0)
+        lengths = np.asarray(self.length_m)[edges[keep]]
+        return [
+            (int(e), float(d), float(tt * length), float(a), float(b))
+            for e, d, tt, length, a, b in zip(edges[keep], dist[keep], t[keep], lengths, slat, slng)
+        ]
+
+    # -- shortest paths -----------------------------------------------------
+
+    def shortest_paths(self, source, weight='time_s', limit=None, targets=None):
+        """Dijkstra from `source` -> {node: cost}; stops at `limit` or once all `targets` are settled."""
+        weights = getattr(self, weight)
+        indptr, indices = self.indptr, self.indices
+        dist = {source: 0.0}
+        done = set()
+        remaining = set(targets) if targets is not None else None
+        heap = [(0.0, source)]
+        while heap:
+            d, node = heapq.heappop(heap)
+            if node in done:
+                continue
+            done.add(node)
+            if remaining is not None:
+                remaining.discard(node)
+                if not remaining:
+                    break
+            for e in range(int(indptr[node]), int(indptr[node + 1])):
+                nd = d + float(weights[e])
+                if limit is not None and nd > limit:
+                    continue
+                target = int(indices[e])
+                if nd < dist.get(target, float('inf')):
+                    dist[target] = nd
+                    heapq.heappush(heap, (nd, target))
+        return {node: dist[node] for node in done}
+
+    def path(self, source, target, weight='time_s'):
+        """Node sequence of the cheapest path from `source` to `target`, or None if unreachable."""
+        weights = getattr(self, weight)
+        indptr, indices = self.indptr, self.indices
+        dist = {source: 0.0}
+        parent = {source: None}
+        done = set()
+        heap = [(0.0, source)]
+        while heap:
+            d, node = heapq.heappop(heap)
+            if node in done:
+                continue
+            if node == target:
+                nodes = []
+                while node is not None:
+                    nodes.append(node)
+                    node = parent[node]
+                return nodes[::-1]
+            done.add(node)
+            for e in range(int(indptr[node]), int(indptr[node + 1])):
+                nd = d + float(weights[e])
+                nxt = int(indices[e])
+                if nd < dist.get(nxt, float('inf')):
+                    dist[nxt] = nd
+                    parent[nxt] = node
+                    heapq.heappush(heap, (nd, nxt))
+        return None
+
+
+_graph = None
+
+
+def get_road_graph():
+    """Process-wide road graph from NAVIGATION_ROAD_GRAPH_DIR (memory-mapped), or None if not configured."""
+    global _graph
+    if _graph is None and ROAD_GRAPH_DIR and os.path.exists(os.path.join(ROAD_GRAPH_DIR, 'indptr.npy')):
+        _graph = RoadGraph.load(ROAD_GRAPH_DIR)
+    return _graph
@@ -0,0 +1,155 @@
+"""
+apps/navigation/rollups.py
+
+Daily mileage and driving time per (team, day, driver) in DriverDay.
+
+Each history batch is folded in as it is stored (history.store_pings): the
+distance between a driver's consecutive fixes goes to the day of the later
+fix, and the gap counts as driving time when it is short
+(NAVIGATION_ROLLUP_MAX_GAP_S) and the implied speed is at least
+NAVIGATION_ROLLUP_MOVING_MPS. Days follow settings.TIME_ZONE.
+
+rebuild() recomputes whole days from the history store (catch-up after a
+lost process; the backfill endpoint runs it for the uploading driver, since
+late pings are older than what the accumulator has seen). team_summary() answers a dashboard with one
+range read on the (team, day, driver) key.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .counters import add_to_counters
+from .geo import haversine_m
+from .smoothing import MAX_SPEED
+
+ROLLUP_MAX_GAP_S = getattr(settings, 'NAVIGATION_ROLLUP_MAX_GAP_S', 300)
+ROLLUP_MOVING_MPS = getattr(settings, 'NAVIGATION_ROLLUP_MOVING_MPS', 1.0)
+ROLLUP_MAX_DAYS = getattr(settings, 'NAVIGATION_ROLLUP_MAX_DAYS', 92)
+KEY_FIELDS = ('team', 'day', 'driver')
+VALUE_FIELDS = ('distance_m', 'driving_s', 'pings')
+
+
+def local_day(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.get_default_timezone()).date()
+
+
+class MileageAccumulator:
+    """Turns history batches into per-day increments; remembers each driver's last fix."""
+
+    def __init__(self, max_gap=ROLLUP_MAX_GAP_S, moving_mps=ROLLUP_MOVING_MPS, max_speed=MAX_SPEED):
+        self.max_gap = max_gap
+        self.moving_mps = moving_mps
+        self.max_speed = max_speed
+        self.last = {}  # driver_id -> (ts, lat, lng)
+
+    def add(self, rows, increments=None):
+        """History tuples (driver_id, team_id, lat, lng, speed, heading, ts) -> {(team, day, driver): [m, s, pings]}."""
+        increments = {} if increments is None else increments
+        for driver_id, team_id, lat, lng, _, _, ts in sorted(rows, key=lambda r: (r[0], r[6])):
+            previous = self.last.get(driver_id)
+            distance = driving = 0.0
+            if previous is None or ts > previous[0]:
+                if previous is not None:
+                    gap = ts - previous[0]
+                    step = haversine_m(previous[1], previous[2], lat, lng)
+                    if step <= self.max_speed * gap:  # a GPS jump adds nothing
+                        distance = step
+                        if gap <= self.max_gap and step >= self.moving_mps * gap:
+                            driving = gap
+                self.last[driver_id] = (ts, lat, lng)
+            entry = increments.setdefault((team_id or 0, local_day(ts), driver_id), [0.0, 0.0, 0])
+            entry[0] += distance
+            entry[1] += driving
+            entry[2] += 1
+        return increments
+
+
+accumulator = MileageAccumulator()
+
+
+def record(rows):
+    """Fold a history batch into the daily rollups."""
+    from .models import DriverDay
+
+    add_to_counters(DriverDay, KEY_FIELDS, VALUE_FIELDS, accumulator.add(rows))
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_default_timezone())
+
+
+def rebuild(first_day, last_day, driver_id=None, chunk_size=5000):
+    """
+    Recompute DriverDay for [first_day, last_day] (one driver's rows, or all) from the history store.
+    The day before is read too, so each driver's first step of the range starts from a real fix.
+    Pings are attributed to each driver's current team, since the store does not keep it for every
+    backend. -> rows written.
+    """
+    from . import presence
+    from .history import get_store
+    from .models import DriverDay
+
+    teams = {}
+    replay = MileageAccumulator()
+    increments = {}
+    batch = []
+    start = _day_start(first_day - timedelta(days=1))
+    end = _day_start(last_day + timedelta(days=1)) - timedelta(microseconds=1)
+    for driver, lat, lng, speed, heading, recorded_at in get_store().scan(driver_id=driver_id, start=start, end=end):
+        if driver not in teams:
+            teams[driver] = presence.team_id_for_user(driver)
+        batch.append((driver, teams[driver], lat, lng, speed, heading, recorded_at.timestamp()))
+        if len(batch) >= chunk_size:
+            replay.add(batch, increments)
+            batch = []
+    replay.add(batch, increments)
+    increments = {key: value for key, value in increments.items() if key[1] >= first_day}
+    days = DriverDay.objects.filter(day__range=(first_day, last_day))
+    if driver_id is not None:
+        days = days.filter(driver_id=driver_id)
+    with transaction.atomic():
+        days.delete()
+        add_to_counters(DriverDay, KEY_FIELDS, VALUE_FIELDS, increments)
+    return len(increments)
+
+
+def team_summary(team_id, first_day, last_day):
+    """
+    Per-driver and per-day totals for a team over [first_day, last_day], from one range read.
+    -> {"totals", "drivers": [...], "days": [...]}; distances in km, times in hours.
+    """
+    from .models import DriverDay
+
+    rows = (DriverDay.objects.filter(team=team_id, day__range=(first_day, last_day))
+            .values_list('driver_id', 'driver__email', 'day', 'distance_m', 'driving_s', 'pings'))
+    drivers, days = {}, {}
+    for driver_id, email, day, distance_m, driving_s, pings in rows:
+        driver = drivers.setdefault(driver_id, {"driver_id": driver_id, "email": email, "distance_m": 0.0,
+                                                "driving_s": 0.0, "days_active": 0, "pings": 0})
+        driver["distance_m"] += distance_m
+        driver["driving_s"] += driving_s
+        driver["days_active"] += 1
+        driver["pings"] += pings
+        total = days.setdefault(day, {"day": day, "distance_m": 0.0, "driving_s": 0.0, "drivers": 0})
+        total["distance_m"] += distance_m
+        total["driving_s"] += driving_s
+        total["drivers"] += 1
+
+    def finish(entry):
+        entry["distance_km"] = round(entry.pop("distance_m") / 1000, 2)
+        entry["driving_h"] = round(entry.pop("driving_s") / 3600, 2)
+        return entry
+
+    driver_rows = sorted((finish(d) for d in drivers.values()), key=lambda d: -d["distance_km"])
+    day_rows = [finish(days[day]) for day in sorted(days)]
+    return {
+        "totals": {
+            "distance_km": round(sum(d["distance_km"] for d in driver_rows), 2),
+            "driving_h": round(sum(d["driving_h"] for d in driver_rows), 2),
+            "drivers": len(driver_rows),
+        },
+        "drivers": driver_rows,
+        "days": day_rows,
+    }
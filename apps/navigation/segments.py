@@ -0,0 +1,378 @@
+"""
+apps/navigation/segments.py
+
+Log-structured file store for location history (NAVIGATION_HISTORY_STORE =
+'segments'), an alternative to LocationPing rows with the same interface as
+history.OrmPingStore.
+
+On-disk layout under NAVIGATION_HISTORY_SEGMENT_DIR, one UTC day per file:
+- YYYY-MM-DD.seg        : append log, fixed-width RECORDs in arrival order
+- YYYY-MM-DD.r<N>.seg   : compacted day, sorted by (driver, ts), downsampled to N s (0 = raw)
+- YYYY-MM-DD.c<ns>.seg  : log taken over by a compaction; still read, and merged by the next run if left behind
+- <segment>.idx         : sparse index, one INDEX entry per BLOCK records (.npy)
+
+Writers append whole batches with O_APPEND under an flock. Readers memory-map
+the segments and use the sparse index to skip blocks whose time or driver
+range cannot match, so a range scan only touches the pages it needs.
+compact() merges each closed day's log into its sorted segment and applies
+the retention tiers by the day's age; one compaction runs at a time per directory.
+"""
+import os
+import time
+from datetime import date, datetime, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: single writer process only
+    fcntl = None
+
+from .retention import HISTORY_RETENTION, keep_mask, plan
+
+HISTORY_SEGMENT_DIR = getattr(settings, 'NAVIGATION_HISTORY_SEGMENT_DIR', None)
+RECORD = np.dtype([
+    ('ts', '<f8'), ('driver', '<i4'), ('team', '<i4'),  # team -1 = none
+    ('lat', '<i4'), ('lng', '<i4'),  # degrees * COORD_SCALE
+    ('speed', '<f4'), ('heading', '<f4'),  # NaN = unknown
+])
+INDEX = np.dtype([('ts_min', '<f8'), ('ts_max', '<f8'), ('driver_min', '<i4'), ('driver_max', '<i4')])
+COORD_SCALE = 1e7  # ~1 cm, and +-180 degrees still fits in int32
+BLOCK = 1024  # records per sparse index entry
+
+
+def _day(ts):
+    return datetime.fromtimestamp(ts, tz=dt_timezone.utc).date()
+
+
+def _day_bounds(day):
+    start = datetime(day.year, day.month, day.day, tzinfo=dt_timezone.utc).timestamp()
+    return start, start + 86400
+
+
+def to_records(rows):
+    """Buffered history tuples (driver_id, team_id, lat, lng, speed, heading, ts) -> RECORD array."""
+    records = np.empty(len(rows), dtype=RECORD)
+    if not rows:
+        return records
+    driver, team, lat, lng, speed, heading, ts = zip(*rows)
+    records['ts'] = ts
+    records['driver'] = driver
+    records['team'] = [-1 if t is None else t for t in team]
+    records['lat'] = np.round(np.asarray(lat, dtype=np.float64) * COORD_SCALE)
+    records['lng'] = np.round(np.asarray(lng, dtype=np.float64) * COORD_SCALE)
+    records['speed'] = [np.nan if s is None else s for s in speed]
+    records['heading'] = [np.nan if h is None else h for h in heading]
+    return records
+
+
+def to_rows(records):
+    """RECORD array -> export tuples (driver_id, lat, lng, speed, heading, recorded_at)."""
+    speed = records['speed'].astype(np.float64)
+    heading = records['heading'].astype(np.float64)
+    return [
+        (d, lat, lng, None if s != s else s, None if h != h else h, datetime.fromtimestamp(ts, tz=dt_timezone.utc))
+        for d, lat, lng, s, h, ts in zip(
+            records['driver'].tolist(), (records['lat'] / COORD_SCALE).tolist(), (records['lng'] / COORD_SCALE).tolist(),
+            speed.tolist(), heading.tolist(), records['ts'].tolist(),
+        )
+    ]
+
+
+def merged(paths):
+    """Records of several segments sorted by (driver, ts), one record per (driver, ts)."""
+    records = np.concatenate([np.asarray(read_segment(p)) for p in paths])
+    records = records[np.lexsort((records['ts'], records['driver']))]
+    if len(records) < 2:
+        return records
+    # a compaction that died between writing its target and removing its sources leaves copies behind
+    repeat = (records['driver'][1:] == records['driver'][:-1]) & (records['ts'][1:] == records['ts'][:-1])
+    return records[np.concatenate([[True], ~repeat])]
+
+
+def read_segment(path):
+    """Memory-mapped records of one segment (a partly written trailing record is ignored)."""
+    try:
+        count = os.path.getsize(path) // RECORD.itemsize
+    except FileNotFoundError:
+        count = 0
+    if count == 0:
+        return np.empty(0, dtype=RECORD)
+    return np.memmap(path, dtype=RECORD, mode='r', shape=(count,))
+
+
+def build_index(records):
+    """One INDEX entry per complete BLOCK of records."""
+    full = len(records) // BLOCK
+    blocks = records[:full * BLOCK].reshape(full, BLOCK)
+    index = np.empty(full, dtype=INDEX)
+    index['ts_min'], index['ts_max'] = blocks['ts'].min(axis=1), blocks['ts'].max(axis=1)
+    index['driver_min'], index['driver_max'] = blocks['driver'].min(axis=1), blocks['driver'].max(axis=1)
+    return index
+
+
+def segment_index(path, records):
+    """Sparse index of a segment, extended (and saved) when the log has grown by whole blocks."""
+    full = len(records) // BLOCK
+    try:
+        index = np.load(path + '.idx', allow_pickle=False)
+    except (OSError, ValueError):
+        index = np.empty(0, dtype=INDEX)
+    if len(index) > full:  # segment was rewritten
+        index = np.empty(0, dtype=INDEX)
+    if len(index) < full:
+        index = np.concatenate([index, build_index(records[len(index) * BLOCK:full * BLOCK])])
+        tmp = f'{path}.idx.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, index)
+        os.replace(tmp, path + '.idx')
+    return index
+
+
+def select(records, index, start=None, end=None, driver_id=None, team_id=None, bbox=None):
+    """Matching records (copied out of the mapping); blocks ruled out by the index are never read."""
+    candidate = np.ones(len(index), dtype=bool)
+    if start is not None:
+        candidate &= index['ts_max'] >= start
+    if end is not None:
+        candidate &= index['ts_min'] <= end
+    if driver_id is not None:
+        candidate &= (index['driver_min'] <= driver_id) & (index['driver_max'] >= driver_id)
+    parts = [records[i * BLOCK:(i + 1) * BLOCK] for i in np.flatnonzero(candidate)]
+    parts.append(records[len(index) * BLOCK:])  # unindexed tail of the log
+    chunk = np.concatenate(parts) if len(parts) > 1 else np.asarray(parts[0])
+    mask = np.ones(len(chunk), dtype=bool)
+    if start is not None:
+        mask &= chunk['ts'] >= start
+    if end is not None:
+        mask &= chunk['ts'] <= end
+    if driver_id is not None:
+        mask &= chunk['driver'] == driver_id
+    if team_id is not None:
+        mask &= chunk['team'] == team_id
+    if bbox is not None:
+        min_lat, min_lng, max_lat, max_lng = (round(v * COORD_SCALE) for v in bbox)
+        mask &= (chunk['lat'] >= min_lat) & (chunk['lat'] <= max_lat)
+        mask &= (chunk['lng'] >= min_lng) & (chunk['lng'] <= max_lng)
+    return np.array(chunk[mask])
+
+
+class SegmentPingStore:
+    """Ping history in per-day binary segment files (see module docstring)."""
+
+    def __init__(self, directory=HISTORY_SEGMENT_DIR):
+        if not directory:
+            raise ValueError("Set NAVIGATION_HISTORY_SEGMENT_DIR for the segment history store.")
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    # -- files ----------------------------------------------------------------
+
+    def log_path(self, day):
+        return os.path.join(self.directory, f'{day.isoformat()}.seg')
+
+    def segments(self, day):
+        """Paths holding `day`: the compacted segment (if any) first, then logs under compaction, then the append log."""
+        paths = self.compacted(day) + self.compacting(day)
+        if os.path.exists(self.log_path(day)):
+            paths.append(self.log_path(day))
+        return paths
+
+    def _day_files(self, day, kind):
+        prefix = f'{day.isoformat()}.{kind}'
+        names = sorted(n for n in os.listdir(self.directory) if n.startswith(prefix) and n.endswith('.seg'))
+        return [os.path.join(self.directory, n) for n in names]
+
+    def compacted(self, day):
+        return self._day_files(day, 'r')
+
+    def compacting(self, day):
+        return self._day_files(day, 'c')
+
+    def days(self):
+        found = set()
+        for name in os.listdir(self.directory):
+            if name.endswith('.seg'):
+                try:
+                    found.add(date.fromisoformat(name[:10]))
+                except ValueError:
+                    pass
+        return sorted(found)
+
+    def _open_log(self, day):
+        """Append descriptor on the day's log, locked, retried if compaction moved the file meanwhile."""
+        path = self.log_path(day)
+        while True:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            if fcntl is None:
+                return fd
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.stat(path).st_ino == os.fstat(fd).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+
+    # -- store interface ----------------------------------------------------
+
+    def append(self, rows):
+        records = to_records(rows)
+        days = np.floor(records['ts'] / 86400).astype(np.int64)
+        for day_number in np.unique(days):
+            data = records[days == day_number].tobytes()
+            fd = self._open_log(_day(day_number * 86400.0))
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)  # releases the flock
+
+    def _matches(self, day, start, end, driver_id, team_id, bbox):
+        found = []
+        for path in self.segments(day):
+            records = read_segment(path)
+            if len(records):
+                found.append(select(records, segment_index(path, records), start, end, driver_id, team_id, bbox))
+        found = np.concatenate(found) if found else np.empty(0, dtype=RECORD)
+        return found[np.lexsort((found['ts'], found['driver']))]
+
+    def _days_between(self, start, end):
+        days = self.days()
+        if start is not None:
+            days = [d for d in days if d >= _day(start)]
+        if end is not None:
+            days = [d for d in days if d <= _day(end)]
+        return days
+
+    def scan(self, driver_id=None, team_id=None, start=None, end=None, bbox=None):
+        """Export tuples ordered by driver then time (like OrmPingStore.scan)."""
+        start = start.timestamp() if start is not None else None
+        end = end.timestamp() if end is not None else None
+        days = self._days_between(start, end)
+        if driver_id is not None:
+            for day in days:
+                yield from to_rows(self._matches(day, start, end, driver_id, team_id, bbox))
+            return
+        # several drivers: read each day once, then walk the drivers through the (driver, ts)-sorted days
+        matches = [m for m in (self._matches(day, start, end, None, team_id, bbox) for day in days) if len(m)]
+        if not matches:
+            return
+        drivers = np.unique(np.concatenate([m['driver'] for m in matches]))
+        for driver in drivers.tolist():
+            for found in matches:
+                lo, hi = np.searchsorted(found['driver'], [driver, driver + 1])
+                if hi > lo:
+                    yield from to_rows(found[lo:hi])
+
+    def latest(self, driver_id):
+        for day in reversed(self.days()):
+            found = self._matches(day, None, None, driver_id, None, None)
+            if len(found):
+                return datetime.fromtimestamp(float(found['ts'].max()), tz=dt_timezone.utc)
+        return None
+
+    # -- compaction ---------------------------------------------------------
+
+    def compact_day(self, day, resolution, dry_run=False):
+        """Merge the day's log into one sorted segment at `resolution`; returns (records read, removed)."""
+        compacted, pending = self.compacted(day), self.compacting(day)
+        log = self.log_path(day)
+        current = compacted[-1] if compacted else None
+        target = os.path.join(self.directory, f'{day.isoformat()}.r{resolution}.seg')
+        if not os.path.exists(log) and not pending and current == target:
+            return 0, 0
+        if dry_run:
+            records = merged(compacted + pending + [log])
+            kept = keep_mask(records['driver'], records['ts'], resolution).sum() if resolution else len(records)
+            return len(records), len(records) - int(kept)
+
+        if os.path.exists(log):
+            # new appends go to a fresh log; wait for any write still holding the old one. The
+            # moved log keeps a .seg name, so readers still see it until the target replaces it.
+            moved = os.path.join(self.directory, f'{day.isoformat()}.c{time.time_ns()}.seg')
+            os.replace(log, moved)
+            if os.path.exists(log + '.idx'):
+                os.replace(log + '.idx', moved + '.idx')
+            fd = os.open(moved, os.O_RDONLY)
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            os.close(fd)
+            pending.append(moved)
+        sources = compacted + pending
+        records = merged(sources)
+        kept = records[keep_mask(records['driver'], records['ts'], resolution)] if resolution else records
+
+        tmp = f'{target}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(kept.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        for path in sources + [target] + ([] if os.path.exists(log) else [log]):
+            if os.path.exists(path + '.idx'):
+                os.remove(path + '.idx')
+        os.replace(tmp, target)
+        for path in sources:
+            if path != target:
+                os.remove(path)
+        return len(records), len(records) - len(kept)
+
+    def recover(self):
+        """
+        Clean up after a compaction that died midway (call under the compaction lock): remove its
+        partly written targets. Logs it had taken over (*.c<ns>.seg) stay readable where they are
+        and compact_day merges them on its next pass; copies already in the target are dropped then.
+        """
+        for name in os.listdir(self.directory):
+            if name.endswith('.tmp') and '.seg.' in name and '.idx.' not in name:
+                os.remove(os.path.join(self.directory, name))
+
+    def compact(self, now=None, retention=HISTORY_RETENTION, dry_run=False, log=None, **options):
+        """
+        Sort every closed day and downsample it to the retention tier of its age; delete days past
+        the last tier. -> {"expired": n, "tiers": [{"resolution_s", "chunks", "scanned", "deleted"}]}
+        (one chunk = one day segment).
+        """
+        lock = os.open(os.path.join(self.directory, '.compact.lock'), os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            if not dry_run:
+                self.recover()
+            return self._compact(now, retention, dry_run, log, **options)
+        finally:
+            os.close(lock)  # releases the flock
+
+    def _compact(self, now, retention, dry_run, log, **options):
+        now = (now or datetime.now(dt_timezone.utc)).timestamp()
+        steps, drop_after = plan(retention)
+        tiers = {resolution: {"resolution_s": resolution, "chunks": 0, "scanned": 0, "deleted": 0}
+                 for resolution in [r for r, _ in steps] + [0]}
+        expired = 0
+        today = _day(now)
+        for day in self.days():
+            if day >= today:
+                continue
+            age_days = (now - _day_bounds(day)[1]) / 86400
+            if drop_after is not None and age_days >= drop_after:
+                for path in self.segments(day):
+                    expired += len(read_segment(path))
+                    if not dry_run:
+                        os.remove(path)
+                        if os.path.exists(path + '.idx'):
+                            os.remove(path + '.idx')
+                continue
+            resolution = next((r for r, older_than in steps if age_days >= older_than), 0)
+            scanned, deleted = self.compact_day(day, resolution, dry_run)
+            if scanned:
+                tier = tiers[resolution]
+                tier["chunks"] += 1
+                tier["scanned"] += scanned
+                tier["deleted"] += deleted
+                if log:
+                    log(f"{day}: {scanned} records, {deleted} removed at {resolution}s")
+            if options.get('pause'):
+                time.sleep(options['pause'])
+        return {"expired": expired, "tiers": list(tiers.values())}
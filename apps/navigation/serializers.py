@@ -14,3 +14,186 @@
 #     class Meta:
 #         model = SavedRoute
 #         fields = ['id', 'user', 'name', 'origin', 'destination', 'waypoints', 'created_at', 'oversized_details']
+
+
+from rest_framework import serializers
+
+from .geo import decode_polyline, encode_polyline
+from .models import LoadEscort, OversizedLoadDetail, RouteAssignment, RouteStop, SavedRoute
+
+
+class SavedRouteSerializer(serializers.ModelSerializer):
+    user = serializers.HiddenField(default=serializers.CurrentUserDefault())
+    latitude = serializers.FloatField(min_value=-90, max_value=90, required=False)
+    longitude = serializers.FloatField(min_value=-180, max_value=180, required=False)
+
+    class Meta:
+        model = SavedRoute
+        fields = ('id', 'user', 'name', 'latitude', 'longitude', 'snapped_latitude', 'snapped_longitude', 'polyline',
+                  'duration_s', 'created_at', 'updated_at')
+        read_only_fields = ('snapped_latitude', 'snapped_longitude', 'polyline', 'duration_s', 'created_at',
+                            'updated_at')
+
+
+class OversizedLoadDetailSerializer(serializers.ModelSerializer):
+    user = serializers.HiddenField(default=serializers.CurrentUserDefault())
+    latitude = serializers.FloatField(min_value=-90, max_value=90, required=False)
+    longitude = serializers.FloatField(min_value=-180, max_value=180, required=False)
+
+    class Meta:
+        model = OversizedLoadDetail
+        fields = ('id', 'user', 'title', 'description', 'weight', 'dimensions', 'length_m', 'width_m',
+                  'height_m', 'dimension_unit', 'latitude', 'longitude', 'status', 'created_at', 'updated_at')
+        read_only_fields = ('dimension_unit', 'status', 'created_at', 'updated_at')
+
+
+class OversizedLoadReviewSerializer(OversizedLoadDetailSerializer):
+    """Staff variant: `status` (pending / approved / rejected) is writable."""
+
+    class Meta(OversizedLoadDetailSerializer.Meta):
+        read_only_fields = ('dimension_unit', 'created_at', 'updated_at')
+
+    def update(self, instance, validated_data):
+        validated_data.pop('user', None)  # reviewing a load does not take it over
+        return super().update(instance, validated_data)
+
+
+class LoadEscortSerializer(serializers.ModelSerializer):
+    """Escort vehicle assigned to one of the caller's loads; alerts go out when it falls behind."""
+
+    class Meta:
+        model = LoadEscort
+        fields = ('id', 'load', 'escort', 'max_gap_m', 'is_active', 'created_at')
+        read_only_fields = ('load', 'is_active', 'created_at')
+
+
+class RouteAssignmentSerializer(serializers.ModelSerializer):
+    """Assign a planned route; accepts an encoded `polyline` or a list of [lat, lng] `points`."""
+    points = serializers.ListField(
+        child=serializers.ListField(child=serializers.FloatField(), min_length=2, max_length=2),
+        write_only=True, required=False, min_length=2,
+    )
+
+    class Meta:
+        model = RouteAssignment
+        fields = ('id', 'driver', 'saved_route', 'polyline', 'points', 'corridor_m',
+                  'is_active', 'created_at', 'completed_at')
+        read_only_fields = ('is_active', 'created_at', 'completed_at')
+        extra_kwargs = {'polyline': {'required': False}}
+
+    def validate(self, attrs):
+        points = attrs.pop('points', None)
+        if points:
+            attrs['polyline'] = encode_polyline(points)
+        if not attrs.get('polyline'):
+            raise serializers.ValidationError("polyline or points is required.")
+        try:
+            if len(decode_polyline(attrs['polyline'])) < 2:
+                raise ValueError
+        except (ValueError, IndexError):
+            raise serializers.ValidationError({"polyline": "Must encode at least two points."})
+        saved_route = attrs.get('saved_route')
+        if saved_route and saved_route.user_id != attrs['driver'].id:
+            raise serializers.ValidationError({"saved_route": "Saved route belongs to another user."})
+        return attrs
+
+
+LatLngField = lambda: serializers.ListField(child=serializers.FloatField(), min_length=2, max_length=2)  # noqa: E731
+
+
+class TravelMatrixSerializer(serializers.Serializer):
+    origins = serializers.ListField(child=LatLngField(), min_length=1)
+    destinations = serializers.ListField(child=LatLngField(), min_length=1, required=False)
+    metrics = serializers.MultipleChoiceField(choices=('duration', 'distance'), default=['duration'])
+
+    def validate(self, attrs):
+        from .matrix import MATRIX_MAX_POINTS
+
+        attrs.setdefault('destinations', attrs['origins'])
+        if max(len(attrs['origins']), len(attrs['destinations'])) > MATRIX_MAX_POINTS:
+            raise serializers.ValidationError(f"At most {MATRIX_MAX_POINTS} origins and destinations.")
+        return attrs
+
+
+class DispatchJobSerializer(serializers.Serializer):
+    id = serializers.CharField()
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lng = serializers.FloatField(min_value=-180, max_value=180)
+
+
+class DispatchSerializer(serializers.Serializer):
+    jobs = DispatchJobSerializer(many=True)
+    radius_m = serializers.FloatField(min_value=1, required=False)
+    candidates = serializers.IntegerField(min_value=1, max_value=50, required=False)
+
+    def validate_jobs(self, jobs):
+        if not jobs:
+            raise serializers.ValidationError("At least one job is required.")
+        if len(jobs) > 1000:
+            raise serializers.ValidationError("At most 1000 jobs per batch.")
+        return jobs
+
+
+class RouteStopSerializer(serializers.ModelSerializer):
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+
+    class Meta:
+        model = RouteStop
+        fields = ('id', 'sequence', 'name', 'latitude', 'longitude', 'service_s')
+        read_only_fields = ('sequence',)
+
+
+class RouteStopsSerializer(serializers.Serializer):
+    """Full stop list for a route; list order becomes the visiting order, the first stop is the start."""
+    stops = RouteStopSerializer(many=True)
+
+    def validate_stops(self, stops):
+        from .tour import ROUTE_MAX_STOPS
+
+        if len(stops) > ROUTE_MAX_STOPS:
+            raise serializers.ValidationError(f"At most {ROUTE_MAX_STOPS} stops per route.")
+        return stops
+
+
+class RouteOptimizeSerializer(serializers.Serializer):
+    budget_ms = serializers.IntegerField(min_value=10, max_value=10000, required=False)
+    return_to_start = serializers.BooleanField(default=False)
+    fix_end = serializers.BooleanField(default=False)
+    apply = serializers.BooleanField(default=True)
+
+    def validate(self, attrs):
+        if attrs['return_to_start'] and attrs['fix_end']:
+            raise serializers.ValidationError("return_to_start and fix_end cannot be combined.")
+        return attrs
+
+
+class LoadFilterSerializer(serializers.Serializer):
+    """Query params of the load search; weight in kg, dimensions in metres, all ranges inclusive."""
+    status = serializers.ChoiceField(choices=('pending', 'approved', 'rejected'), required=False)
+    min_weight = serializers.FloatField(min_value=0, required=False)
+    max_weight = serializers.FloatField(min_value=0, required=False)
+    min_length_m = serializers.FloatField(min_value=0, required=False)
+    max_length_m = serializers.FloatField(min_value=0, required=False)
+    min_width_m = serializers.FloatField(min_value=0, required=False)
+    max_width_m = serializers.FloatField(min_value=0, required=False)
+    min_height_m = serializers.FloatField(min_value=0, required=False)
+    max_height_m = serializers.FloatField(min_value=0, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=500, default=100)
+    offset = serializers.IntegerField(min_value=0, default=0)
+
+    RANGES = {'weight': 'weight', 'length_m': 'length_m', 'width_m': 'width_m', 'height_m': 'height_m'}
+
+    def lookups(self):
+        """validated_data -> ORM filter kwargs."""
+        data = self.validated_data
+        lookups = {}
+        if 'status' in data:
+            lookups['status'] = data['status']
+        for param, field in self.RANGES.items():
+            if f'min_{param}' in data:
+                lookups[f'{field}__gte'] = data[f'min_{param}']
+            if f'max_{param}' in data:
+                lookups[f'{field}__lte'] = data[f'max_{param}']
+        return lookups
+
@@ -0,0 +1,63 @@
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from .dimensions import SLOTS, parse_dimensions
+from .models import OversizedLoadDetail, SavedRoute
+from .spatial_index import index_object, object_bbox, unindex_object
+
+
+@receiver(pre_save, sender=OversizedLoadDetail)
+def parse_load_dimensions(sender, instance, raw=False, **kwargs):
+    # (re)fill the numeric columns from the free-text field when it is new or edited on any save path,
+    # unless the numbers were set explicitly in the same save
+    if raw:
+        return
+    if instance._state.adding:
+        if not instance.dimensions or any(getattr(instance, slot) is not None for slot in SLOTS):
+            return
+    else:
+        loaded, values = instance._loaded_dimensions, instance.__dict__
+        if 'dimensions' not in values or values['dimensions'] == loaded.get('dimensions') \
+                or any(slot in values and slot in loaded and values[slot] != loaded[slot] for slot in SLOTS):
+            return
+    for field, value in parse_dimensions(instance.dimensions).items():
+        setattr(instance, field, value)
+
+
+@receiver(post_init, sender=OversizedLoadDetail)
+@receiver(post_save, sender=OversizedLoadDetail)
+def remember_dimensions(sender, instance, **kwargs):
+    # through __dict__ so deferred fields are not fetched
+    instance._loaded_dimensions = {
+        field: instance.__dict__[field] for field in ('dimensions', *SLOTS) if field in instance.__dict__
+    }
+
+
+def indexed_point(instance):
+    # read through __dict__ so deferred coordinates are not fetched one row at a time
+    return instance.__dict__.get('latitude'), instance.__dict__.get('longitude')
+
+
+@receiver(post_init, sender=SavedRoute)
+@receiver(post_init, sender=OversizedLoadDetail)
+def remember_point(sender, instance, **kwargs):
+    instance._indexed_point = indexed_point(instance)
+
+
+@receiver(post_save, sender=SavedRoute)
+@receiver(post_save, sender=OversizedLoadDetail)
+def index_on_save(sender, instance, created=False, raw=False, **kwargs):
+    # keep the R-tree / grid entry of the object in step with its coordinates; stop edits reindex explicitly
+    if raw:
+        return
+    point = indexed_point(instance)
+    if not created and point == instance._indexed_point:
+        return
+    index_object(sender, instance.pk, object_bbox(instance))
+    instance._indexed_point = point
+
+
+@receiver(post_delete, sender=SavedRoute)
+@receiver(post_delete, sender=OversizedLoadDetail)
+def unindex_on_delete(sender, instance, **kwargs):
+    unindex_object(sender, instance.pk)
@@ -0,0 +1,111 @@
+"""
+apps/navigation/smoothing.py
+
+Per-driver alpha-beta filter for the location ingest path.
+
+Each fix goes through `LocationFilter.update()` which returns one of:
+- ACCEPTED: smoothed position that should be written, indexed and broadcast
+- SUPPRESSED: movement inside the GPS accuracy radius (jitter), drop it
+- REJECTED: implausible jump or out-of-order fix, drop it
+
+State per driver is five floats in a __slots__ object (position, velocity, time).
+"""
+import math
+import time
+
+from django.conf import settings
+
+from .geo import M_PER_DEG_LAT
+
+
+MAX_SPEED = getattr(settings, 'NAVIGATION_FILTER_MAX_SPEED', 70.0)  # m/s (~250 km/h)
+MIN_MOVE_M = getattr(settings, 'NAVIGATION_FILTER_MIN_MOVE_M', 8.0)  # jitter floor when accuracy is unknown
+ALPHA = getattr(settings, 'NAVIGATION_FILTER_ALPHA', 0.6)
+BETA = getattr(settings, 'NAVIGATION_FILTER_BETA', 0.2)
+
+ACCEPTED = 'accepted'
+SUPPRESSED = 'suppressed'
+REJECTED = 'rejected'
+
+
+class FilterState:
+    """Last emitted position and velocity estimate (north/east, m/s) for one driver."""
+    __slots__ = ('lat', 'lng', 'vn', 've', 'ts')
+
+    def __init__(self, lat, lng, ts):
+        self.lat = lat
+        self.lng = lng
+        self.vn = 0.0
+        self.ve = 0.0
+        self.ts = ts
+
+
+def valid_position(lat, lng):
+    """Finite coordinates within lat +-90 / lng +-180; anything else must never reach the filter state."""
+    return math.isfinite(lat) and math.isfinite(lng) and -90 <= lat <= 90 and -180 <= lng <= 180
+
+
+class LocationFilter:
+    """Alpha-beta tracker with jump rejection and accuracy-radius jitter suppression."""
+
+    def __init__(self, alpha=ALPHA, beta=BETA, max_speed=MAX_SPEED, min_move=MIN_MOVE_M, clock=time.time):
+        self.alpha = alpha
+        self.beta = beta
+        self.max_speed = max_speed
+        self.min_move = min_move
+        self.clock = clock
+        self.states = {}  # driver_id -> FilterState
+
+    def reset(self, driver_id, lat, lng, ts=None):
+        """Start (or restart) tracking from a trusted fix, e.g. initialize_location."""
+        self.states[driver_id] = FilterState(lat, lng, self.clock() if ts is None else ts)
+        return ACCEPTED, lat, lng
+
+    def forget(self, driver_id):
+        self.states.pop(driver_id, None)
+
+    def update(self, driver_id, lat, lng, ts=None, accuracy=None):
+        """Feed a raw fix; return (verdict, lat, lng) with the filtered position."""
+        ts = self.clock() if ts is None else ts
+        state = self.states.get(driver_id)
+        if not valid_position(lat, lng) or not math.isfinite(ts):
+            return REJECTED, (state.lat if state else lat), (state.lng if state else lng)
+        if state is None:
+            return self.reset(driver_id, lat, lng, ts)
+
+        dt = ts - state.ts
+        if dt <= 0:
+            return REJECTED, state.lat, state.lng
+
+        # local tangent plane around the last emitted position, metres
+        m_per_deg_lng = M_PER_DEG_LAT * math.cos(math.radians(state.lat))
+        mn = (lat - state.lat) * M_PER_DEG_LAT
+        me = (lng - state.lng) * m_per_deg_lng
+        radius = max(accuracy if isinstance(accuracy, (int, float)) and math.isfinite(accuracy) else 0.0,
+                     self.min_move)
+
+        # implausible jump: faster than any truck even after allowing for the accuracy radius
+        # (dt floored at 1 s so a burst of buffered fixes is not mistaken for a jump)
+        if (math.hypot(mn, me) - radius) / max(dt, 1.0) > self.max_speed:
+            return REJECTED, state.lat, state.lng
+
+        dt = max(dt, 0.1)
+        pn, pe = state.vn * dt, state.ve * dt  # predicted offset
+        rn, re = mn - pn, me - pe  # residual
+        xn, xe = pn + self.alpha * rn, pe + self.alpha * re
+        state.vn += self.beta * rn / dt
+        state.ve += self.beta * re / dt
+
+        if math.hypot(xn, xe) < radius:
+            # jitter inside the accuracy circle: hold position, bleed off velocity
+            state.vn *= 0.5
+            state.ve *= 0.5
+            return SUPPRESSED, state.lat, state.lng
+
+        state.lat += xn / M_PER_DEG_LAT
+        state.lng += xe / m_per_deg_lng
+        state.ts = ts
+        return ACCEPTED, round(state.lat, 7), round(state.lng, 7)
+
+
+location_filter = LocationFilter()
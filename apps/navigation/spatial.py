@@ -0,0 +1,112 @@
+"""
+apps/navigation/spatial.py
+
+Static 2-D KD-tree over planar points (use geo.project for lat/lng).
+
+Built once with NumPy (median splits, leaf buckets), queried in O(log n):
+- query(x, y, k): k nearest points
+- query_radius(x, y, r): all points within r
+"""
+import heapq
+
+import numpy as np
+
+
+class KDTree:
+    """Immutable KD-tree; leaves hold up to `leaf_size` points."""
+
+    def __init__(self, xs, ys, leaf_size=16):
+        self.x = np.ascontiguousarray(xs, dtype=np.float64)
+        self.y = np.ascontiguousarray(ys, dtype=np.float64)
+        self.leaf_size = leaf_size
+        # node arrays: split dimension (-1 for leaf), split value, children, leaf range in self.order
+        self.dim, self.split, self.left, self.right, self.start, self.end = [], [], [], [], [], []
+        self.order = np.arange(len(self.x))
+        if len(self.x):
+            self._build()
+
+    def __len__(self):
+        return len(self.x)
+
+    def _node(self):
+        for column in (self.dim, self.split, self.left, self.right, self.start, self.end):
+            column.append(-1)
+        return len(self.dim) - 1
+
+    def _build(self):
+        coords = (self.x, self.y)
+        root = self._node()
+        stack = [(root, 0, len(self.order))]
+        while stack:
+            node, lo, hi = stack.pop()
+            if hi - lo <= self.leaf_size:
+                self.start[node], self.end[node] = lo, hi
+                continue
+            idx = self.order[lo:hi]
+            spread_x = np.ptp(self.x[idx])
+            spread_y = np.ptp(self.y[idx])
+            dim = 0 if spread_x >= spread_y else 1
+            mid = (hi - lo) // 2
+            part = np.argpartition(coords[dim][idx], mid)
+            self.order[lo:hi] = idx[part]
+            self.dim[node] = dim
+            self.split[node] = float(coords[dim][self.order[lo + mid]])
+            left, right = self._node(), self._node()
+            self.left[node], self.right[node] = left, right
+            stack.append((left, lo, lo + mid))
+            stack.append((right, lo + mid, hi))
+
+    def query(self, x, y, k=1):
+        """k nearest neighbours of (x, y) -> (distances, indices), nearest first."""
+        if not len(self.x):
+            return np.zeros(0), np.zeros(0, dtype=np.int64)
+        best = []  # max-heap of (-d2, index)
+        stack = [(0, 0.0)]
+        point = (x, y)
+        while stack:
+            node, bound = stack.pop()
+            if len(best) == k and bound >= -best[0][0]:
+                continue
+            dim = self.dim[node]
+            if dim < 0:
+                idx = self.order[self.start[node]:self.end[node]]
+                d2 = (self.x[idx] - x) ** 2 + (self.y[idx] - y) ** 2
+                for dist2, i in zip(d2.tolist(), idx.tolist()):
+                    if len(best) < k:
+                        heapq.heappush(best, (-dist2, i))
+                    elif dist2 < -best[0][0]:
+                        heapq.heapreplace(best, (-dist2, i))
+                continue
+            diff = point[dim] - self.split[node]
+            near, far = (self.left[node], self.right[node]) if diff < 0 else (self.right[node], self.left[node])
+            stack.append((far, max(bound, diff * diff)))
+            stack.append((near, bound))
+        best.sort(reverse=True)
+        return (np.sqrt([-d for d, _ in best]), np.array([i for _, i in best], dtype=np.int64))
+
+    def query_radius(self, x, y, r):
+        """Indices of all points within distance r of (x, y)."""
+        if not len(self.x):
+            return np.zeros(0, dtype=np.int64)
+        found = []
+        r2 = r * r
+        stack = [0]
+        point = (x, y)
+        while stack:
+            node = stack.pop()
+            dim = self.dim[node]
+            if dim < 0:
+                idx = self.order[self.start[node]:self.end[node]]
+                d2 = (self.x[idx] - x) ** 2 + (self.y[idx] - y) ** 2
+                found.append(idx[d2 <= r2])
+                continue
+            diff = point[dim] - self.split[node]
+            if diff < 0:
+                stack.append(self.left[node])
+                if diff * diff <= r2:
+                    stack.append(self.right[node])
+            else:
+                stack.append(self.right[node])
+                if diff * diff <= r2:
+                    stack.append(self.left[node])
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
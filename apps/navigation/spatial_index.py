@@ -0,0 +1,201 @@
+"""
+apps/navigation/spatial_index.py
+
+Bounding-box index for SavedRoute and OversizedLoadDetail.
+
+On SQLite builds with the R-tree module each model gets a companion virtual
+table `<db_table>_rtree(id, min_lat, max_lat, min_lng, max_lng)`, created by
+migration 0007 and kept in sync by the post_save/post_delete handlers in
+signals.py (saves that leave the point unchanged are skipped; writes that
+bypass save() call reindex()). Elsewhere (or when the module is missing) the same boxes go into
+SpatialGridEntry rows, one per fixed-size grid cell the box covers, queried
+through a composite (kind, cell_lat, cell_lng) index.
+
+Querysets get `.in_bbox()` and `.within_radius()`; both resolve to an
+`id IN (subquery)` filter, so they chain with any other filter. R-tree
+stores 32-bit floats rounded outwards, so boxes may be up to ~1 m larger.
+"""
+import math
+
+from django.apps import apps
+from django.db import connection, models
+from django.db.models import ExpressionWrapper, F, FloatField, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest, Least
+
+from .geo import M_PER_DEG_LAT
+
+GRID_DEG = 0.05  # grid cell size (~5.5 km north-south)
+GRID_MAX_CELLS = 1024  # boxes covering more cells go into the single WIDE cell
+WIDE = 1 << 30  # cell coordinate of oversized boxes, scanned by every query
+
+_rtree_tables = None
+
+
+def rtree_table(model):
+    return f'{model._meta.db_table}_rtree'
+
+
+def rtree_supported(schema_connection=connection):
+    """True when the SQLite library can create R-tree virtual tables."""
+    if schema_connection.vendor != 'sqlite':
+        return False
+    with schema_connection.cursor() as cursor:
+        try:
+            cursor.execute('CREATE VIRTUAL TABLE temp.navigation_rtree_probe USING rtree(id, a, b)')
+            cursor.execute('DROP TABLE temp.navigation_rtree_probe')
+        except Exception:
+            return False
+    return True
+
+
+def uses_rtree(model):
+    """Whether the model's R-tree table exists (created by the migration when supported)."""
+    global _rtree_tables
+    if _rtree_tables is None:
+        _rtree_tables = set(connection.introspection.table_names()) if connection.vendor == 'sqlite' else set()
+    return rtree_table(model) in _rtree_tables
+
+
+def create_rtree(schema_connection, model):
+    with schema_connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {rtree_table(model)} '
+            f'USING rtree(id, min_lat, max_lat, min_lng, max_lng)'
+        )
+
+
+def drop_rtree(schema_connection, model):
+    with schema_connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {rtree_table(model)}')
+
+
+def kind_of(model):
+    return model._meta.db_table
+
+
+# -- boxes -------------------------------------------------------------------
+
+def point_bbox(lat, lng):
+    return lat, lat, lng, lng
+
+
+def saved_route_bbox(route):
+    """Box around the route's point and all of its stops; a (0, 0) point counts as unset when stops exist."""
+    stops = list(route.stops.values_list('latitude', 'longitude')) if route.pk else []
+    lats = [lat for lat, _ in stops]
+    lngs = [lng for _, lng in stops]
+    if not lats or (route.latitude, route.longitude) != (0.0, 0.0):
+        lats.append(route.latitude)
+        lngs.append(route.longitude)
+    return min(lats), max(lats), min(lngs), max(lngs)
+
+
+def object_bbox(instance):
+    if instance._meta.model_name == 'savedroute':
+        return saved_route_bbox(instance)
+    return point_bbox(instance.latitude, instance.longitude)
+
+
+def grid_cells(bbox):
+    min_lat, max_lat, min_lng, max_lng = bbox
+    lat0, lat1 = math.floor(min_lat / GRID_DEG), math.floor(max_lat / GRID_DEG)
+    lng0, lng1 = math.floor(min_lng / GRID_DEG), math.floor(max_lng / GRID_DEG)
+    if (lat1 - lat0 + 1) * (lng1 - lng0 + 1) > GRID_MAX_CELLS:
+        return [(WIDE, WIDE)]
+    return [(a, b) for a in range(lat0, lat1 + 1) for b in range(lng0, lng1 + 1)]
+
+
+# -- writes ------------------------------------------------------------------
+
+def index_object(model, object_id, bbox, grid_model=None):
+    """Insert or replace the box of one object."""
+    if uses_rtree(model):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT OR REPLACE INTO {rtree_table(model)} (id, min_lat, max_lat, min_lng, max_lng) '
+                f'VALUES (%s, %s, %s, %s, %s)', [object_id, *bbox]
+            )
+        return
+    grid_model = grid_model or apps.get_model('navigation', 'SpatialGridEntry')
+    kind = kind_of(model)
+    grid_model.objects.filter(kind=kind, object_id=object_id).delete()
+    min_lat, max_lat, min_lng, max_lng = bbox
+    grid_model.objects.bulk_create([
+        grid_model(kind=kind, object_id=object_id, cell_lat=a, cell_lng=b,
+                   min_lat=min_lat, max_lat=max_lat, min_lng=min_lng, max_lng=max_lng)
+        for a, b in grid_cells(bbox)
+    ])
+
+
+def reindex(model, ids):
+    """Re-index objects after writes that bypass post_save (bulk_update, queryset.update, stop edits)."""
+    for instance in model.objects.filter(id__in=list(ids)).iterator():
+        index_object(model, instance.pk, object_bbox(instance))
+
+
+def unindex_object(model, object_id):
+    if uses_rtree(model):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {rtree_table(model)} WHERE id = %s', [object_id])
+        return
+    apps.get_model('navigation', 'SpatialGridEntry').objects.filter(kind=kind_of(model), object_id=object_id).delete()
+
+
+# -- reads -------------------------------------------------------------------
+
+def _grid_candidates(model, min_lat, min_lng, max_lat, max_lng):
+    grid_model = apps.get_model('navigation', 'SpatialGridEntry')
+    lat0, lat1 = math.floor(min_lat / GRID_DEG), math.floor(max_lat / GRID_DEG)
+    lng0, lng1 = math.floor(min_lng / GRID_DEG), math.floor(max_lng / GRID_DEG)
+    cells = (models.Q(cell_lat__range=(lat0, lat1), cell_lng__range=(lng0, lng1))
+             | models.Q(cell_lat=WIDE, cell_lng=WIDE))
+    return grid_model.objects.filter(
+        cells, kind=kind_of(model),
+        max_lat__gte=min_lat, min_lat__lte=max_lat, max_lng__gte=min_lng, min_lng__lte=max_lng,
+    )
+
+
+def bbox_ids(model, min_lat, min_lng, max_lat, max_lng):
+    """Subquery of ids whose boxes overlap the query box."""
+    if uses_rtree(model):
+        return RawSQL(
+            f'SELECT id FROM {rtree_table(model)} '
+            f'WHERE max_lat >= %s AND min_lat <= %s AND max_lng >= %s AND min_lng <= %s',
+            [min_lat, max_lat, min_lng, max_lng],
+        )
+    return _grid_candidates(model, min_lat, min_lng, max_lat, max_lng).values('object_id')
+
+
+def radius_ids(model, lat, lng, radius_m):
+    """Subquery of ids whose boxes come within radius_m of (lat, lng) (equirectangular distance)."""
+    dlat = radius_m / M_PER_DEG_LAT
+    m_per_deg_lng = M_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6)
+    dlng = radius_m / m_per_deg_lng
+    box = (lat - dlat, lng - dlng, lat + dlat, lng + dlng)
+    if uses_rtree(model):
+        return RawSQL(
+            f'SELECT id FROM {rtree_table(model)} '
+            f'WHERE max_lat >= %s AND min_lat <= %s AND max_lng >= %s AND min_lng <= %s '
+            f'AND ((MAX(min_lat, MIN(%s, max_lat)) - %s) * %s) * ((MAX(min_lat, MIN(%s, max_lat)) - %s) * %s)'
+            f' + ((MAX(min_lng, MIN(%s, max_lng)) - %s) * %s) * ((MAX(min_lng, MIN(%s, max_lng)) - %s) * %s) <= %s',
+            [box[0], box[2], box[1], box[3],
+             lat, lat, M_PER_DEG_LAT, lat, lat, M_PER_DEG_LAT,
+             lng, lng, m_per_deg_lng, lng, lng, m_per_deg_lng, radius_m * radius_m],
+        )
+    dy = (Greatest(F('min_lat'), Least(Value(lat), F('max_lat'))) - Value(lat)) * Value(M_PER_DEG_LAT)
+    dx = (Greatest(F('min_lng'), Least(Value(lng), F('max_lng'))) - Value(lng)) * Value(m_per_deg_lng)
+    return (_grid_candidates(model, *box)
+            .annotate(d2=ExpressionWrapper(dy * dy + dx * dx, output_field=FloatField()))
+            .filter(d2__lte=radius_m * radius_m)
+            .values('object_id'))
+
+
+class SpatialQuerySet(models.QuerySet):
+    """Bounding-box and radius filters backed by the spatial index."""
+
+    def in_bbox(self, min_lat, min_lng, max_lat, max_lng):
+        return self.filter(id__in=bbox_ids(self.model, min_lat, min_lng, max_lat, max_lng))
+
+    def within_radius(self, lat, lng, radius_m):
+        return self.filter(id__in=radius_ids(self.model, lat, lng, radius_m))
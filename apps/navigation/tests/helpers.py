@@ -0,0 +1,17 @@
+import numpy as np
+
+from apps.navigation.roadgraph import RoadGraph
+
+
+def grid_graph(n=10, step=0.002, lat0=23.75, lng0=90.35, seed=0):
+    """n x n two-way street grid; node i * n + j sits at row i (north) and column j (east)."""
+    rows, cols = np.divmod(np.arange(n * n), n)
+    lat, lng = lat0 + rows * step, lng0 + cols * step
+    src, dst = [], []
+    for u in range(n * n):
+        for v in (u + 1 if cols[u] + 1 < n else None, u + n if rows[u] + 1 < n else None):
+            if v is not None:
+                src += [u, v]
+                dst += [v, u]
+    speed = np.random.default_rng(seed).uniform(5, 20, len(src))
+    return RoadGraph.from_edges(lat, lng, src, dst, speed_mps=speed)
@@ -0,0 +1,124 @@
+import gzip
+import io
+import json
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from apps.navigation import backfill
+from apps.navigation.backfill import BackfillError, ingest, iter_lines, parse_point
+from apps.navigation.models import LocationPing, SavedRoute
+
+User = get_user_model()
+
+NOW = time.time()
+
+
+def body(*points, compress=True):
+    text = ''.join(json.dumps(p) + '\n' for p in points).encode()
+    return gzip.compress(text) if compress else text
+
+
+def point(minutes_ago, **extra):
+    return {"ts": round(NOW - minutes_ago * 60, 3), "lat": 23.8, "lng": 90.4, **extra}
+
+
+class ParsePointTests(SimpleTestCase):
+    def test_seconds_and_milliseconds(self):
+        self.assertEqual(parse_point('{"ts": 1760000000.5, "lat": 1, "lng": 2}'), (1760000000.5, 1.0, 2.0, None, None))
+        self.assertEqual(parse_point('{"ts": 1760000000500, "lat": 1, "lng": 2}')[0], 1760000000.5)
+
+    def test_optional_fields_are_cleaned(self):
+        parsed = parse_point(json.dumps(point(1, speed="fast", heading=-90)))
+        self.assertEqual(parsed[3:], (None, 270.0))
+        self.assertIsNone(parse_point('{"ts": 1760000000, "lat": 1, "lng": 2, "speed": NaN}')[3])
+
+    def test_invalid_points(self):
+        for line in ('not json', '{"lat": 1, "lng": 2}', '{"ts": "x", "lat": 1, "lng": 2}',
+                     '{"ts": 1760000000, "lat": 91, "lng": 2}', '{"ts": 0, "lat": 1, "lng": 2}',
+                     json.dumps({"ts": NOW + 3600, "lat": 1, "lng": 2})):
+            self.assertIsNone(parse_point(line), line)
+
+
+class IterLinesTests(SimpleTestCase):
+    def test_plain_and_gzip_bodies(self):
+        raw = b'a\n\n  b  \n'
+        self.assertEqual(list(iter_lines(io.BytesIO(raw), compressed=False)), [b'a', b'b'])
+        self.assertEqual(list(iter_lines(io.BytesIO(gzip.compress(raw)), compressed=True)), [b'a', b'b'])
+        self.assertEqual(list(iter_lines(None, compressed=True)), [])
+
+    def test_limits_and_bad_gzip(self):
+        bomb = io.BytesIO(gzip.compress(b'x' * 100 + b'\n' * 2000))
+        with self.assertRaises(BackfillError):
+            list(iter_lines(bomb, compressed=True, max_bytes=1000))
+        with self.assertRaises(BackfillError):
+            list(iter_lines(io.BytesIO(b'x' * (backfill.MAX_LINE_BYTES + 1)), compressed=False))
+        with self.assertRaises(BackfillError):
+            list(iter_lines(io.BytesIO(b'not gzip at all'), compressed=True))
+
+
+class IngestTests(TestCase):
+    def setUp(self):
+        self.driver = User.objects.create_user(email='driver@example.com', password='pw')
+        patcher = mock.patch.object(backfill.rollups, 'rebuild')
+        self.rebuild = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def ingest(self, *points):
+        return ingest(self.driver.id, None, io.BytesIO(body(*points)), chunk_size=2)
+
+    def test_dedupes_within_the_upload_and_against_stored_rows(self):
+        stats = self.ingest(point(30), point(20), point(30), {"bad": 1}, point(10))
+        self.assertEqual({k: stats[k] for k in ('received', 'inserted', 'duplicates', 'invalid')},
+                         {"received": 5, "inserted": 3, "duplicates": 1, "invalid": 1})
+        self.assertEqual(stats['latest'][0], point(10)['ts'])
+        stats = self.ingest(point(20), point(5))
+        self.assertEqual((stats['inserted'], stats['duplicates']), (1, 1))
+        self.assertEqual(LocationPing.objects.filter(driver=self.driver).count(), 4)
+
+    def test_rollups_are_rebuilt_through_the_following_fix(self):
+        self.ingest(point(60 * 24 * 3))
+        self.ingest(point(60 * 24 * 5))
+        first_day, last_day = self.rebuild.call_args.args
+        self.assertEqual((last_day - first_day).days, 2)
+        self.assertEqual(self.rebuild.call_args.kwargs, {"driver_id": self.driver.id})
+
+    def test_empty_upload_rebuilds_nothing(self):
+        self.assertEqual(self.ingest()['inserted'], 0)
+        self.rebuild.assert_not_called()
+
+
+class BackfillViewTests(TestCase):
+    def setUp(self):
+        self.driver = User.objects.create_user(email='driver@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.driver)
+
+    def post(self, data, **headers):
+        return self.client.generic('POST', '/navigation/history/backfill/', data,
+                                   content_type='application/x-ndjson', **headers)
+
+    def test_gzip_upload_moves_the_live_position(self):
+        response = self.post(body(point(10), point(5, lat=23.9)), HTTP_CONTENT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['inserted'], 2)
+        self.assertTrue(response.data['live_position_updated'])
+        self.assertEqual(SavedRoute.objects.get(user=self.driver, name='Current Location').latitude, 23.9)
+
+        response = self.post(body(point(30), compress=False))
+        self.assertEqual(response.data['inserted'], 1)
+        self.assertFalse(response.data['live_position_updated'])
+
+    def test_rejected_uploads(self):
+        self.assertEqual(self.post(b'garbage', HTTP_CONTENT_ENCODING='gzip').status_code, 400)
+        with mock.patch.object(backfill, 'BACKFILL_MAX_POINTS', 1):
+            self.assertEqual(self.post(body(point(2), point(1))).status_code, 400)
+        self.assertFalse(LocationPing.objects.exists())
+
+    def test_empty_body(self):
+        response = self.post(b'')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['received'], 0)
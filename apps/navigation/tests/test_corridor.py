@@ -0,0 +1,124 @@
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from apps.navigation import corridor
+from apps.navigation.corridor import DeviationMonitor, RouteCorridor
+from apps.navigation.geo import M_PER_DEG_LAT, encode_polyline
+from apps.navigation.models import RouteAssignment
+from apps.navigation.spatial import KDTree
+
+User = get_user_model()
+
+LAT, LNG = 23.75, 90.35
+ROUTE = [(LAT, LNG), (LAT, LNG + 0.005), (LAT, LNG + 0.01)]
+
+
+def north(metres, lng=LNG + 0.004):
+    return LAT + metres / M_PER_DEG_LAT, lng
+
+
+class KDTreeTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.x, self.y = rng.uniform(0, 1000, 500), rng.uniform(0, 1000, 500)
+        self.tree = KDTree(self.x, self.y, leaf_size=8)
+
+    def test_query_matches_brute_force(self):
+        for qx, qy in [(0, 0), (500, 500), (999, 3), (-50, 1200)]:
+            d = np.hypot(self.x - qx, self.y - qy)
+            distances, indices = self.tree.query(qx, qy, k=5)
+            self.assertEqual(indices.tolist(), np.argsort(d)[:5].tolist())
+            np.testing.assert_allclose(distances, np.sort(d)[:5])
+
+    def test_query_radius_matches_brute_force(self):
+        found = self.tree.query_radius(400, 600, 120)
+        expected = np.flatnonzero(np.hypot(self.x - 400, self.y - 600) <= 120)
+        self.assertEqual(sorted(found.tolist()), expected.tolist())
+
+    def test_empty_tree(self):
+        tree = KDTree([], [])
+        self.assertEqual(len(tree.query(0, 0)[1]), 0)
+        self.assertEqual(len(tree.query_radius(0, 0, 10)), 0)
+
+
+class RouteCorridorTests(SimpleTestCase):
+    def test_distance_and_along_route_position(self):
+        route = RouteCorridor(ROUTE, corridor_m=50)
+        distance, along, _ = route.locate(*north(30))
+        self.assertAlmostEqual(distance, 30, delta=0.5)
+        self.assertAlmostEqual(along / route.length_m, 0.4, delta=0.01)
+
+    def test_densified_segments_fit_half_the_corridor(self):
+        route = RouteCorridor(ROUTE, corridor_m=40)
+        self.assertLessEqual(np.hypot(np.diff(route.x), np.diff(route.y)).max(), 20 + 1e-6)
+
+    def test_polyline_round_trip(self):
+        route = RouteCorridor.from_polyline(encode_polyline(ROUTE), corridor_m=50)
+        self.assertAlmostEqual(route.distance_m(*north(-20)), 20, delta=1)
+
+    def test_single_point_route_is_rejected(self):
+        with self.assertRaises(ValueError):
+            RouteCorridor([(LAT, LNG)])
+
+
+class DeviationMonitorTests(SimpleTestCase):
+    def setUp(self):
+        self.monitor = DeviationMonitor()
+        self.monitor.assign(5, 42, RouteCorridor(ROUTE, corridor_m=50))
+
+    def test_deviation_needs_consecutive_fixes(self):
+        self.assertIsNone(self.monitor.check(5, *north(80)))
+        self.assertIsNone(self.monitor.check(5, *north(10)))  # back inside resets the strikes
+        self.assertIsNone(self.monitor.check(5, *north(80)))
+        event = self.monitor.check(5, *north(90))
+        self.assertEqual(event['state'], 'deviated')
+        self.assertEqual(event['assignment_id'], 42)
+        self.assertEqual(event['corridor_m'], 50)
+
+    def test_return_needs_hysteresis_margin(self):
+        self.monitor.check(5, *north(80))
+        self.monitor.check(5, *north(80))
+        self.assertIsNone(self.monitor.check(5, *north(45)))  # inside, but above 80% of the width
+        self.assertEqual(self.monitor.check(5, *north(30))['state'], 'returned')
+
+    def test_driver_without_route_is_ignored(self):
+        self.assertIsNone(self.monitor.check(6, *north(500)))
+        self.monitor.clear(5)
+        self.assertIsNone(self.monitor.check(5, *north(500)))
+
+
+class RouteAssignmentTests(TestCase):
+    def setUp(self):
+        self.driver = User.objects.create_user(email='driver@example.com', password='pw')
+        self.other = User.objects.create_user(email='other@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.driver)
+
+    def assign(self, driver):
+        return self.client.post('/navigation/assignments/',
+                                {"driver": driver.id, "polyline": encode_polyline(ROUTE), "corridor_m": 60},
+                                format='json')
+
+    def test_new_assignment_replaces_the_active_one(self):
+        first = self.assign(self.driver).data['id']
+        response = self.assign(self.driver)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(RouteAssignment.objects.filter(is_active=True).values_list('id', flat=True)),
+                         [response.data['id']])
+        self.assertIsNotNone(RouteAssignment.objects.get(id=first).completed_at)
+
+        assignment_id, route = corridor.load_assignment(self.driver.id)
+        self.assertEqual(assignment_id, response.data['id'])
+        self.assertEqual(route.corridor_m, 60)
+
+    def test_other_drivers_assignment_is_forbidden(self):
+        self.assertEqual(self.assign(self.other).status_code, 403)
+
+    def test_bad_stored_polyline_loads_nothing(self):
+        RouteAssignment.objects.create(driver=self.driver, polyline='_p~iF')
+        with mock.patch('builtins.print'):
+            self.assertIsNone(corridor.load_assignment(self.driver.id))
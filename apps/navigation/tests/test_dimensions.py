@@ -0,0 +1,101 @@
+import importlib
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from apps.navigation.dimensions import parse_dimensions
+from apps.navigation.models import OversizedLoadDetail
+
+User = get_user_model()
+
+SAMPLES = {
+    "12 x 3.5 x 4.6": (12.0, 3.5, 4.6, ''),
+    "12m x 3.5m x 4.6m": (12.0, 3.5, 4.6, 'm'),
+    "1200x350x460 cm": (12.0, 3.5, 4.6, 'cm'),
+    "40ft x 12ft x 14ft 6in": (12.192, 3.658, 4.42, 'ft'),
+    "40' x 12' x 14'6\"": (12.192, 3.658, 4.42, 'ft'),
+    "L: 12m, W: 3.5m, H: 4.6m": (12.0, 3.5, 4.6, 'm'),
+    "height 4.8 m; width 3.2 m": (None, 3.2, 4.8, 'm'),
+    "4,5 x 2,5 m": (4.5, 2.5, None, 'm'),
+    "12 by 3 metres": (12.0, 3.0, None, 'm'),
+}
+
+
+def slots(result):
+    return result['length_m'], result['width_m'], result['height_m'], result['dimension_unit']
+
+
+class ParseDimensionsTests(SimpleTestCase):
+    def test_common_shapes(self):
+        for text, expected in SAMPLES.items():
+            self.assertEqual(slots(parse_dimensions(text)), expected, text)
+
+    def test_unparseable_and_implausible_values(self):
+        self.assertEqual(slots(parse_dimensions('')), (None, None, None, ''))
+        self.assertEqual(slots(parse_dimensions('long and wide')), (None, None, None, ''))
+        self.assertEqual(slots(parse_dimensions('250 x 3 x 0')), (None, 3.0, None, ''))
+
+    def test_migration_copy_agrees_on_known_shapes(self):
+        frozen = importlib.import_module('apps.navigation.migrations.0008_load_dimensions')
+        for text in SAMPLES:
+            self.assertEqual(frozen.parse_dimensions(text), parse_dimensions(text), text)
+
+
+class DimensionSignalTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='pw')
+
+    def test_new_load_is_parsed_unless_numbers_are_given(self):
+        parsed = OversizedLoadDetail.objects.create(user=self.user, dimensions='12m x 3m x 4m')
+        self.assertEqual((parsed.length_m, parsed.dimension_unit), (12.0, 'm'))
+        explicit = OversizedLoadDetail.objects.create(user=self.user, dimensions='12m x 3m x 4m', length_m=11.0)
+        self.assertEqual((explicit.length_m, explicit.width_m), (11.0, None))
+
+    def test_edited_text_is_reparsed_on_any_save_path(self):
+        load = OversizedLoadDetail.objects.create(user=self.user, dimensions='12 x 3 x 4')
+        load = OversizedLoadDetail.objects.only('id', 'dimensions').get(id=load.id)
+        load.dimensions = '20 x 3 x 4'
+        load.save(update_fields=['dimensions', 'length_m', 'width_m', 'height_m', 'dimension_unit'])
+        load.refresh_from_db()
+        self.assertEqual(load.length_m, 20.0)
+
+    def test_unchanged_text_keeps_manual_corrections(self):
+        load = OversizedLoadDetail.objects.create(user=self.user, dimensions='12 x 3 x 4')
+        load.height_m = 4.2
+        load.title = 'Transformer'
+        load.save()
+        load.refresh_from_db()
+        self.assertEqual((load.length_m, load.height_m), (12.0, 4.2))
+
+    def test_text_and_numbers_edited_together_keep_the_numbers(self):
+        load = OversizedLoadDetail.objects.create(user=self.user, dimensions='12 x 3 x 4')
+        load.dimensions, load.length_m = '20 x 3 x 4', 19.5
+        load.save()
+        load.refresh_from_db()
+        self.assertEqual(load.length_m, 19.5)
+
+
+class LoadSearchViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for text, state in (('10 x 3 x 4', 'approved'), ('20 x 3 x 5', 'approved'), ('30 x 4 x 5', 'pending')):
+            OversizedLoadDetail.objects.create(user=self.user, dimensions=text, status=state, title=text)
+        other = User.objects.create_user(email='other@example.com', password='pw')
+        OversizedLoadDetail.objects.create(user=other, dimensions='15 x 3 x 4', status='approved')
+
+    def titles(self, query):
+        response = self.client.get(f'/navigation/loads/search/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['title'] for row in response.data['loads'])
+
+    def test_ranges_combine_with_status(self):
+        self.assertEqual(self.titles('status=approved&min_length_m=15'), ['20 x 3 x 5'])
+        self.assertEqual(self.titles('min_height_m=5&max_width_m=3'), ['20 x 3 x 5'])
+        self.assertEqual(self.titles('max_length_m=20'), ['10 x 3 x 4', '20 x 3 x 5'])
+
+    def test_invalid_filters(self):
+        for query in ('status=lost', 'min_weight=-1', 'limit=0', 'limit=501'):
+            self.assertEqual(self.client.get(f'/navigation/loads/search/?{query}').status_code, 400, query)
@@ -0,0 +1,117 @@
+import itertools
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from apps.navigation import dispatch, matrix, views
+from apps.navigation.dispatch import FALLBACK_SPEED, assign_jobs, hungarian, solve_assignment
+from apps.navigation.fleet import FleetState
+from apps.navigation.geo import M_PER_DEG_LAT
+from apps.navigation.matrix import RowCache
+
+from .helpers import grid_graph
+
+User = get_user_model()
+
+LAT, LNG = 23.75, 90.35
+
+
+def best_total(cost):
+    n, m = cost.shape
+    if n > m:
+        cost, n, m = cost.T, m, n
+    return min(sum(cost[i, cols[i]] for i in range(n)) for cols in itertools.permutations(range(m), n))
+
+
+class HungarianTests(SimpleTestCase):
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(3)
+        for shape in ((4, 4), (3, 6), (5, 5), (1, 3)):
+            cost = rng.uniform(0, 100, shape)
+            rows, cols = hungarian(cost)
+            self.assertEqual(rows.tolist(), list(range(shape[0])))
+            self.assertEqual(len(set(cols.tolist())), shape[0])
+            self.assertAlmostEqual(cost[rows, cols].sum(), best_total(cost))
+
+    def test_fallback_handles_more_rows_than_columns(self):
+        cost = np.random.default_rng(4).uniform(0, 100, (6, 3))
+        with mock.patch.object(dispatch, 'linear_sum_assignment', None):
+            rows, cols = solve_assignment(cost)
+        self.assertEqual(list(rows), sorted(rows))
+        self.assertEqual(len(rows), 3)
+        self.assertAlmostEqual(cost[rows, cols].sum(), best_total(cost))
+
+
+class AssignJobsTests(SimpleTestCase):
+    def setUp(self):
+        self.fleet = FleetState(capacity=4)
+        patcher = mock.patch.object(dispatch, 'fleet', self.fleet)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def driver(self, driver_id, north_m, team_id=None):
+        self.fleet.acquire(driver_id, team_id)
+        self.fleet.update(driver_id, LAT + north_m / M_PER_DEG_LAT, LNG, ts=0)
+
+    def job(self, job_id, north_m):
+        return {"id": job_id, "lat": LAT + north_m / M_PER_DEG_LAT, "lng": LNG}
+
+    def test_batch_beats_greedy_nearest_driver(self):
+        self.driver(1, 350)
+        self.driver(2, -400)
+        result = assign_jobs([self.job('a', 0), self.job('b', 600)])
+        self.assertEqual([(a['job_id'], a['driver_id']) for a in result['assignments']], [('a', 2), ('b', 1)])
+        self.assertAlmostEqual(result['assignments'][0]['eta_s'], 400 / FALLBACK_SPEED, delta=0.5)
+        self.assertEqual(result['unassigned'], [])
+
+    def test_busy_and_distant_drivers_are_not_candidates(self):
+        self.driver(1, 0)
+        self.driver(2, 100)
+        self.driver(3, 50000)
+        result = assign_jobs([self.job('a', 0), self.job('b', 0), self.job('c', 5000)], busy={1}, radius_m=1000)
+        self.assertEqual([(a['job_id'], a['driver_id']) for a in result['assignments']], [('a', 2)])
+        self.assertEqual(result['unassigned'], ['b', 'c'])
+
+    def test_team_filter_and_empty_fleet(self):
+        self.driver(1, 0, team_id=5)
+        self.assertEqual(assign_jobs([self.job('a', 0)], team_id=6)['unassigned'], ['a'])
+        self.assertEqual(assign_jobs([self.job('a', 0)], team_id=5)['assignments'][0]['driver_id'], 1)
+
+    def test_road_graph_travel_times(self):
+        graph = grid_graph()
+        self.driver(1, 0)
+        with mock.patch.object(matrix, 'cache', RowCache()):
+            result = assign_jobs([self.job('a', 0.004 * M_PER_DEG_LAT)], graph=graph)
+        expected = graph.shortest_paths(0, targets=[20])[20]
+        self.assertAlmostEqual(result['assignments'][0]['eta_s'], expected, delta=0.1)
+
+
+class DispatchViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='dispatcher@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_caller_without_team_is_forbidden(self):
+        response = self.client.post('/navigation/dispatch/', {"jobs": [{"id": "a", "lat": LAT, "lng": LNG}]},
+                                    format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_empty_batch_is_rejected(self):
+        self.assertEqual(self.client.post('/navigation/dispatch/', {"jobs": []}, format='json').status_code, 400)
+
+    def test_staff_dispatch_uses_all_drivers(self):
+        self.user.is_staff = True
+        self.user.save()
+        fleet = FleetState()
+        fleet.acquire(7)
+        fleet.update(7, LAT, LNG, ts=0)
+        with mock.patch.object(dispatch, 'fleet', fleet), \
+                mock.patch.object(views, 'get_road_graph', return_value=None):
+            response = self.client.post('/navigation/dispatch/', {"jobs": [{"id": "a", "lat": LAT, "lng": LNG}]},
+                                        format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['assignments'], [{"job_id": "a", "driver_id": 7, "eta_s": 0.0}])
@@ -0,0 +1,106 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from apps.navigation import escorts
+from apps.navigation.fleet import FleetState
+from apps.navigation.geo import M_PER_DEG_LAT
+from apps.navigation.models import LoadEscort, OversizedLoadDetail
+
+User = get_user_model()
+
+
+class EscortMonitorTests(SimpleTestCase):
+    def setUp(self):
+        self.fleet = FleetState(capacity=4)
+        patcher = mock.patch.object(escorts, 'fleet', self.fleet)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.monitor = escorts.EscortMonitor()
+        self.monitor.set_pairs([(1, 10, 100, 200, 500.0, 7)])
+
+    def place(self, driver_id, north_m):
+        self.fleet.acquire(driver_id)
+        self.fleet.update(driver_id, 23.75 + north_m / M_PER_DEG_LAT, 90.35, 0.0, 0.0, 0.0)
+
+    def test_breach_is_reported_once(self):
+        self.place(100, 0)
+        self.place(200, 600)
+        [event] = self.monitor.check(100)
+        self.assertEqual(event['state'], 'breached')
+        self.assertEqual(event['owner_id'], 7)
+        self.assertAlmostEqual(event['gap_m'], 600, delta=1)
+        self.assertEqual(self.monitor.check(200), [])
+
+    def test_recovery_needs_hysteresis_margin(self):
+        self.place(100, 0)
+        self.place(200, 600)
+        self.monitor.check()
+        self.place(200, 480)  # inside the gap but above 90% of it
+        self.assertEqual(self.monitor.check(), [])
+        self.place(200, 440)
+        [event] = self.monitor.check()
+        self.assertEqual(event['state'], 'recovered')
+
+    def test_pair_without_both_positions_is_skipped(self):
+        self.place(100, 0)
+        self.assertEqual(self.monitor.check(), [])
+        self.assertFalse(self.monitor.breached.any())
+
+    def test_unrelated_driver_checks_nothing(self):
+        self.place(100, 0)
+        self.place(200, 600)
+        self.assertEqual(self.monitor.check(300), [])
+
+    def test_reload_keeps_breach_state_of_surviving_pairs(self):
+        self.place(100, 0)
+        self.place(200, 600)
+        self.monitor.check()
+        self.monitor.set_pairs([(2, 11, 100, 300, 500.0, 7), (1, 10, 100, 200, 500.0, 7)])
+        self.assertEqual(self.monitor.breached.tolist(), [False, True])
+        self.assertEqual(self.monitor.check(200), [])
+
+
+class LoadEscortApiTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(email='owner@example.com', password='pw')
+        self.escort = User.objects.create_user(email='escort@example.com', password='pw')
+        self.load = OversizedLoadDetail.objects.create(user=self.owner, title='Turbine blade')
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.url = f'/navigation/loads/{self.load.id}/escorts/'
+
+    def test_assign_reassign_and_release(self):
+        response = self.client.post(self.url, {"escort": self.owner.id, "max_gap_m": 300}, format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post(self.url, {"escort": self.owner.id, "max_gap_m": 400}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(LoadEscort.objects.get().max_gap_m, 400)
+
+        response = self.client.delete(f'{self.url}{self.owner.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(LoadEscort.objects.get().is_active)
+        self.assertEqual(self.client.delete(f'{self.url}{self.owner.id}/').status_code, 404)
+
+    def test_driver_outside_team_is_forbidden(self):
+        response = self.client.post(self.url, {"escort": self.escort.id}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(LoadEscort.objects.exists())
+
+    def test_assignment_invalidates_monitor(self):
+        escorts.monitor.stale = False
+        self.client.post(self.url, {"escort": self.owner.id}, format='json')
+        self.assertTrue(escorts.monitor.stale)
+
+    def test_load_pairs_only_for_approved_loads(self):
+        LoadEscort.objects.create(load=self.load, escort=self.escort, max_gap_m=500)
+        self.assertEqual(escorts.load_pairs(), [])
+        self.load.status = 'approved'
+        self.load.save()
+        pair = LoadEscort.objects.get()
+        self.assertEqual(escorts.load_pairs(),
+                         [(pair.id, self.load.id, self.owner.id, self.escort.id, 500, self.owner.id)])
+        LoadEscort.objects.update(is_active=False)
+        self.assertEqual(escorts.load_pairs(), [])
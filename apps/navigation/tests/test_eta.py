@@ -0,0 +1,154 @@
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
+
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, TestCase
+
+from apps.navigation import consumers, eta
+from apps.navigation.corridor import RouteCorridor
+from apps.navigation.eta import ETA_DEFAULT_SPEED_MPS, ETA_MIN_SAMPLES, EtaEngine, TripProfile
+from apps.navigation.geo import M_PER_DEG_LAT
+from apps.navigation.history import cell_of
+from apps.navigation.presence import PresenceTracker
+
+from .helpers import grid_graph
+
+LAT, LNG = 23.75, 90.35
+ROUTE = [(LAT, LNG), (LAT, LNG + 0.009), (LAT, LNG + 0.018)]  # along the bottom street of grid_graph()
+MONDAY_9 = datetime(2026, 3, 2, 9, 0, tzinfo=dt_timezone.utc).timestamp()
+
+
+def north(metres, lng=LNG + 0.009):
+    return LAT + metres / M_PER_DEG_LAT, lng
+
+
+def uniform_profile(speed=10.0, corridor_m=50):
+    route = RouteCorridor(ROUTE, corridor_m=corridor_m)
+    return TripProfile(route, np.full(len(route.x) - 1, speed))
+
+
+class TripProfileTests(SimpleTestCase):
+    def test_remaining_time_at_uniform_speed(self):
+        profile = uniform_profile(speed=10.0)
+        length = profile.corridor.length_m
+        self.assertAlmostEqual(profile.duration_s, length / 10.0)
+        _, along, segment = profile.corridor.locate(*north(0))
+        self.assertAlmostEqual(profile.remaining(along, segment), (length - along) / 10.0, places=6)
+        self.assertEqual(profile.remaining_s[-1], 0.0)
+        self.assertAlmostEqual(profile.destination[1], LNG + 0.018, places=6)
+
+    def test_slow_segments_are_floored(self):
+        self.assertAlmostEqual(uniform_profile(speed=0.0).duration_s, uniform_profile().corridor.length_m / 0.5)
+
+
+class LearnedSpeedTests(TestCase):
+    def test_moving_pings_only(self):
+        here = cell_of(LAT, LNG)
+        eta.record([(1, None, LAT, LNG, 12.0, None, MONDAY_9)] * ETA_MIN_SAMPLES
+                   + [(1, None, LAT, LNG, None, None, MONDAY_9), (1, None, LAT, LNG, 0.2, None, MONDAY_9),
+                      (1, None, LAT, LNG, float('nan'), None, MONDAY_9)])
+        self.assertEqual(eta.learned_speeds([here], eta.hour_of_week(MONDAY_9)), {here: 12.0})
+
+    def test_hour_of_week_then_all_week_mean(self):
+        busy, quiet, unknown = cell_of(LAT, LNG), cell_of(LAT, LNG + 0.01), cell_of(LAT, LNG + 0.02)
+        eta.record([(1, None, LAT, LNG, 4.0, None, MONDAY_9)] * ETA_MIN_SAMPLES
+                   + [(1, None, LAT, LNG, 16.0, None, MONDAY_9 + 7200)] * ETA_MIN_SAMPLES
+                   + [(1, None, LAT, LNG + 0.01, 9.0, None, MONDAY_9 + 7200)] * ETA_MIN_SAMPLES
+                   + [(1, None, LAT, LNG + 0.02, 9.0, None, MONDAY_9)] * (ETA_MIN_SAMPLES - 1))
+        speeds = eta.learned_speeds([busy, quiet, unknown], eta.hour_of_week(MONDAY_9))
+        self.assertEqual(speeds, {busy: 4.0, quiet: 9.0})
+
+    def test_profile_uses_learned_speeds(self):
+        route = RouteCorridor(ROUTE, corridor_m=50)
+        eta.record([(1, None, LAT, LNG + 0.0001, 2.0, None, MONDAY_9)] * ETA_MIN_SAMPLES)
+        default = TripProfile(route, np.full(len(route.x) - 1, ETA_DEFAULT_SPEED_MPS))
+        monday = TripProfile.build(route, MONDAY_9).duration_s
+        self.assertGreater(monday, default.duration_s)
+        self.assertEqual(TripProfile.build(route, MONDAY_9 + 3 * 86400).duration_s, monday)  # all-week fallback
+
+
+class EtaEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.engine = EtaEngine()
+        self.planned = uniform_profile()
+        self.engine.assign(5, 42, self.planned)
+
+    def test_estimate_on_route(self):
+        estimate, reroute = self.engine.update(5, *north(10), MONDAY_9)
+        self.assertFalse(reroute)
+        self.assertEqual(estimate['assignment_id'], 42)
+        self.assertAlmostEqual(estimate['progress'], 0.5, delta=0.01)
+        self.assertAlmostEqual(estimate['remaining_m'], self.planned.corridor.length_m / 2, delta=20)
+        self.assertEqual(estimate['arrival_ts'], round(MONDAY_9 + estimate['remaining_s']))
+        self.assertFalse(estimate['rerouted'])
+        self.assertIs(self.engine.get(5).estimate, estimate)
+
+    def test_off_route_adds_the_way_back(self):
+        on_route, _ = self.engine.update(5, *north(0), MONDAY_9)
+        off_route, _ = self.engine.update(5, *north(200), MONDAY_9)
+        self.assertAlmostEqual(off_route['remaining_m'] - on_route['remaining_m'], 200, delta=1)
+        self.assertAlmostEqual(off_route['remaining_s'] - on_route['remaining_s'], 200 / ETA_DEFAULT_SPEED_MPS, delta=1)
+
+    def test_reroute_needs_confirmation_and_is_rate_limited(self):
+        self.assertFalse(self.engine.update(5, *north(200), MONDAY_9)[1])
+        self.assertTrue(self.engine.update(5, *north(200), MONDAY_9 + 1)[1])
+        self.assertFalse(self.engine.update(5, *north(200), MONDAY_9 + 10)[1])
+        self.assertTrue(self.engine.update(5, *north(200), MONDAY_9 + 1 + eta.ETA_REROUTE_SECONDS)[1])
+
+    def test_adopted_reroute_until_back_on_the_planned_route(self):
+        trip = self.engine.get(5)
+        detour = uniform_profile(speed=5.0, corridor_m=50)
+        self.assertTrue(self.engine.adopt_reroute(5, trip, detour))
+        self.assertTrue(self.engine.update(5, *north(70), MONDAY_9)[0]['rerouted'])  # outside 80% of the planned width
+        self.assertFalse(self.engine.update(5, *north(30), MONDAY_9)[0]['rerouted'])
+        self.assertIs(trip.active, self.planned)
+
+    def test_reroute_for_a_replaced_trip_is_dropped(self):
+        stale = self.engine.get(5)
+        self.engine.assign(5, 43, self.planned)
+        self.assertFalse(self.engine.adopt_reroute(5, stale, uniform_profile()))
+        self.assertIs(self.engine.get(5).active, self.planned)
+
+    def test_cleared_or_unknown_driver(self):
+        self.engine.clear(5)
+        self.engine.clear(5)
+        self.assertEqual(self.engine.update(5, *north(0), MONDAY_9), (None, False))
+        self.assertIsNone(self.engine.plan_reroute(5, *north(0), MONDAY_9, graph=None))
+
+
+class PlanRerouteTests(TestCase):
+    def test_path_from_the_position_to_the_destination(self):
+        engine = EtaEngine()
+        engine.assign(5, 42, uniform_profile())
+        lat, lng = north(400, lng=LNG + 0.005)
+        trip, profile = engine.plan_reroute(5, lat, lng, MONDAY_9, grid_graph())
+        self.assertIs(trip, engine.get(5))
+        self.assertEqual(profile.corridor.corridor_m, 50)
+        self.assertAlmostEqual(profile.corridor.distance_m(lat, lng), 0, delta=0.5)
+        np.testing.assert_allclose(profile.destination, trip.planned.destination, atol=1e-6)
+        self.assertGreater(profile.corridor.length_m, 400 + 0.013 * M_PER_DEG_LAT * 0.9)
+
+
+class FinalDisconnectTests(SimpleTestCase):
+    def setUp(self):
+        self.tracker = PresenceTracker(timeout=30, tick=1.0, clock=lambda: 0.0)
+        for target, name, value in ((consumers.presence, 'tracker', self.tracker), (eta, 'engine', EtaEngine())):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def consumer(self):
+        consumer = consumers.DriverConsumer()
+        consumer.user = mock.Mock(id=902, email='driver@example.com')
+        return consumer
+
+    def test_trip_is_dropped_when_the_last_socket_closes(self):
+        first, second = self.consumer(), self.consumer()
+        self.tracker.connect(902)
+        self.tracker.connect(902)
+        eta.engine.assign(902, 42, uniform_profile())
+        async_to_sync(first.update_user_offline)()
+        self.assertIsNotNone(eta.engine.get(902))
+        async_to_sync(second.update_user_offline)()
+        self.assertIsNone(eta.engine.get(902))
@@ -0,0 +1,106 @@
+import json
+import math
+from datetime import datetime, timezone as dt_timezone
+from xml.etree import ElementTree
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from apps.navigation.export import aiterate, chunked, render_geojson, render_gpx, render_ndjson
+from apps.navigation.history import write_pings
+
+User = get_user_model()
+
+T0 = datetime(2026, 3, 1, 8, 0, tzinfo=dt_timezone.utc)
+ROWS = [
+    (1, 23.75, 90.35, 4.256, 90.04, T0),
+    (1, 23.7501, 90.3502, None, math.nan, T0.replace(minute=1)),
+    (2, 23.8, 90.4, 0.0, 0.0, T0),
+]
+GPX = '{http://www.topografix.com/GPX/1/1}'
+
+
+async def read_all(content):
+    return b''.join([chunk async for chunk in content]).decode()
+
+
+class RendererTests(SimpleTestCase):
+    def test_ndjson_lines(self):
+        lines = ''.join(render_ndjson(ROWS)).splitlines()
+        first, second = json.loads(lines[0]), json.loads(lines[1])
+        self.assertEqual(first, {"driver_id": 1, "lat": 23.75, "lng": 90.35, "speed": 4.26, "heading": 90.0,
+                                 "time": "2026-03-01T08:00:00Z"})
+        self.assertEqual((second['speed'], second['heading']), (None, None))
+        self.assertEqual(len(lines), 3)
+
+    def test_geojson_is_one_document(self):
+        document = json.loads(''.join(render_geojson(ROWS)))
+        self.assertEqual(len(document['features']), 3)
+        self.assertEqual(document['features'][0]['geometry']['coordinates'], [90.35, 23.75])
+        self.assertEqual(json.loads(''.join(render_geojson([]))), {"type": "FeatureCollection", "features": []})
+
+    def test_gpx_has_one_track_per_driver(self):
+        root = ElementTree.fromstring(''.join(render_gpx(ROWS, names={1: 'Rahim & Co'})))
+        tracks = root.findall(f'{GPX}trk')
+        self.assertEqual([t.find(f'{GPX}name').text for t in tracks], ['Rahim & Co', '2'])
+        self.assertEqual(len(tracks[0].findall(f'{GPX}trkseg/{GPX}trkpt')), 2)
+
+    def test_chunked_blocks(self):
+        self.assertEqual(list(chunked(range(5), 2)), [[0, 1], [2, 3], [4]])
+
+
+class AiterateTests(SimpleTestCase):
+    def test_yields_every_chunk_and_closes_early(self):
+        closed = []
+
+        def chunks():
+            try:
+                yield from ('a', 'b', 'c')
+            finally:
+                closed.append(True)
+
+        async def take(limit):
+            out = []
+            async for chunk in aiterate(chunks()):
+                out.append(chunk)
+                if len(out) == limit:
+                    break
+            return out
+
+        self.assertEqual(async_to_sync(take)(10), ['a', 'b', 'c'])
+        self.assertEqual(async_to_sync(take)(1), ['a'])
+        self.assertEqual(closed, [True, True])
+
+
+class HistoryExportViewTests(TestCase):
+    def setUp(self):
+        self.driver = User.objects.create_user(email='driver@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.driver)
+        write_pings([(self.driver.id, None, 23.75, 90.35, 3.0, 10.0, T0.timestamp() + i * 60) for i in range(5)])
+
+    def download(self, query):
+        response = self.client.get(f'/navigation/history/export/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response, async_to_sync(read_all)(response.streaming_content)
+
+    def test_streams_the_requested_window(self):
+        window = 'start=2026-03-01T08:01:00Z&end=2026-03-01T08:03:00Z'
+        response, body = self.download(f'driver_id={self.driver.id}&{window}')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn(f'driver-{self.driver.id}-history.ndjson', response['Content-Disposition'])
+        self.assertEqual([json.loads(line)['time'] for line in body.splitlines()],
+                         ['2026-03-01T08:01:00Z', '2026-03-01T08:02:00Z', '2026-03-01T08:03:00Z'])
+
+    def test_gpx_for_a_whole_day(self):
+        _, body = self.download(f'driver_id={self.driver.id}&output=gpx&start=2026-03-01&end=2026-03-01')
+        self.assertEqual(len(ElementTree.fromstring(body).findall(f'{GPX}trk/{GPX}trkseg/{GPX}trkpt')), 5)
+
+    def test_invalid_requests(self):
+        other = User.objects.create_user(email='other@example.com')
+        for query, code in (('', 400), ('driver_id=x', 400), (f'driver_id={other.id}', 403), ('team=1', 403),
+                            (f'driver_id={self.driver.id}&output=csv', 400),
+                            (f'driver_id={self.driver.id}&start=yesterday', 400)):
+            self.assertEqual(self.client.get(f'/navigation/history/export/?{query}').status_code, code, query)
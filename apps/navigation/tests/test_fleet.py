@@ -0,0 +1,54 @@
+from django.test import SimpleTestCase
+
+from apps.navigation.fleet import OFFLINE, FleetState
+from apps.navigation.geo import M_PER_DEG_LAT
+
+LAT, LNG = 23.80, 90.40
+
+
+class FleetStateTests(SimpleTestCase):
+    def setUp(self):
+        self.fleet = FleetState(capacity=2)
+
+    def test_grows_and_reuses_released_slots(self):
+        slots = [self.fleet.acquire(driver) for driver in (1, 2, 3)]
+        self.assertEqual(slots, [0, 1, 2])
+        self.assertGreaterEqual(self.fleet.capacity, 3)
+        self.fleet.release(2)
+        self.assertEqual(self.fleet.acquire(4), 1)
+        self.assertNotIn(2, self.fleet)
+        self.assertEqual(len(self.fleet), 3)
+
+    def test_position_survives_growth(self):
+        self.fleet.acquire(1)
+        self.fleet.update(1, LAT, LNG, ts=10, speed=4.0)
+        for driver in range(2, 10):
+            self.fleet.acquire(driver)
+        self.assertEqual(self.fleet.position(1), (LAT, LNG))
+        self.assertIsNone(self.fleet.position(2))
+        self.assertIsNone(self.fleet.update(99, LAT, LNG))
+
+    def test_radius_and_bbox_queries(self):
+        for driver, metres in ((1, 0), (2, 400), (3, 2000)):
+            self.fleet.acquire(driver, team_id=5 if driver != 3 else 6)
+            self.fleet.update(driver, LAT + metres / M_PER_DEG_LAT, LNG, ts=0)
+        near = self.fleet.within_radius(LAT, LNG, 500)
+        self.assertEqual(sorted(int(self.fleet.driver[s]) for s in near), [1, 2])
+        box = self.fleet.in_bbox(LAT - 0.1, LNG - 0.1, LAT + 0.1, LNG + 0.1, team_id=6)
+        self.assertEqual([int(self.fleet.driver[s]) for s in box], [3])
+
+    def test_online_slots_skip_offline_and_unpositioned(self):
+        for driver in (1, 2, 3):
+            self.fleet.acquire(driver)
+        self.fleet.update(1, LAT, LNG, ts=0)
+        self.fleet.update(2, LAT, LNG, ts=0)
+        self.fleet.set_status(2, OFFLINE)
+        self.assertEqual([int(self.fleet.driver[s]) for s in self.fleet.online_slots()], [1])
+        self.assertEqual(self.fleet.rows(self.fleet.online_slots())[0]["status"], "online")
+
+    def test_stale_slots(self):
+        self.fleet.acquire(1)
+        self.fleet.acquire(2)
+        self.fleet.update(1, LAT, LNG, ts=100)
+        self.fleet.update(2, LAT, LNG, ts=10)
+        self.assertEqual([int(self.fleet.driver[s]) for s in self.fleet.stale(60, now=120)], [2])
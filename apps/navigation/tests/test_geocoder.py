@@ -0,0 +1,88 @@
+import os
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from apps.navigation import geocoder
+from apps.navigation.geo import haversine_m_np
+from apps.navigation.geocoder import ReverseGeocoder
+
+PLACES = [("Mirpur", "Dhaka", 23.8223, 90.3654), ("Gulshan", "Dhaka", 23.7925, 90.4078),
+          ("Dhanmondi", "Dhaka", 23.7461, 90.3742), ("Dhaka", "Dhaka", 23.7104, 90.4074)]
+
+
+def gazetteer(**kwargs):
+    names, regions, lat, lng = zip(*PLACES)
+    return ReverseGeocoder(list(names), list(regions), lat, lng, **kwargs)
+
+
+class ReverseGeocoderTests(SimpleTestCase):
+    def test_nearest_matches_brute_force(self):
+        rng = np.random.default_rng(3)
+        names = [f"p{i}" for i in range(300)]
+        lat, lng = rng.uniform(23.6, 23.9, 300), rng.uniform(90.3, 90.5, 300)
+        places = ReverseGeocoder(names, [''] * 300, lat, lng)
+        for qlat, qlng in rng.uniform((23.6, 90.3), (23.9, 90.5), (20, 2)):
+            distances = haversine_m_np(lat, lng, qlat, qlng)
+            index, distance = places.nearest(qlat, qlng)
+            self.assertEqual(index, int(np.argmin(distances)))
+            self.assertAlmostEqual(distance, distances.min())
+
+    def test_labels(self):
+        places = gazetteer()
+        self.assertEqual(places.describe(23.8220, 90.3650), "near Mirpur, Dhaka")
+        self.assertEqual(places.describe(23.7104, 90.4074), "near Dhaka")  # region repeats the name
+
+    def test_far_from_every_place(self):
+        self.assertIsNone(gazetteer(max_distance_m=1000).describe(23.90, 90.30))
+        self.assertEqual(ReverseGeocoder([], [], [], []).nearest(23.8, 90.4)[0], None)
+
+    def test_answers_are_cached_per_cell(self):
+        places = gazetteer(cache_size=2)
+        places.describe(23.80001, 90.40001)
+        places.describe(23.80009, 90.40009)  # same 0.001 degree cell
+        self.assertEqual(places.stats(), {"places": 4, "cached_cells": 1, "hits": 1, "misses": 1})
+        places.describe(23.81, 90.41)
+        places.describe(23.80001, 90.40001)  # refreshed, so the next miss evicts the other cell
+        places.describe(23.82, 90.42)
+        self.assertEqual(list(places.cache), [(23800, 90400), (23820, 90420)])
+
+
+class LoadGeocoderTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(geocoder, _geocoder=None, _loaded=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'places.csv')
+
+    def write(self, text):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def test_loads_csv_skipping_bad_rows(self):
+        self.write("name,lat,lng,region\n"
+                   " Mirpur ,23.8223,90.3654,Dhaka\n"
+                   "Nowhere,north,90.1,\n"
+                   "Gulshan,23.7925,90.4078\n")
+        places = geocoder.load_geocoder(self.path)
+        self.assertEqual((places.names, places.regions), (["Mirpur", "Gulshan"], ["Dhaka", ""]))
+        self.assertIs(geocoder.get_geocoder(), places)
+        self.assertEqual(geocoder.describe(23.7925, 90.4078), "near Gulshan")
+
+    def test_missing_file_means_no_geocoder(self):
+        self.assertIsNone(geocoder.load_geocoder(self.path))
+        self.assertIsNone(geocoder.load_geocoder(None))
+        self.assertIsNone(geocoder.describe(23.8, 90.4))
+
+    def test_unreadable_file_is_not_retried(self):
+        self.write("place,lat,lng\nMirpur,23.8223,90.3654\n")  # no name column
+        with mock.patch('builtins.print') as printed:
+            self.assertIsNone(geocoder.load_geocoder(self.path))
+        printed.assert_called_once()
+        with mock.patch.object(geocoder, 'load_geocoder') as load:
+            self.assertIsNone(geocoder.get_geocoder())
+        load.assert_not_called()
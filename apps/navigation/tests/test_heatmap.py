@@ -0,0 +1,127 @@
+import math
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from apps.navigation import heatmap
+from apps.navigation.heatmap import DwellAccumulator, cell, choose_level
+from apps.navigation.history import get_store
+from apps.navigation.models import DwellCell, LocationPing
+
+User = get_user_model()
+
+T0 = datetime(2026, 3, 1, 8, 0, tzinfo=dt_timezone.utc).timestamp()
+LAT, LNG = 23.80, 90.40
+
+
+def pings(indices, driver_id=1, team_id=None):
+    # one ping every 30 s, moving north through several finest-level cells
+    return [(driver_id, team_id, LAT + i * 0.003, LNG, None, None, T0 + i * 30.0) for i in indices]
+
+
+def counters():
+    return {(c.level, c.hour, c.row, c.col, c.team): (round(c.seconds, 6), c.pings)
+            for c in DwellCell.objects.all() if c.seconds or c.pings}
+
+
+class DwellAccumulatorTests(SimpleTestCase):
+    def test_cells(self):
+        self.assertEqual(cell(-90, -180, 0.5), (0, 0))
+        self.assertEqual(cell(LAT, LNG, 0.005), (math.floor(113.8 / 0.005), math.floor(270.4 / 0.005)))
+
+    def test_dwell_is_the_capped_gap_since_the_previous_ping(self):
+        accumulator = DwellAccumulator(levels=(1.0,), max_gap=60)
+        first = accumulator.add([(1, None, LAT, LNG, None, None, T0)])
+        self.assertEqual(list(first.values()), [[0.0, 1]])
+        later = accumulator.add([(1, None, LAT, LNG, None, None, T0 + 45), (1, None, LAT, LNG, None, None, T0 + 500)])
+        self.assertEqual(list(later.values()), [[45.0 + 60.0, 2]])
+        self.assertEqual(list(later)[0][4], 0)  # no team
+
+    def test_out_of_order_ping_counts_but_adds_no_dwell(self):
+        accumulator = DwellAccumulator(levels=(1.0,), max_gap=60)
+        accumulator.add([(1, 2, LAT, LNG, None, None, T0 + 100)])
+        self.assertEqual(list(accumulator.add([(1, 2, LAT, LNG, None, None, T0 + 50)]).values()), [[0.0, 1]])
+        self.assertEqual(accumulator.last_ts[1], T0 + 100)
+
+    def test_one_key_per_level(self):
+        increments = DwellAccumulator().add(pings([0]))
+        self.assertEqual(sorted(key[0] for key in increments), list(range(len(heatmap.HEATMAP_LEVELS))))
+
+    def test_choose_level(self):
+        self.assertEqual(choose_level(LAT, LNG, LAT + 0.05, LNG + 0.05, zoom=16), 0)
+        self.assertEqual(choose_level(LAT, LNG, LAT + 0.05, LNG + 0.05, zoom=9), 2)
+        self.assertEqual(choose_level(LAT, LNG, LAT + 0.05, LNG + 0.05, zoom=8), 3)
+        self.assertEqual(choose_level(LAT, LNG, LAT + 1, LNG + 1), 1)  # 200 x 200 finest cells is too many
+        self.assertEqual(choose_level(-80, -170, 80, 170), len(heatmap.HEATMAP_LEVELS) - 1)
+
+
+class ReplayTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(heatmap, 'accumulator', DwellAccumulator())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.driver = User.objects.create_user(email='driver@example.com')
+
+    def store(self, indices):
+        rows = pings(indices, self.driver.id)
+        get_store().append(rows)
+        heatmap.record(rows)
+
+    def backfill(self, indices):
+        rows = pings(indices, self.driver.id)
+        get_store().append(rows)
+        heatmap.replay(rows)
+
+    def in_order(self, indices):
+        DwellCell.objects.all().delete()
+        heatmap.accumulator = DwellAccumulator()
+        heatmap.record(pings(indices, self.driver.id))
+        return counters()
+
+    def test_late_batch_matches_recording_in_order(self):
+        for late in ([3, 4, 5], [0, 1], [9], [2, 7]):
+            DwellCell.objects.all().delete()
+            LocationPing.objects.all().delete()
+            heatmap.accumulator = DwellAccumulator()
+            self.store([i for i in range(10) if i not in late])
+            self.backfill(late)
+            self.assertEqual(counters(), self.in_order(range(10)), late)
+
+    def test_stretch_after_a_long_gap_keeps_its_first_ping_at_zero(self):
+        self.store([0, 20, 21])  # 570 s gap: the ping at 20 gets the capped gap
+        self.backfill([19])
+        self.assertEqual(counters(), self.in_order([0, 19, 20, 21]))
+
+
+class HeatmapViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='staff@example.com', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        with mock.patch.object(heatmap, 'accumulator', DwellAccumulator()):
+            heatmap.record(pings(range(5)))
+
+    def get(self, query, bbox=f'{LNG - 0.01},{LAT - 0.01},{LNG + 0.01},{LAT + 0.02}'):
+        return self.client.get(f'/navigation/heatmap/?bbox={bbox}&{query}')
+
+    def test_staff_grid(self):
+        response = self.get('start=2026-03-01&end=2026-03-01&zoom=15')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['level'], 0)
+        self.assertEqual(sum(c[3] for c in response.data['cells']), 5)
+        self.assertEqual(sum(c[2] for c in response.data['cells']), 120.0)
+        self.assertEqual(self.get('start=2026-03-02&end=2026-03-02').data['cells'], [])
+
+    def test_bad_requests(self):
+        for query in ('start=&end=2026-03-01', 'start=2026-03-01&end=', 'start=&end=', 'end=2026-03-01',
+                      'start=2026-03-02&end=2026-03-01', 'start=2026-01-01&end=2026-03-01',
+                      'start=2026-03-01&end=2026-03-01&zoom=x', 'start=2026-03-01&end=2026-03-01&zoom=23'):
+            self.assertEqual(self.get(query).status_code, 400, query)
+        self.assertEqual(self.get('start=2026-03-01&end=2026-03-01', bbox='1,2,3').status_code, 400)
+
+    def test_caller_without_team_is_forbidden(self):
+        self.client.force_authenticate(User.objects.create_user(email='driver@example.com'))
+        self.assertEqual(self.get('start=2026-03-01&end=2026-03-01').status_code, 403)
@@ -0,0 +1,119 @@
+import importlib
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from apps.navigation.geo import M_PER_DEG_LAT, haversine_m
+from apps.navigation.history import (
+    HISTORY_CELL_DEG, MAX_QUERY_CELLS, PingBuffer, bucket_of, buckets_between, cell_of, cells_covering, drivers_near,
+    write_pings,
+)
+from apps.navigation.models import LocationPing
+
+User = get_user_model()
+
+T0 = datetime(2026, 3, 1, 8, 0, tzinfo=dt_timezone.utc)
+LAT, LNG = 23.80, 90.40
+M_PER_DEG_LNG = M_PER_DEG_LAT * math.cos(math.radians(LAT))
+
+
+class KeyTests(SimpleTestCase):
+    def test_buckets(self):
+        self.assertEqual(bucket_of(899.9), 0)
+        self.assertEqual(bucket_of(900), 1)
+        self.assertEqual(buckets_between(850, 2700), [0, 1, 2, 3])
+
+    def test_cells_cover_every_point_in_the_box(self):
+        box = (LAT - 0.013, LNG - 0.021, LAT + 0.004, LNG + 0.009)
+        cells = set(cells_covering(*box))
+        for lat in np.linspace(box[0], box[2], 9):
+            for lng in np.linspace(box[1], box[3], 9):
+                self.assertIn(cell_of(lat, lng), cells)
+        self.assertEqual(len(cells), 3 * 4)
+        self.assertNotEqual(cell_of(LAT, LNG), cell_of(LAT, LNG + HISTORY_CELL_DEG))
+        self.assertNotEqual(cell_of(LAT, LNG), cell_of(LAT + HISTORY_CELL_DEG, LNG))
+
+    def test_wide_box_skips_the_cell_filter(self):
+        side = math.isqrt(MAX_QUERY_CELLS) * HISTORY_CELL_DEG + 0.02
+        self.assertIsNone(cells_covering(LAT, LNG, LAT + side, LNG + side))
+
+    def test_migration_keys_match_runtime_defaults(self):
+        frozen = importlib.import_module('apps.navigation.migrations.0011_history_buckets')
+        for ts, lat, lng in ((T0.timestamp(), LAT, LNG), (1e9, -33.9, 151.2), (0, -90, -180)):
+            self.assertEqual(frozen.bucket_of(ts), bucket_of(ts))
+            self.assertEqual(frozen.cell_of(lat, lng), cell_of(lat, lng))
+
+
+class PingBufferTests(SimpleTestCase):
+    def test_batches_and_overflow(self):
+        buffer = PingBuffer(batch_size=2, max_pending=3)
+        self.assertFalse(buffer.add(1, None, LAT, LNG, ts=1))
+        self.assertTrue(buffer.add(1, None, LAT, LNG, ts=2))
+        buffer.add(1, None, LAT, LNG, ts=3)
+        buffer.add(1, None, LAT, LNG, ts=4)
+        self.assertEqual([row[-1] for row in buffer.drain()], [2, 3, 4])
+        self.assertEqual(buffer.stats(), {"pending": 0, "written": 0, "dropped": 1})
+
+
+class DriversNearTests(TestCase):
+    def setUp(self):
+        self.drivers = [User.objects.create_user(email=f'd{i}@example.com') for i in range(3)]
+        rng = np.random.default_rng(9)
+        self.rows = []
+        for driver in self.drivers:
+            for minute in range(0, 120, 5):
+                north, east = rng.uniform(-1500, 1500, 2)
+                self.rows.append((driver.id, None, LAT + north / M_PER_DEG_LAT, LNG + east / M_PER_DEG_LNG,
+                                  3.0, 0.0, T0.timestamp() + minute * 60))
+        write_pings(self.rows)
+
+    def test_matches_brute_force(self):
+        start, end = T0 + timedelta(minutes=20), T0 + timedelta(minutes=80)
+        found = {d['driver_id']: d for d in drivers_near(LAT, LNG, 600, start, end)}
+        expected = {}
+        for driver_id, _, lat, lng, _, _, ts in self.rows:
+            distance = haversine_m(lat, lng, LAT, LNG)
+            if start.timestamp() <= ts <= end.timestamp() and distance <= 600:
+                expected.setdefault(driver_id, []).append(distance)
+        self.assertTrue(expected)
+        self.assertEqual({d: f['pings'] for d, f in found.items()}, {d: len(v) for d, v in expected.items()})
+        for driver_id, distances in expected.items():
+            self.assertAlmostEqual(found[driver_id]['closest_m'], min(distances), delta=0.1)
+
+    def test_rows_carry_their_keys(self):
+        ping = LocationPing.objects.order_by('id').first()
+        self.assertEqual(ping.bucket, bucket_of(ping.recorded_at.timestamp()))
+        self.assertEqual(ping.cell, cell_of(ping.latitude, ping.longitude))
+
+    def test_nothing_outside_the_window(self):
+        self.assertEqual(drivers_near(LAT, LNG, 5000, T0 - timedelta(hours=2), T0 - timedelta(hours=1)), [])
+
+
+class HistoryNearbyViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='staff@example.com', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        write_pings([(self.user.id, None, LAT, LNG, None, None, T0.timestamp())])
+
+    def get(self, query):
+        return self.client.get(f'/navigation/history/nearby/?lat={LAT}&lng={LNG}&{query}')
+
+    def test_staff_search(self):
+        response = self.get('start=2026-03-01T07:00:00Z&end=2026-03-01T09:00:00Z&radius_m=100')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([d['driver_id'] for d in response.data['drivers']], [self.user.id])
+
+    def test_empty_or_invalid_window_is_a_bad_request(self):
+        for query in ('start=&end=2026-03-01T09:00:00Z', 'start=2026-03-01T07:00:00Z&end=', 'start=&end=',
+                      'end=2026-03-01T09:00:00Z', 'start=2026-03-01T09:00:00Z&end=2026-03-01T07:00:00Z',
+                      'start=2026-03-01&end=2026-03-03', 'start=2026-03-01&end=2026-03-01&radius_m=6000'):
+            self.assertEqual(self.get(query).status_code, 400, query)
+
+    def test_caller_without_team_is_forbidden(self):
+        self.client.force_authenticate(User.objects.create_user(email='driver@example.com'))
+        self.assertEqual(self.get('start=2026-03-01&end=2026-03-01').status_code, 403)
@@ -0,0 +1,98 @@
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from apps.navigation import isochrone, views
+from apps.navigation.isochrone import (
+    PolygonCache, convex_hull, douglas_peucker, frontier_points, isochrones, node_costs, simplify_ring,
+)
+from apps.navigation.roadgraph import RoadGraph
+
+from .helpers import grid_graph
+
+User = get_user_model()
+
+
+class NodeCostTests(SimpleTestCase):
+    def test_fallback_matches_scipy_within_limit(self):
+        graph = grid_graph()
+        costs = node_costs(graph, 0, limit=120.0)
+        with mock.patch.object(isochrone, 'csgraph_dijkstra', None):
+            fallback = node_costs(graph, 0, limit=120.0)
+        np.testing.assert_allclose(costs, fallback, rtol=1e-5)
+        self.assertTrue(np.isinf(costs).any())
+        self.assertLessEqual(costs[np.isfinite(costs)].max(), 120.0)
+
+    def test_cut_edge_is_interpolated(self):
+        graph = RoadGraph.from_edges([0, 0], [0, 0.01], [0], [1], length_m=[1000], speed_mps=10)
+        xs, ys, count = frontier_points(graph, np.array([0.0, 100.0]), 25.0)
+        self.assertEqual(count, 1)
+        self.assertAlmostEqual(xs[1] - xs[0], 0.25 * (graph.node_x[1] - graph.node_x[0]))
+
+
+class GeometryTests(SimpleTestCase):
+    def test_hull_drops_interior_and_collinear_points(self):
+        rng = np.random.default_rng(1)
+        xs = np.concatenate(([0, 10, 10, 0, 5], rng.uniform(1, 9, 200)))
+        ys = np.concatenate(([0, 0, 10, 10, 0], rng.uniform(1, 9, 200)))
+        hull = convex_hull(xs, ys)
+        self.assertEqual(sorted(map(tuple, hull.tolist())), [(0, 0), (0, 10), (10, 0), (10, 10)])
+        x, y = hull[:, 0], hull[:, 1]
+        self.assertGreater(np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y), 0)  # counter-clockwise
+
+    def test_douglas_peucker_keeps_only_significant_points(self):
+        line = np.array([[0, 0], [1, 0.1], [2, -0.1], [3, 5], [4, 0], [5, 0]], dtype=float)
+        self.assertEqual(douglas_peucker(line, 1.0).tolist(), [[0, 0], [2, -0.1], [3, 5], [5, 0]])
+        self.assertEqual(douglas_peucker(line, 10.0).tolist(), [[0, 0], [5, 0]])
+
+    def test_simplified_ring_keeps_both_halves(self):
+        angles = np.linspace(0, 2 * np.pi, 64, endpoint=False)
+        ring = np.column_stack((1000 * np.cos(angles), 1000 * np.sin(angles)))
+        simple = simplify_ring(ring, 50.0)
+        self.assertLess(len(simple), len(ring))
+        self.assertGreater(len(simple), 6)
+        self.assertGreater(simple[:, 1].max(), 900)
+        self.assertLess(simple[:, 1].min(), -900)
+
+
+class IsochroneTests(SimpleTestCase):
+    def setUp(self):
+        self.graph = grid_graph()
+        patcher = mock.patch.object(isochrone, 'cache', PolygonCache())
+        self.cache = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_budgets_are_nested_closed_rings(self):
+        result = isochrones(self.graph, 23.75 + 0.008, 90.35 + 0.008, [2, 1])
+        self.assertEqual(result['origin_node'], 44)
+        small, large = result['isochrones']
+        self.assertEqual((small['minutes'], large['minutes']), (1, 2))
+        self.assertLess(small['reachable_nodes'], large['reachable_nodes'])
+        for item in (small, large):
+            self.assertEqual(item['polygon'][0], item['polygon'][-1])
+
+    def test_repeated_query_is_served_from_cache(self):
+        first = isochrones(self.graph, 23.75, 90.35, [1])
+        with mock.patch.object(isochrone, 'node_costs') as search:
+            self.assertEqual(isochrones(self.graph, 23.75, 90.35, [1]), first)
+        search.assert_not_called()
+        self.assertEqual(self.cache.hits, 1)
+
+
+class IsochroneViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(email='planner@example.com', password='pw'))
+
+    def test_invalid_parameters(self):
+        for query in ('lng=90.35', 'lat=23.75&lng=90.35&minutes=a', 'lat=95&lng=90.35',
+                      'lat=23.75&lng=90.35&minutes=0', 'lat=23.75&lng=90.35&minutes=1,2,3,4,5,6,7'):
+            self.assertEqual(self.client.get(f'/navigation/isochrone/?{query}').status_code, 400, query)
+
+    def test_missing_graph_is_unavailable(self):
+        with mock.patch.object(views, 'get_road_graph', return_value=None):
+            response = self.client.get('/navigation/isochrone/?lat=23.75&lng=90.35')
+        self.assertEqual(response.status_code, 503)
@@ -0,0 +1,86 @@
+import math
+import tempfile
+
+from django.test import SimpleTestCase
+
+from apps.navigation.geo import M_PER_DEG_LAT
+from apps.navigation.matching import OnlineMatcher, match_track, match_tracks, viterbi_step
+
+from .helpers import grid_graph
+
+LAT, LNG, STEP = 23.75, 90.35, 0.002
+
+
+def eastbound_track(offset_m=6.0):
+    """Fixes along the bottom street, alternating either side of it and clear of the crossings."""
+    return [(LAT + (offset_m if i % 2 else -offset_m) / M_PER_DEG_LAT, LNG + 0.00025 + i * 0.0005)
+            for i in range(10)]
+
+
+class ViterbiStepTests(SimpleTestCase):
+    def test_best_predecessor_and_normalisation(self):
+        scores, back = viterbi_step([0.0, -5.0], [[-1.0, -9.0], [0.0, -1.0]], [0.0, -1.0])
+        self.assertEqual(back, [0, 1])
+        self.assertEqual(max(scores), 0.0)
+        self.assertEqual(scores, [0.0, -6.0])
+
+    def test_unreachable_column_restarts_the_chain(self):
+        scores, back = viterbi_step([0.0], [[-math.inf, -math.inf]], [-2.0, -0.5])
+        self.assertEqual(back, [None, None])
+        self.assertEqual(scores, [-1.5, 0.0])
+
+
+class MatchTrackTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.graph = grid_graph()
+
+    def assert_eastbound(self, matched):
+        for slat, slng, edge in matched:
+            self.assertAlmostEqual(slat, LAT, places=6)
+            self.assertEqual(self.graph.indices[edge], self.graph.edge_src[edge] + 1)
+
+    def test_noisy_track_snaps_to_travelled_direction(self):
+        self.assert_eastbound(match_track(self.graph, eastbound_track()))
+
+    def test_off_network_fix_is_skipped(self):
+        track = eastbound_track()
+        track.insert(5, (LAT - 0.01, LNG))
+        matched = match_track(self.graph, track)
+        self.assertIsNone(matched[5])
+        self.assert_eastbound(matched[:5] + matched[6:])
+
+    def test_batch_matching_in_worker_processes(self):
+        with tempfile.TemporaryDirectory() as path:
+            self.graph.save(path)
+            tracks = [eastbound_track(), eastbound_track(3.0)]
+            self.assertEqual(match_tracks(tracks, graph_dir=path, workers=2),
+                             [match_track(self.graph, track) for track in tracks])
+
+
+class OnlineMatcherTests(SimpleTestCase):
+    def setUp(self):
+        self.graph = grid_graph()
+        self.matcher = OnlineMatcher(self.graph)
+
+    def test_live_fixes_stay_on_the_street(self):
+        track = eastbound_track()
+        live = [self.matcher.update(7, lat, lng) for lat, lng in track]
+        for slat, _, _ in live:
+            self.assertAlmostEqual(slat, LAT, places=6)
+        # without backtracking only the newest fix is guaranteed to agree with the full track
+        self.assertEqual(live[-1], match_track(self.graph, track)[-1])
+
+    def test_off_network_fix_keeps_previous_column(self):
+        self.matcher.update(7, LAT, LNG + 0.001)
+        self.assertIsNone(self.matcher.update(7, LAT - 0.01, LNG))
+        self.assertIn(7, self.matcher.state)
+        self.matcher.forget(7)
+        self.assertNotIn(7, self.matcher.state)
+
+    def test_vertical_street_is_matched(self):
+        slat, slng, edge = self.matcher.update(8, LAT + STEP / 2, LNG + 3 * STEP + 4 / M_PER_DEG_LAT)
+        self.assertAlmostEqual(slng, LNG + 3 * STEP, places=6)
+        self.assertAlmostEqual(slat, LAT + STEP / 2, places=6)
+        self.assertEqual(abs(int(self.graph.indices[edge]) - int(self.graph.edge_src[edge])), 10)
@@ -0,0 +1,147 @@
+import gc
+import math
+import tempfile
+import weakref
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from apps.navigation import matrix, views
+from apps.navigation.matrix import RowCache, node_matrix, one_to_many, travel_matrix
+from apps.navigation.roadgraph import RoadGraph
+
+from .helpers import grid_graph
+
+User = get_user_model()
+
+
+def brute_force(graph, origins, destinations, weight):
+    rows = []
+    for origin in origins:
+        costs = graph.shortest_paths(int(origin), weight=weight)
+        rows.append([costs.get(int(d), math.inf) for d in destinations])
+    return np.array(rows)
+
+
+class FromEdgesTests(SimpleTestCase):
+    def test_parallel_edges_keep_shortest_length_and_fastest_time(self):
+        graph = RoadGraph.from_edges([0, 0, 0], [0, 0.01, 0.02], [0, 0, 1], [1, 1, 2],
+                                     length_m=[100, 300, 50], speed_mps=[1, 10, 5])
+        self.assertEqual(graph.num_edges, 2)
+        self.assertEqual(graph.length_m.tolist(), [100, 50])
+        self.assertEqual(graph.time_s.tolist(), [30, 10])
+        self.assertEqual(graph.indptr.tolist(), [0, 1, 2, 2])
+
+    def test_save_and_memory_mapped_load(self):
+        graph = grid_graph(4)
+        with tempfile.TemporaryDirectory() as path:
+            graph.save(path)
+            loaded = RoadGraph.load(path)
+            self.assertEqual(loaded.shortest_paths(0, targets=[15]), graph.shortest_paths(0, targets=[15]))
+
+
+class OneToManyTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.graph = grid_graph()
+
+    def test_forward_searches_match_dijkstra(self):
+        origins, destinations = [0, 15, 99, 42], [7, 63, 0, 7]
+        for weight in ('time_s', 'length_m'):
+            np.testing.assert_allclose(one_to_many(self.graph, origins, destinations, weight),
+                                       brute_force(self.graph, origins, destinations, weight), rtol=1e-5)
+
+    def test_backward_searches_when_few_destinations(self):
+        origins, destinations = list(range(0, 100, 7)), [55, 3]
+        np.testing.assert_allclose(one_to_many(self.graph, origins, destinations, 'time_s'),
+                                   brute_force(self.graph, origins, destinations, 'time_s'), rtol=1e-5)
+
+    def test_pure_python_fallback(self):
+        origins, destinations = [0, 15], [99, 42]
+        with mock.patch.object(matrix, 'csgraph_dijkstra', None):
+            costs = one_to_many(self.graph, origins, destinations, 'time_s')
+        np.testing.assert_allclose(costs, brute_force(self.graph, origins, destinations, 'time_s'), rtol=1e-5)
+
+    def test_unreachable_is_inf(self):
+        graph = RoadGraph.from_edges([0, 0, 0], [0, 0.01, 0.02], [0], [1])
+        self.assertEqual(one_to_many(graph, [1, 0], [0, 2], 'time_s').tolist(),
+                         [[math.inf, math.inf], [0.0, math.inf]])
+
+
+class SparseGraphTests(SimpleTestCase):
+    def test_matrices_are_cached_per_graph_and_freed_with_it(self):
+        first = RoadGraph.from_edges([0, 0], [0, 0.01], [0], [1])
+        self.assertIs(matrix.sparse_graph(first, 'time_s'), matrix.sparse_graph(first, 'time_s'))
+        second = RoadGraph.from_edges([0, 0], [0, 0.01], [1], [0])
+        self.assertEqual(matrix.sparse_graph(second, 'time_s', transposed=True).nnz, 1)
+        self.assertEqual(matrix.sparse_graph(second, 'time_s', transposed=True)[0, 1], first.time_s[0])
+        freed = weakref.ref(first)
+        del first
+        gc.collect()
+        self.assertIsNone(freed())
+
+
+class RowCacheTests(SimpleTestCase):
+    def test_partial_rows_miss_and_lru_evicts(self):
+        cache = RowCache(max_rows=2)
+        cache.put('time_s', 1, [5, 6], [1.0, 2.0])
+        self.assertEqual(cache.get('time_s', 1, [6]), [2.0])
+        self.assertIsNone(cache.get('time_s', 1, [6, 7]))
+        cache.put('time_s', 2, [5], [3.0])
+        cache.get('time_s', 1, [5])
+        cache.put('length_m', 1, [5], [4.0])
+        self.assertIsNone(cache.get('time_s', 2, [5]))
+        self.assertEqual(cache.get('time_s', 1, [5]), [1.0])
+        self.assertEqual((cache.hits, cache.misses), (3, 2))
+
+
+class TravelMatrixTests(SimpleTestCase):
+    def setUp(self):
+        self.graph = grid_graph()
+        patcher = mock.patch.object(matrix, 'cache', RowCache())
+        self.cache = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_node_matrix_fills_the_cache(self):
+        first = node_matrix(self.graph, [0, 9, 0], [99, 90], 'time_s', use_pool=False)
+        self.assertEqual((self.cache.misses, len(self.cache.rows)), (3, 2))
+        np.testing.assert_array_equal(first[0], first[2])
+        np.testing.assert_array_equal(node_matrix(self.graph, [9], [90], 'time_s', use_pool=False), first[1:2, 1:])
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_coordinates_snap_to_nodes(self):
+        result = travel_matrix(self.graph, [(23.75, 90.35)], [(23.75, 90.352), (23.7501, 90.35)],
+                               metrics=('duration', 'distance'))
+        self.assertEqual(result['origin_snap_m'], [0.0])
+        self.assertEqual(result['distances'][0][1], 0.0)
+        self.assertAlmostEqual(result['distances'][0][0], 203.8, delta=0.2)
+        self.assertGreater(result['durations'][0][0], 0)
+
+
+class TravelMatrixViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(email='planner@example.com', password='pw'))
+
+    def test_missing_graph_is_unavailable(self):
+        with mock.patch.object(views, 'get_road_graph', return_value=None):
+            response = self.client.post('/navigation/matrix/', {"origins": [[23.75, 90.35]]}, format='json')
+        self.assertEqual(response.status_code, 503)
+
+    def test_too_many_points_are_rejected(self):
+        with mock.patch.object(matrix, 'MATRIX_MAX_POINTS', 2):
+            response = self.client.post('/navigation/matrix/', {"origins": [[23.75, 90.35]] * 3}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_matrix_response(self):
+        with mock.patch.object(views, 'get_road_graph', return_value=grid_graph()), \
+                mock.patch.object(matrix, 'cache', RowCache()):
+            response = self.client.post('/navigation/matrix/', {"origins": [[23.75, 90.35], [23.752, 90.35]]},
+                                        format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['durations'][0][0], 0.0)
+        self.assertEqual(len(response.data['durations']), 2)
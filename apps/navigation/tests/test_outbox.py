@@ -0,0 +1,44 @@
+import asyncio
+
+from django.test import SimpleTestCase
+
+from apps.navigation.outbox import SendQueue
+
+
+class SendQueueTests(SimpleTestCase):
+    async def test_keyed_frame_replaces_pending_frame_in_place(self):
+        queue = SendQueue(maxsize=8)
+        queue.put('a1', key=('location', 1))
+        queue.put('b')
+        queue.put('a2', key=('location', 1))
+        self.assertEqual(len(queue), 2)
+        self.assertEqual(queue.replaced, 1)
+        self.assertEqual(await queue.get(), 'a2')
+        self.assertEqual(await queue.get(), 'b')
+
+    async def test_overflow_drops_oldest(self):
+        queue = SendQueue(maxsize=3)
+        for text in 'abcd':
+            queue.put(text)
+        self.assertEqual(queue.dropped, 1)
+        self.assertEqual([await queue.get() for _ in range(3)], ['b', 'c', 'd'])
+
+    async def test_get_waits_for_a_frame(self):
+        queue = SendQueue()
+        waiter = asyncio.ensure_future(queue.get())
+        await asyncio.sleep(0)
+        self.assertFalse(waiter.done())
+        queue.put('hello')
+        self.assertEqual(await asyncio.wait_for(waiter, 1), 'hello')
+
+    def test_stalled_only_after_saturation_threshold(self):
+        now = [0.0]
+        queue = SendQueue(maxsize=2, saturation_seconds=10, clock=lambda: now[0])
+        queue.put('a')
+        queue.put('b')
+        self.assertEqual(queue.saturated_since, 0.0)
+        now[0] = 10
+        self.assertFalse(queue.is_stalled())
+        now[0] = 10.5
+        self.assertTrue(queue.is_stalled())
+        self.assertEqual(queue.stats()["depth"], 2)
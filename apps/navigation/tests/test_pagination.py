@@ -0,0 +1,94 @@
+from datetime import timedelta
+from urllib.parse import parse_qs, urlparse
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.navigation import escorts
+from apps.navigation.models import OversizedLoadDetail, SavedRoute
+from apps.navigation.pagination import KeysetPagination
+
+User = get_user_model()
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        loads = [OversizedLoadDetail.objects.create(user=self.user, title=str(i)) for i in range(7)]
+        now = timezone.now()
+        for i, load in enumerate(loads):
+            # pairs of equal timestamps, so the id tie-break is exercised
+            OversizedLoadDetail.objects.filter(id=load.id).update(created_at=now - timedelta(seconds=i // 2))
+        OversizedLoadDetail.objects.create(user=User.objects.create_user(email='other@example.com'), title='x')
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_pages_follow_created_at_then_id(self):
+        expected = list(OversizedLoadDetail.objects.filter(user=self.user)
+                        .order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(self.walk('/navigation/loads/?page_size=3'), expected)
+
+    def test_rows_added_mid_walk_are_not_repeated(self):
+        response = self.client.get('/navigation/loads/?page_size=3')
+        first = [row['id'] for row in response.data['results']]
+        OversizedLoadDetail.objects.create(user=self.user, title='new')
+        rest = self.walk(response.data['next'])
+        self.assertEqual(len(first + rest), 7)
+        self.assertFalse(set(first) & set(rest))
+        self.assertEqual(parse_qs(urlparse(response.data['next']).query)['page_size'], ['3'])
+
+    def test_invalid_cursor_and_page_size(self):
+        self.assertEqual(self.client.get('/navigation/loads/?cursor=bm9wZQ').status_code, 404)
+        self.assertEqual(len(self.client.get('/navigation/loads/?page_size=abc').data['results']), 7)
+        self.assertEqual(len(self.client.get('/navigation/loads/?page_size=0').data['results']), 1)
+
+    def test_cursor_round_trip(self):
+        paginator = KeysetPagination()
+        route = SavedRoute.objects.create(user=self.user, name='Depot')
+        self.assertEqual(paginator.decode_cursor(paginator.encode_cursor(route)), (route.updated_at, route.id))
+
+    def test_saved_routes_use_updated_at(self):
+        routes = [SavedRoute.objects.create(user=self.user, name=str(i)) for i in range(3)]
+        routes[0].save()  # touched last, listed first
+        self.assertEqual(self.walk('/navigation/routes/?page_size=2'), [routes[0].id, routes[2].id, routes[1].id])
+
+
+class LoadStatusTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(email='owner@example.com', password='pw')
+        self.staff = User.objects.create_user(email='staff@example.com', password='pw', is_staff=True)
+        self.load = OversizedLoadDetail.objects.create(user=self.owner, title='Blade')
+        self.client = APIClient()
+        self.url = f'/navigation/loads/{self.load.id}/'
+
+    def test_owner_cannot_approve(self):
+        self.client.force_authenticate(self.owner)
+        response = self.client.patch(self.url, {"status": "approved", "title": "Blade 2"}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.load.refresh_from_db()
+        self.assertEqual((self.load.status, self.load.title), ('pending', 'Blade 2'))
+
+    def test_staff_review_keeps_owner_and_reloads_escorts(self):
+        self.client.force_authenticate(self.staff)
+        escorts.monitor.stale = False
+        response = self.client.patch(self.url, {"status": "approved"}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.load.refresh_from_db()
+        self.assertEqual((self.load.status, self.load.user_id), ('approved', self.owner.id))
+        self.assertTrue(escorts.monitor.stale)
+        self.assertEqual(self.client.get('/navigation/loads/').data['results'], [])
+
+    def test_other_users_cannot_see_the_load(self):
+        self.client.force_authenticate(User.objects.create_user(email='other@example.com'))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
@@ -0,0 +1,112 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase
+
+from apps.navigation import consumers
+from apps.navigation.fleet import fleet
+from apps.navigation.presence import PresenceTracker, TimingWheel
+
+
+class TimingWheelTests(SimpleTestCase):
+    def test_key_expires_on_its_deadline_tick(self):
+        wheel = TimingWheel(tick=1.0, slots=8, levels=2, now=0)
+        wheel.schedule('a', 5)
+        self.assertEqual(wheel.advance(4), [])
+        self.assertEqual(wheel.advance(5), ['a'])
+        self.assertNotIn('a', wheel)
+
+    def test_far_deadline_cascades_through_higher_wheels(self):
+        wheel = TimingWheel(tick=1.0, slots=4, levels=2, now=0)
+        wheel.schedule('far', 50)  # beyond both wheels (4 * 4 ticks)
+        self.assertEqual(wheel.advance(49), [])
+        self.assertEqual(wheel.advance(50), ['far'])
+
+    def test_reschedule_and_cancel(self):
+        wheel = TimingWheel(tick=1.0, slots=8, levels=2, now=0)
+        wheel.schedule('a', 3)
+        wheel.schedule('a', 10)
+        wheel.schedule('b', 3)
+        wheel.cancel('b')
+        self.assertEqual(wheel.advance(9), [])
+        self.assertEqual(wheel.advance(10), ['a'])
+        self.assertEqual(len(wheel), 0)
+
+    def test_past_deadline_expires_on_next_tick(self):
+        wheel = TimingWheel(tick=1.0, now=100)
+        wheel.schedule('late', 50)
+        self.assertEqual(wheel.advance(101), ['late'])
+
+
+class PresenceTrackerTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.tracker = PresenceTracker(timeout=30, tick=1.0, clock=lambda: self.now, wall=lambda: 1000.0)
+
+    def test_heartbeat_timeout_marks_offline(self):
+        self.tracker.connect(1, team_id=7)
+        self.assertTrue(self.tracker.is_online(1))
+        self.assertEqual(self.tracker.counts(7), {"online": 1, "team_online": 1})
+        self.now = 20
+        self.tracker.touch(1)
+        self.now = 45
+        self.assertEqual(self.tracker.tick(), [])
+        self.now = 51
+        self.assertEqual(self.tracker.tick(), [1])
+        self.assertFalse(self.tracker.is_online(1))
+        self.assertEqual(self.tracker.counts(7), {"online": 0, "team_online": 0})
+
+    def test_drain_coalesces_transitions(self):
+        self.tracker.connect(1)
+        self.tracker.disconnect(1)
+        self.assertEqual(self.tracker.drain(), {1: (False, 1000.0)})
+        self.assertEqual(self.tracker.drain(), {})
+
+    def test_disconnect_reports_last_socket(self):
+        self.tracker.connect(1)
+        self.tracker.connect(1)
+        self.assertFalse(self.tracker.disconnect(1))
+        self.assertTrue(self.tracker.is_online(1))
+        self.assertTrue(self.tracker.disconnect(1))
+        self.assertFalse(self.tracker.is_online(1))
+        self.assertNotIn(1, self.tracker.teams)
+        self.assertNotIn(1, self.tracker.last_seen)
+
+    def test_last_disconnect_after_expiry_drops_state(self):
+        self.tracker.connect(1, team_id=3)
+        self.now = 100
+        self.tracker.tick()
+        self.assertTrue(self.tracker.disconnect(1))
+        self.assertEqual(self.tracker.teams, {})
+        self.assertEqual(self.tracker.last_seen, {})
+
+
+class MultiSocketDisconnectTests(SimpleTestCase):
+    """Closing one of a driver's sockets must not release state the other socket still uses."""
+
+    def setUp(self):
+        self.now = 0.0
+        self.tracker = PresenceTracker(timeout=30, tick=1.0, clock=lambda: self.now)
+        patcher = mock.patch.object(consumers.presence, 'tracker', self.tracker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(fleet.release, 901)
+
+    def consumer(self):
+        consumer = consumers.DriverConsumer()
+        consumer.user = mock.Mock(id=901, email='driver@example.com')
+        return consumer
+
+    def test_expired_driver_keeps_state_until_last_socket_closes(self):
+        first, second = self.consumer(), self.consumer()
+        self.tracker.connect(901)
+        self.tracker.connect(901)
+        fleet.acquire(901)
+        self.now = 100
+        self.tracker.tick()  # both sockets missed their heartbeats
+        self.assertFalse(self.tracker.is_online(901))
+
+        async_to_sync(first.update_user_offline)()
+        self.assertIn(901, fleet.slots)
+        async_to_sync(second.update_user_offline)()
+        self.assertNotIn(901, fleet.slots)
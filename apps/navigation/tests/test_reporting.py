@@ -0,0 +1,49 @@
+from django.test import SimpleTestCase
+
+from apps.navigation.geo import M_PER_DEG_LAT as M_PER_DEG
+from apps.navigation.reporting import DEFAULT_INTERVAL, ReportingPolicy, snap_interval
+
+LAT, LNG = 23.80, 90.40
+
+
+class SnapIntervalTests(SimpleTestCase):
+    def test_largest_step_not_above(self):
+        self.assertEqual(snap_interval(7), 5)
+        self.assertEqual(snap_interval(0.2), 1)
+        self.assertEqual(snap_interval(1000), 30)
+
+
+class ReportingPolicyTests(SimpleTestCase):
+    def setUp(self):
+        self.policy = ReportingPolicy(clock=lambda: 0.0)
+
+    def test_first_fix_keeps_default(self):
+        self.assertIsNone(self.policy.observe(1, LAT, LNG, ts=0))
+        self.assertEqual(self.policy.current(1), DEFAULT_INTERVAL)
+
+    def test_parked_driver_slows_down(self):
+        self.policy.observe(1, LAT, LNG, ts=0)
+        self.assertEqual(self.policy.observe(1, LAT, LNG, ts=10), 30)
+
+    def test_speed_sets_spacing_interval(self):
+        self.policy.observe(1, LAT, LNG, ts=0)
+        # 25 m/s north: 75 m spacing -> 3 s
+        self.assertEqual(self.policy.observe(1, LAT + 250 / M_PER_DEG, LNG, ts=10), 3)
+
+    def test_turn_asks_for_fastest_step(self):
+        self.policy.observe(1, LAT, LNG, ts=0)
+        self.policy.observe(1, LAT + 100 / M_PER_DEG, LNG, ts=10)  # heading north
+        self.assertEqual(self.policy.observe(1, LAT + 100 / M_PER_DEG, LNG + 0.001, ts=20), 1)
+
+    def test_watchers_cap_the_interval(self):
+        self.policy.observe(1, LAT, LNG, ts=0)
+        self.policy.observe(1, LAT, LNG, ts=10)
+        self.assertEqual(self.policy.watch(1), 3)
+        self.assertIsNone(self.policy.watch(1))
+        self.assertIsNone(self.policy.unwatch(1))
+        self.assertEqual(self.policy.unwatch(1), 30)
+
+    def test_out_of_order_fix_is_ignored(self):
+        self.policy.observe(1, LAT, LNG, ts=10)
+        self.assertIsNone(self.policy.observe(1, LAT + 0.01, LNG, ts=5))
+        self.assertEqual(self.policy.states[1].ts, 10)
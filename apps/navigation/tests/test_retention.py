@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase
+
+from apps.navigation.history import write_pings
+from apps.navigation.models import HistoryCompaction, LocationPing
+from apps.navigation.retention import compact, keep_mask, plan
+
+User = get_user_model()
+
+NOW = datetime(2026, 6, 1, tzinfo=dt_timezone.utc)
+
+
+class PlanTests(SimpleTestCase):
+    def test_default_tiers(self):
+        self.assertEqual(plan(((7, 0), (90, 15), (None, 60))), ([(60, 90), (15, 7)], None))
+
+    def test_last_tier_with_an_age_drops_older_history(self):
+        self.assertEqual(plan(((7, 0), (30, 15), (365, 15))), ([(15, 7)], 365))
+
+    def test_invalid_tiers(self):
+        with self.assertRaises(ValueError):
+            plan(((7, 60), (90, 15)))
+        with self.assertRaises(ValueError):
+            plan(((30, 0), (7, 15)))
+
+
+class KeepMaskTests(SimpleTestCase):
+    def test_first_fix_per_driver_and_window(self):
+        mask = keep_mask([1, 1, 1, 1, 2, 2], [0, 14, 15, 29, 20, 40], 15)
+        self.assertEqual(mask.tolist(), [True, False, True, False, True, True])
+
+
+class CompactTests(TestCase):
+    def setUp(self):
+        self.driver = User.objects.create_user(email='driver@example.com')
+
+    def burst(self, days_ago, count=24, step=5):
+        """`count` fixes `step` s apart from a bucket-aligned start `days_ago` days before NOW."""
+        start = (NOW - timedelta(days=days_ago)).timestamp() // 900 * 900
+        write_pings([(self.driver.id, None, 23.8, 90.4, None, None, start + i * step) for i in range(count)])
+        return start
+
+    def count(self, days_ago):
+        start = (NOW - timedelta(days=days_ago)).timestamp() // 900 * 900
+        window = (datetime.fromtimestamp(start, tz=dt_timezone.utc),
+                  datetime.fromtimestamp(start + 900, tz=dt_timezone.utc))
+        return LocationPing.objects.filter(recorded_at__gte=window[0], recorded_at__lt=window[1]).count()
+
+    def test_each_tier_downsamples_its_age_range(self):
+        for days_ago in (1, 10, 100):
+            self.burst(days_ago)
+        stats = compact(now=NOW)
+        self.assertEqual([self.count(d) for d in (1, 10, 100)], [24, 8, 2])
+        self.assertEqual([(t['resolution_s'], t['deleted']) for t in stats['tiers']], [(60, 22), (15, 16)])
+        self.assertEqual(stats['expired'], 0)
+
+    def test_second_run_only_reads_new_buckets(self):
+        self.burst(10)
+        compact(now=NOW)
+        stats = compact(now=NOW)
+        self.assertEqual([t['scanned'] for t in stats['tiers']], [0, 0])
+        self.assertEqual(set(HistoryCompaction.objects.values_list('resolution_s', flat=True)), {15, 60})
+
+    def test_old_backfill_needs_since(self):
+        compact(now=NOW)
+        self.burst(20)
+        compact(now=NOW)
+        self.assertEqual(self.count(20), 24)
+        compact(now=NOW, since=NOW - timedelta(days=30))
+        self.assertEqual(self.count(20), 8)
+
+    def test_dry_run_changes_nothing(self):
+        self.burst(10)
+        stats = compact(now=NOW, dry_run=True)
+        self.assertEqual(stats['tiers'][1]['deleted'], 16)
+        self.assertEqual(self.count(10), 24)
+        self.assertFalse(HistoryCompaction.objects.exists())
+
+    def test_expiry_tier(self):
+        self.burst(400, count=3)
+        self.burst(10, count=3)
+        stats = compact(now=NOW, retention=((7, 0), (365, 60)))
+        self.assertEqual(stats['expired'], 3)
+        self.assertEqual(LocationPing.objects.count(), 1)
+
+    def test_command_reports_and_validates(self):
+        out = StringIO()
+        call_command('compact_history', '--dry-run', stdout=out)
+        self.assertIn('Would remove 0 downsampled', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('compact_history', '--since', 'last week', stdout=out)
@@ -0,0 +1,124 @@
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from apps.navigation import rollups
+from apps.navigation.geo import M_PER_DEG_LAT
+from apps.navigation.history import get_store
+from apps.navigation.models import DriverDay
+from apps.navigation.rollups import MileageAccumulator
+from apps.subscriptions.models import Subscription, Team
+
+User = get_user_model()
+
+DAY = date(2026, 3, 1)
+T0 = datetime(2026, 3, 1, 23, 58, tzinfo=dt_timezone.utc).timestamp()  # TIME_ZONE is UTC in the test settings
+LAT, LNG = 23.80, 90.40
+
+
+def fix(ts, north_m, driver_id=1, team_id=None):
+    return (driver_id, team_id, LAT + north_m / M_PER_DEG_LAT, LNG, None, None, ts)
+
+
+def totals(increments):
+    return {key: [round(value[0]), value[1], value[2]] for key, value in increments.items()}
+
+
+class MileageAccumulatorTests(SimpleTestCase):
+    def setUp(self):
+        self.accumulator = MileageAccumulator(max_gap=60, moving_mps=1.0, max_speed=50)
+
+    def test_distance_and_driving_time(self):
+        increments = self.accumulator.add([fix(T0, 0), fix(T0 + 10, 100), fix(T0 + 20, 105), fix(T0 + 100, 200)])
+        # 100 m in 10 s drives; 5 m in 10 s is standing; the 80 s gap is too long to count as driving
+        self.assertEqual(totals(increments), {(0, DAY, 1): [200, 10.0, 4]})
+
+    def test_gps_jump_adds_nothing(self):
+        increments = self.accumulator.add([fix(T0, 0), fix(T0 + 10, 1000)])
+        self.assertEqual(totals(increments), {(0, DAY, 1): [0, 0.0, 2]})
+
+    def test_step_goes_to_the_day_of_the_later_fix(self):
+        increments = self.accumulator.add([fix(T0 + 110, 0, team_id=4), fix(T0 + 130, 400, team_id=4)])
+        self.assertEqual(totals(increments), {(4, DAY, 1): [0, 0.0, 1], (4, date(2026, 3, 2), 1): [400, 20.0, 1]})
+
+    def test_out_of_order_fix_only_counts_as_a_ping(self):
+        self.accumulator.add([fix(T0 + 50, 0)])
+        self.assertEqual(totals(self.accumulator.add([fix(T0, 300)])), {(0, DAY, 1): [0, 0.0, 1]})
+        self.assertEqual(self.accumulator.last[1][0], T0 + 50)
+
+
+class RebuildTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(email='owner@example.com')
+        self.team = Team.objects.create(subscription=Subscription.objects.create(user=self.owner))
+        self.other = User.objects.create_user(email='other@example.com')
+        self.rows = [fix(T0 + i * 15, i * 150, self.owner.id, self.team.id) for i in range(20)]
+
+    def stored(self):
+        return {(d.team, d.day, d.driver_id): [round(d.distance_m, 1), d.driving_s, d.pings]
+                for d in DriverDay.objects.all()}
+
+    def test_rebuild_matches_recording_in_order(self):
+        rollups.accumulator = MileageAccumulator()
+        self.addCleanup(setattr, rollups, 'accumulator', MileageAccumulator())
+        rollups.record(self.rows)
+        expected = self.stored()
+        self.assertEqual(sorted(key[1] for key in expected), [DAY, date(2026, 3, 2)])
+
+        DriverDay.objects.all().delete()
+        rollups.record(self.rows[12:])  # a fresh process that only saw the end of the stream
+        get_store().append(self.rows)
+        self.assertEqual(rollups.rebuild(DAY, date(2026, 3, 2), driver_id=self.owner.id), 2)
+        self.assertEqual(self.stored(), expected)
+
+    def test_rebuild_leaves_other_drivers_and_days_alone(self):
+        DriverDay.objects.create(team=0, day=DAY, driver=self.other, distance_m=5.0)
+        DriverDay.objects.create(team=0, day=date(2026, 2, 1), driver=self.owner, distance_m=7.0)
+        get_store().append(self.rows[:4])
+        rollups.rebuild(DAY, DAY, driver_id=self.owner.id)
+        self.assertEqual(DriverDay.objects.get(driver=self.other).distance_m, 5.0)
+        self.assertEqual(DriverDay.objects.get(driver=self.owner, day=date(2026, 2, 1)).distance_m, 7.0)
+        self.assertEqual(DriverDay.objects.get(driver=self.owner, day=DAY).pings, 4)
+
+    def test_team_summary(self):
+        DriverDay.objects.create(team=self.team.id, day=DAY, driver=self.owner, distance_m=12000, driving_s=3600)
+        DriverDay.objects.create(team=self.team.id, day=date(2026, 3, 2), driver=self.owner, distance_m=3000)
+        DriverDay.objects.create(team=self.team.id, day=DAY, driver=self.other, distance_m=20000, driving_s=1800)
+        DriverDay.objects.create(team=0, day=DAY, driver=self.other, distance_m=99000)
+        summary = rollups.team_summary(self.team.id, DAY, date(2026, 3, 2))
+        self.assertEqual(summary['totals'], {"distance_km": 35.0, "driving_h": 1.5, "drivers": 2})
+        self.assertEqual([(d['driver_id'], d['days_active']) for d in summary['drivers']],
+                         [(self.other.id, 1), (self.owner.id, 2)])
+        self.assertEqual([(d['day'], d['drivers'], d['distance_km']) for d in summary['days']],
+                         [(DAY, 2, 32.0), (date(2026, 3, 2), 1, 3.0)])
+
+
+class TeamMileageViewTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(email='owner@example.com')
+        self.team = Team.objects.create(subscription=Subscription.objects.create(user=self.owner))
+        DriverDay.objects.create(team=self.team.id, day=DAY, driver=self.owner, distance_m=12000)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_owner_sees_their_team(self):
+        response = self.client.get('/navigation/teams/mileage/?start=2026-03-01&end=2026-03-01&team=999')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['team'], self.team.id)  # team is ignored for non-staff
+        self.assertEqual(response.data['totals']['distance_km'], 12.0)
+
+    def test_staff_picks_a_team(self):
+        self.client.force_authenticate(User.objects.create_user(email='staff@example.com', is_staff=True))
+        response = self.client.get(f'/navigation/teams/mileage/?start=2026-03-01&end=2026-03-01&team={self.team.id}')
+        self.assertEqual(response.data['drivers'][0]['driver_id'], self.owner.id)
+
+    def test_bad_requests(self):
+        for query in ('start=2026-03-02&end=2026-03-01', 'start=2025-01-01&end=2026-03-01', 'start=March',
+                      'start=&end=2026-03-01'):
+            self.assertEqual(self.client.get(f'/navigation/teams/mileage/?{query}').status_code, 400, query)
+
+    def test_caller_without_team_is_forbidden(self):
+        self.client.force_authenticate(User.objects.create_user(email='driver@example.com'))
+        self.assertEqual(self.client.get('/navigation/teams/mileage/').status_code, 403)
@@ -0,0 +1,138 @@
+import os
+import shutil
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from apps.navigation.segments import BLOCK, SegmentPingStore, merged, read_segment, to_records, to_rows
+
+DAY = datetime(2026, 3, 1, tzinfo=dt_timezone.utc)
+T0 = DAY.timestamp()
+
+
+def rows_for(driver, start, count, step=5.0, team=None, lat=23.8):
+    return [(driver, team, lat + i * 1e-5, 90.4, 3.5, None, start + i * step) for i in range(count)]
+
+
+class RecordTests(SimpleTestCase):
+    def test_round_trip(self):
+        rows = [(7, None, 23.8123456, -90.4, None, 45.0, T0 + 0.25), (8, 3, -33.9, 151.2, 2.5, None, T0)]
+        back = to_rows(to_records(rows))
+        self.assertEqual([r[0] for r in back], [7, 8])
+        self.assertAlmostEqual(back[0][1], 23.8123456, places=7)
+        self.assertEqual((back[0][3], back[0][4], back[1][3], back[1][4]), (None, 45.0, 2.5, None))
+        self.assertEqual(back[0][5], datetime.fromtimestamp(T0 + 0.25, tz=dt_timezone.utc))
+        self.assertEqual(len(to_records([])), 0)
+
+
+class SegmentStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.store = SegmentPingStore(self.directory)
+
+    def files(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_requires_a_directory(self):
+        with self.assertRaises(ValueError):
+            SegmentPingStore(None)
+
+    def test_appends_split_by_utc_day(self):
+        self.store.append(rows_for(1, T0 - 10, 4))
+        self.assertEqual([f for f in self.files() if f.endswith('.seg')], ['2026-02-28.seg', '2026-03-01.seg'])
+        self.assertEqual(self.store.days(), [date(2026, 2, 28), date(2026, 3, 1)])
+        self.assertEqual(self.store.latest(1), datetime.fromtimestamp(T0 + 5, tz=dt_timezone.utc))
+        self.assertIsNone(self.store.latest(2))
+
+    def test_scan_matches_brute_force_across_indexed_blocks(self):
+        rows = []
+        for driver in (3, 1, 2):
+            rows += rows_for(driver, T0 + driver, BLOCK + 200, step=30.0, team=driver % 2)
+        for i in range(0, len(rows), 700):  # interleaved batches, like the live writer
+            self.store.append(rows[i:i + 700])
+        start = datetime.fromtimestamp(T0 + 3600 * 5, tz=dt_timezone.utc)
+        end = datetime.fromtimestamp(T0 + 3600 * 30, tz=dt_timezone.utc)
+
+        def expected(keep):
+            return sorted((r[0], r[6]) for r in rows if keep(r))
+
+        def scanned(**query):
+            return [(r[0], r[5].timestamp()) for r in self.store.scan(**query)]
+
+        in_window = lambda r: start.timestamp() <= r[6] <= end.timestamp()  # noqa: E731
+        self.assertEqual(scanned(start=start, end=end), expected(in_window))
+        self.assertEqual(scanned(driver_id=2, start=start, end=end), expected(lambda r: r[0] == 2 and in_window(r)))
+        self.assertEqual(scanned(team_id=1), expected(lambda r: r[1] == 1))
+        box = (23.8, 90.39, 23.801, 90.41)
+        self.assertEqual(scanned(bbox=box), expected(lambda r: r[2] <= 23.801 + 1e-9))
+        self.assertTrue(any(name.endswith('.idx') for name in self.files()))
+
+    def test_sparse_index_extends_and_resets(self):
+        self.store.append(rows_for(1, T0, BLOCK))
+        list(self.store.scan(driver_id=1))
+        path = self.store.log_path(DAY.date())
+        self.assertEqual(len(np.load(path + '.idx')), 1)
+        self.store.append(rows_for(1, T0 + 86000, BLOCK, step=0.1))
+        self.assertEqual(len(list(self.store.scan(driver_id=1))), 2 * BLOCK)
+        self.assertEqual(len(np.load(path + '.idx')), 2)
+
+    def test_compaction_applies_tiers_by_age(self):
+        now = DAY + timedelta(days=20)
+        self.store.append(rows_for(1, T0, 24))  # 20 days old: 15 s tier
+        self.store.append(rows_for(1, now.timestamp() - 86400 * 2, 24))  # 2 days old: kept raw, but sorted
+        self.store.append(rows_for(1, now.timestamp() + 10, 24))  # today: left as a log
+        stats = self.store.compact(now=now, retention=((7, 0), (90, 15)))
+        self.assertEqual([(t['resolution_s'], t['chunks'], t['deleted']) for t in stats['tiers']],
+                         [(15, 1, 16), (0, 1, 0)])
+        self.assertIn('2026-03-01.r15.seg', self.files())
+        self.assertIn(f'{now.date().isoformat()}.seg', self.files())
+        self.assertEqual(len(read_segment(os.path.join(self.directory, '2026-03-01.r15.seg'))), 8)
+
+        again = self.store.compact(now=now, retention=((7, 0), (90, 15)))
+        self.assertEqual([t['chunks'] for t in again['tiers']], [0, 0])
+
+    def test_late_appends_are_merged_into_the_compacted_day(self):
+        now = DAY + timedelta(days=20)
+        self.store.append(rows_for(1, T0, 4, step=60))
+        self.store.compact(now=now)
+        self.store.append(rows_for(2, T0, 2, step=60))
+        self.assertEqual(len(list(self.store.scan())), 6)
+        self.store.compact(now=now)
+        self.assertEqual([f for f in self.files() if f.endswith('.seg')], ['2026-03-01.r15.seg'])
+        self.assertEqual([r[0] for r in self.store.scan()], [1, 1, 1, 1, 2, 2])
+
+    def test_dry_run_and_expiry(self):
+        self.store.append(rows_for(1, T0, 24))
+        now = DAY + timedelta(days=400)
+        dry = self.store.compact(now=now, retention=((7, 0), (365, 60)), dry_run=True)
+        self.assertEqual(dry['expired'], 24)
+        self.assertEqual(self.files(), ['.compact.lock', '2026-03-01.seg'])
+        self.store.compact(now=now, retention=((7, 0), (365, 60)))
+        self.assertEqual(self.store.days(), [])
+
+    def test_recovers_from_an_interrupted_compaction(self):
+        now = DAY + timedelta(days=2)
+        self.store.append(rows_for(1, T0, 3))
+        self.store.compact(now=now)
+        target = os.path.join(self.directory, '2026-03-01.r0.seg')
+        # died after writing the target: its source log (same records) was never removed,
+        # and a half-written temporary file is left behind
+        shutil.copy(target, os.path.join(self.directory, '2026-03-01.c1.seg'))
+        with open(target + '.4242.tmp', 'wb') as f:
+            f.write(b'partial')
+        self.assertEqual(len(list(self.store.scan())), 6)  # copies are visible until the next pass
+        self.store.compact(now=now)
+        self.assertEqual([f for f in self.files() if f != '.compact.lock'], ['2026-03-01.r0.seg'])
+        self.assertEqual(len(list(self.store.scan())), 3)
+
+    def test_merged_drops_repeated_records(self):
+        first = os.path.join(self.directory, 'a.seg')
+        second = os.path.join(self.directory, 'b.seg')
+        with open(first, 'wb') as f:
+            f.write(to_records(rows_for(1, T0, 3)).tobytes())
+        with open(second, 'wb') as f:
+            f.write(to_records(rows_for(1, T0 + 10, 3)).tobytes())
+        self.assertEqual(merged([first, second])['ts'].tolist(), [T0, T0 + 5, T0 + 10, T0 + 15, T0 + 20])
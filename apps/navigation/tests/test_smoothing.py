@@ -0,0 +1,57 @@
+import math
+
+from django.test import SimpleTestCase
+
+from apps.navigation.geo import M_PER_DEG_LAT
+from apps.navigation.smoothing import ACCEPTED, REJECTED, SUPPRESSED, LocationFilter, valid_position
+
+LAT, LNG = 23.80, 90.40
+
+
+class ValidPositionTests(SimpleTestCase):
+    def test_range_and_finiteness(self):
+        self.assertTrue(valid_position(LAT, LNG))
+        self.assertTrue(valid_position(-90, 180))
+        self.assertFalse(valid_position(91, 0))
+        self.assertFalse(valid_position(0, -180.5))
+        self.assertFalse(valid_position(math.nan, 0))
+        self.assertFalse(valid_position(0, math.inf))
+
+
+class LocationFilterTests(SimpleTestCase):
+    def setUp(self):
+        self.filter = LocationFilter(alpha=0.6, beta=0.2, max_speed=70.0, min_move=8.0, clock=lambda: 0.0)
+        self.filter.reset(1, LAT, LNG, ts=0)
+
+    def test_first_fix_starts_tracking(self):
+        self.assertEqual(self.filter.update(2, LAT, LNG, ts=5), (ACCEPTED, LAT, LNG))
+        self.assertIn(2, self.filter.states)
+
+    def test_jitter_inside_accuracy_is_suppressed(self):
+        verdict, lat, lng = self.filter.update(1, LAT + 3 / M_PER_DEG_LAT, LNG, ts=5, accuracy=10)
+        self.assertEqual((verdict, lat, lng), (SUPPRESSED, LAT, LNG))
+
+    def test_steady_motion_is_accepted_and_smoothed(self):
+        lat = LAT
+        for second in range(1, 11):
+            lat = LAT + 15 * second / M_PER_DEG_LAT  # 15 m/s north
+            verdict, smoothed, _ = self.filter.update(1, lat, LNG, ts=second)
+        self.assertEqual(verdict, ACCEPTED)
+        self.assertLess(abs(smoothed - lat) * M_PER_DEG_LAT, 15)
+        self.assertGreater(self.filter.states[1].vn, 10)
+
+    def test_implausible_jump_is_rejected(self):
+        verdict, lat, lng = self.filter.update(1, LAT + 0.05, LNG, ts=10)  # ~5.5 km in 10 s
+        self.assertEqual((verdict, lat, lng), (REJECTED, LAT, LNG))
+
+    def test_out_of_order_fix_is_rejected(self):
+        self.assertEqual(self.filter.update(1, LAT, LNG, ts=-1)[0], REJECTED)
+
+    def test_invalid_input_never_reaches_state(self):
+        for lat, lng, ts in ((math.nan, LNG, 5), (LAT, 200.0, 5), (LAT, LNG, math.inf)):
+            self.assertEqual(self.filter.update(1, lat, lng, ts=ts), (REJECTED, LAT, LNG))
+        self.assertEqual(self.filter.states[1].ts, 0)
+
+    def test_non_finite_accuracy_falls_back_to_min_move(self):
+        verdict, _, _ = self.filter.update(1, LAT + 20 / M_PER_DEG_LAT, LNG, ts=5, accuracy=math.nan)
+        self.assertEqual(verdict, ACCEPTED)
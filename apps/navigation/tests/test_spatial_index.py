@@ -0,0 +1,120 @@
+import math
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from apps.navigation import spatial_index
+from apps.navigation.geo import M_PER_DEG_LAT
+from apps.navigation.models import OversizedLoadDetail, RouteStop, SavedRoute, SpatialGridEntry
+from apps.navigation.spatial_index import GRID_MAX_CELLS, WIDE, grid_cells, saved_route_bbox
+
+User = get_user_model()
+
+LAT, LNG = 23.80, 90.40
+
+
+class GridCellTests(SimpleTestCase):
+    def test_box_covers_every_touched_cell(self):
+        self.assertEqual(grid_cells((23.74, 23.76, 90.39, 90.41)),
+                         [(474, 1807), (474, 1808), (475, 1807), (475, 1808)])
+        self.assertEqual(grid_cells((-0.01, -0.01, -0.01, -0.01)), [(-1, -1)])
+
+    def test_oversized_box_goes_into_the_wide_cell(self):
+        side = math.isqrt(GRID_MAX_CELLS) * 0.05 + 0.1
+        self.assertEqual(grid_cells((0, side, 0, side)), [(WIDE, WIDE)])
+
+
+class IndexBackendTests:
+    """Shared checks; subclasses pick the R-tree or the grid fallback."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='pw')
+        rng = np.random.default_rng(8)
+        self.points = rng.uniform(-0.2, 0.2, (60, 2)) + (LAT, LNG)
+        self.loads = [OversizedLoadDetail.objects.create(user=self.user, latitude=a, longitude=b)
+                      for a, b in self.points]
+
+    def ids(self, queryset):
+        return sorted(queryset.values_list('id', flat=True))
+
+    def expected(self, mask):
+        return sorted(load.id for load, keep in zip(self.loads, mask) if keep)
+
+    def test_bbox_matches_brute_force(self):
+        lat, lng = self.points[:, 0], self.points[:, 1]
+        box = (LAT - 0.05, LNG - 0.1, LAT + 0.1, LNG + 0.02)
+        mask = (lat >= box[0]) & (lat <= box[2]) & (lng >= box[1]) & (lng <= box[3])
+        self.assertEqual(self.ids(OversizedLoadDetail.objects.in_bbox(*box)), self.expected(mask))
+
+    def test_radius_matches_brute_force(self):
+        dy = (self.points[:, 0] - LAT) * M_PER_DEG_LAT
+        dx = (self.points[:, 1] - LNG) * M_PER_DEG_LAT * math.cos(math.radians(LAT))
+        found = self.ids(OversizedLoadDetail.objects.within_radius(LAT, LNG, 10000))
+        self.assertEqual(found, self.expected(np.hypot(dx, dy) <= 10000))
+        self.assertTrue(found)
+
+    def test_moves_deletes_and_bulk_writes_are_tracked(self):
+        load = self.loads[0]
+        near = OversizedLoadDetail.objects.within_radius(10.0, 10.0, 100)
+        load.latitude, load.longitude = 10.0, 10.0
+        load.save()
+        self.assertEqual(self.ids(near), [load.id])
+        load.delete()
+        self.assertEqual(self.ids(near), [])
+
+        other = self.loads[1]
+        OversizedLoadDetail.objects.filter(id=other.id).update(latitude=10.0, longitude=10.0)
+        self.assertEqual(self.ids(near), [])
+        spatial_index.reindex(OversizedLoadDetail, [other.id])
+        self.assertEqual(self.ids(near), [other.id])
+
+    def test_route_box_covers_its_stops(self):
+        route = SavedRoute.objects.create(user=self.user, name='Drops')
+        RouteStop.objects.create(route=route, latitude=5.0, longitude=5.0)
+        RouteStop.objects.create(route=route, latitude=5.2, longitude=5.4)
+        self.assertEqual(saved_route_bbox(route), (5.0, 5.2, 5.0, 5.4))
+        spatial_index.reindex(SavedRoute, [route.id])
+        self.assertEqual(self.ids(SavedRoute.objects.in_bbox(5.1, 5.3, 5.15, 5.35)), [route.id])
+
+
+class RtreeIndexTests(IndexBackendTests, TestCase):
+    def setUp(self):
+        if not spatial_index.uses_rtree(OversizedLoadDetail):
+            self.skipTest("SQLite R-tree module not available")
+        super().setUp()
+
+    def test_no_grid_rows_are_written(self):
+        self.assertFalse(SpatialGridEntry.objects.exists())
+
+
+class GridIndexTests(IndexBackendTests, TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(spatial_index, 'uses_rtree', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+
+    def test_one_row_per_covered_cell(self):
+        self.assertEqual(SpatialGridEntry.objects.filter(object_id=self.loads[0].id).count(), 1)
+
+
+class ViewportViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.load = OversizedLoadDetail.objects.create(user=self.user, latitude=LAT, longitude=LNG)
+
+    def test_bbox_and_radius_queries(self):
+        bbox = f'{LNG - 0.01},{LAT - 0.01},{LNG + 0.01},{LAT + 0.01}'
+        response = self.client.get(f'/navigation/loads/viewport/?bbox={bbox}')
+        self.assertEqual([row['id'] for row in response.data['loads']], [self.load.id])
+        response = self.client.get(f'/navigation/loads/viewport/?lat={LAT + 0.01}&lng={LNG}&radius_m=500')
+        self.assertEqual(response.data['count'], 0)
+
+    def test_invalid_viewports(self):
+        for query in ('bbox=1,2,3', 'lat=1&lng=2', 'lat=1&lng=2&radius_m=0', 'lat=1&lng=2&radius_m=600000'):
+            self.assertEqual(self.client.get(f'/navigation/loads/viewport/?{query}').status_code, 400, query)
@@ -0,0 +1,131 @@
+import itertools
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from apps.navigation import views
+from apps.navigation.geo import haversine_m
+from apps.navigation.models import RouteStop, SavedRoute
+from apps.navigation.tour import (
+    FALLBACK_SPEED, nearest_neighbour, optimize_order, optimize_stops, or_opt, tour_cost, two_opt,
+)
+
+User = get_user_model()
+
+
+def euclidean(points):
+    points = np.asarray(points, dtype=np.float64)
+    return np.hypot(points[:, None, 0] - points[None, :, 0], points[:, None, 1] - points[None, :, 1])
+
+
+def brute_force(cost, closed=False, fix_end=False):
+    n = len(cost)
+    tail = [n - 1] if fix_end else []
+    middle = range(1, n - 1) if fix_end else range(1, n)
+    return min(tour_cost([0, *p, *tail], cost, closed) for p in itertools.permutations(middle))
+
+
+class LocalSearchTests(SimpleTestCase):
+    def test_two_opt_uncrosses_a_tour(self):
+        angles = np.linspace(0, 2 * np.pi, 8, endpoint=False)
+        cost = euclidean(np.column_stack((np.cos(angles), np.sin(angles))))
+        order = two_opt([0, 1, 2, 5, 4, 3, 6, 7], cost, fixed_tail=False)
+        self.assertEqual(order.tolist(), list(range(8)))
+
+    def test_two_opt_on_asymmetric_costs_keeps_the_fixed_tail(self):
+        cost = np.random.default_rng(2).uniform(1, 100, (7, 7))
+        order = two_opt([0, 3, 1, 5, 2, 4, 6], cost, fixed_tail=True)
+        self.assertEqual((order[0], order[-1]), (0, 6))
+        self.assertLessEqual(tour_cost(order, cost), tour_cost([0, 3, 1, 5, 2, 4, 6], cost))
+
+    def test_or_opt_relocates_a_misplaced_stop(self):
+        cost = euclidean([(0, 0), (1, 0), (2, 0), (3, 0), (1.5, 0)])
+        order, improved = or_opt([0, 1, 2, 3, 4], cost, fixed_tail=False)
+        self.assertTrue(improved)
+        self.assertLess(tour_cost(order, cost), tour_cost([0, 1, 2, 3, 4], cost))
+
+    def test_nearest_neighbour_keeps_the_end(self):
+        cost = euclidean([(0, 0), (5, 0), (1, 0), (2, 0)])
+        self.assertEqual(nearest_neighbour(cost), [0, 2, 3, 1])
+        self.assertEqual(nearest_neighbour(cost, fix_end=True), [0, 2, 1, 3])
+
+
+class OptimizeOrderTests(SimpleTestCase):
+    def setUp(self):
+        self.cost = np.random.default_rng(5).uniform(1, 100, (7, 7))
+
+    def test_small_instances_are_exact(self):
+        order, total = optimize_order(self.cost)
+        self.assertAlmostEqual(total, brute_force(self.cost))
+        self.assertEqual(sorted(order), list(range(7)))
+        order, total = optimize_order(self.cost, return_to_start=True)
+        self.assertAlmostEqual(total, brute_force(self.cost, closed=True))
+        self.assertEqual((order[0], len(order)), (0, 7))
+        order, total = optimize_order(self.cost, fix_end=True)
+        self.assertAlmostEqual(total, brute_force(self.cost, fix_end=True))
+        self.assertEqual(order[-1], 6)
+
+    def test_large_instance_improves_on_construction(self):
+        cost = euclidean(np.random.default_rng(6).uniform(0, 1000, (40, 2)))
+        order, total = optimize_order(cost, budget_ms=200, fix_end=True)
+        self.assertEqual((order[0], order[-1], sorted(order)), (0, 39, list(range(40))))
+        self.assertAlmostEqual(total, tour_cost(order, cost))
+        self.assertLess(total, tour_cost(nearest_neighbour(cost, fix_end=True), cost))
+
+    def test_trivial_and_conflicting_options(self):
+        self.assertEqual(optimize_order(np.zeros((0, 0))), ([], 0.0))
+        self.assertEqual(optimize_order([[0, 3], [4, 0]], return_to_start=True), ([0, 1], 7.0))
+        with self.assertRaises(ValueError):
+            optimize_order(self.cost, return_to_start=True, fix_end=True)
+
+
+class OptimizeStopsTests(SimpleTestCase):
+    def test_service_time_counts_once_per_stop(self):
+        stops = [{"lat": 23.75, "lng": 90.35 + 0.01 * x, "service_s": 60} for x in (0, 3, 1, 2)]
+        result = optimize_stops(None, stops, budget_ms=50)
+        self.assertEqual(result['order'], [0, 2, 3, 1])
+        self.assertLess(result['duration_s'], result['initial_duration_s'])
+        travel = result['duration_s'] - 4 * 60
+        self.assertAlmostEqual(travel, haversine_m(23.75, 90.35, 23.75, 90.38) / FALLBACK_SPEED, delta=0.5)
+        self.assertTrue(result['polyline'])
+
+
+class RouteOptimizeViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='planner@example.com', password='pw')
+        self.route = SavedRoute.objects.create(user=self.user, name='Drops')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/navigation/routes/{self.route.id}/optimize/'
+
+    def add_stops(self, *offsets):
+        for sequence, x in enumerate(offsets):
+            RouteStop.objects.create(route=self.route, sequence=sequence, name=str(x),
+                                     latitude=23.75, longitude=90.35 + 0.01 * x)
+
+    def test_apply_saves_the_new_order(self):
+        self.add_stops(0, 3, 1, 2)
+        with mock.patch.object(views, 'get_road_graph', return_value=None):
+            response = self.client.post(self.url, {"budget_ms": 50}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([s['name'] for s in response.data['stops']], ['0', '1', '2', '3'])
+        self.assertEqual(list(self.route.stops.values_list('name', flat=True)), ['0', '1', '2', '3'])
+        self.route.refresh_from_db()
+        self.assertEqual(self.route.duration_s, response.data['duration_s'])
+
+    def test_dry_run_leaves_the_route_alone(self):
+        self.add_stops(0, 3, 1)
+        with mock.patch.object(views, 'get_road_graph', return_value=None):
+            response = self.client.post(self.url, {"apply": False}, format='json')
+        self.assertFalse(response.data['applied'])
+        self.assertEqual(list(self.route.stops.values_list('name', flat=True)), ['0', '3', '1'])
+
+    def test_invalid_requests(self):
+        self.add_stops(0)
+        self.assertEqual(self.client.post(self.url, {}, format='json').status_code, 400)
+        self.add_stops(0, 1)
+        response = self.client.post(self.url, {"return_to_start": True, "fix_end": True}, format='json')
+        self.assertEqual(response.status_code, 400)
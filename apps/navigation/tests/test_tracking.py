@@ -0,0 +1,163 @@
+from unittest import mock
+
+from channels.routing import URLRouter
+from channels.testing import HttpCommunicator
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.test import SimpleTestCase, TestCase
+from django.urls import re_path
+from rest_framework.test import APIClient
+
+from apps.navigation import eta, geocoder, tracking
+from apps.navigation.consumers import TrackingStreamConsumer
+from apps.navigation.fleet import ONLINE, FleetState
+from apps.navigation.geo import encode_polyline
+from apps.navigation.models import RouteAssignment, SavedRoute
+
+User = get_user_model()
+
+LAT, LNG = 23.75, 90.35
+ROUTE = encode_polyline([(LAT, LNG), (LAT, LNG + 0.01)])
+
+
+class TokenTests(SimpleTestCase):
+    def test_round_trip(self):
+        self.assertEqual(tracking.read_token(tracking.make_token(7)), (7, None))
+        self.assertEqual(tracking.read_token(tracking.make_token(7, 42)), (7, 42))
+
+    def test_tampered_foreign_or_expired_token(self):
+        token = tracking.make_token(7)
+        self.assertIsNone(tracking.read_token(token[:-2] + 'xx'))
+        self.assertIsNone(tracking.read_token(signing.dumps({'d': 7, 'a': None}, salt='other', compress=True)))
+        with mock.patch.object(tracking, 'TRACKING_LINK_MAX_AGE', -1):
+            self.assertIsNone(tracking.read_token(token))
+
+    def test_frame(self):
+        self.assertEqual(tracking.frame("location", {"lat": 1.5}), b'event: location\ndata: {"lat":1.5}\n\n')
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        self.driver = User.objects.create_user(email='driver@example.com')
+        self.fleet = FleetState(capacity=4)
+        self.engine = eta.EtaEngine()
+        for target, name, value in ((tracking, 'fleet', self.fleet), (eta, 'engine', self.engine),
+                                    (geocoder, 'describe', lambda lat, lng: "near Test")):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_live_position_and_estimate(self):
+        self.fleet.acquire(self.driver.id)
+        self.fleet.update(self.driver.id, LAT, LNG, 1000.0)
+        self.fleet.set_status(self.driver.id, ONLINE)
+        self.engine.assign(self.driver.id, 42, None)
+        self.engine.get(self.driver.id).estimate = {"assignment_id": 42, "remaining_s": 60}
+        data = tracking.snapshot(self.driver.id)
+        self.assertTrue(data['online'])
+        self.assertEqual(data['position'], {"lat": LAT, "lng": LNG, "ts": 1000.0, "place": "near Test"})
+        self.assertEqual(data['eta']['remaining_s'], 60)
+        self.assertIsNone(data['assignment'])
+
+    def test_falls_back_to_the_saved_location(self):
+        SavedRoute.objects.create(user=self.driver, name="Current Location", latitude=LAT, longitude=LNG)
+        data = tracking.snapshot(self.driver.id)
+        self.assertFalse(data['online'])
+        self.assertEqual((data['position']['lat'], data['position']['lng']), (LAT, LNG))
+        self.assertIsNone(tracking.snapshot(self.driver.id + 1)['position'])
+
+    def test_delivery_link(self):
+        assignment = RouteAssignment.objects.create(driver=self.driver, polyline=ROUTE)
+        self.engine.assign(self.driver.id, assignment.id + 1, None)  # estimate of another assignment
+        self.engine.get(self.driver.id).estimate = {"assignment_id": assignment.id + 1}
+        SavedRoute.objects.create(user=self.driver, name="Current Location", latitude=LAT, longitude=LNG)
+        data = tracking.snapshot(self.driver.id, assignment.id)
+        self.assertEqual(data['assignment'], {"id": assignment.id, "active": True})
+        self.assertIsNone(data['eta'])
+        self.assertIsNotNone(data['position'])
+
+        RouteAssignment.objects.update(is_active=False)
+        data = tracking.snapshot(self.driver.id, assignment.id)
+        self.assertEqual(data['assignment'], {"id": assignment.id, "active": False})
+        self.assertIsNone(data['position'])
+        self.assertFalse(tracking.snapshot(self.driver.id + 1, assignment.id)['assignment']['active'])
+
+
+class TrackingApiTests(TestCase):
+    def setUp(self):
+        self.driver = User.objects.create_user(email='driver@example.com')
+        self.other = User.objects.create_user(email='other@example.com')
+        SavedRoute.objects.create(user=self.driver, name="Current Location", latitude=LAT, longitude=LNG)
+        self.client = APIClient()
+        self.client.force_authenticate(self.driver)
+
+    def test_link_and_cacheable_snapshot(self):
+        response = self.client.post('/navigation/track/', {}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.data['stream'].endswith(f"/navigation/track/{response.data['token']}/stream/"))
+
+        public = APIClient()
+        snapshot = public.get(f"/navigation/track/{response.data['token']}/")
+        self.assertEqual(snapshot.status_code, 200)
+        self.assertEqual(snapshot.data['position']['lat'], LAT)
+        self.assertEqual(snapshot['Cache-Control'], f'public, max-age={tracking.TRACKING_SNAPSHOT_MAX_AGE}')
+        again = public.get(f"/navigation/track/{response.data['token']}/", HTTP_IF_NONE_MATCH=snapshot['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_link_requests(self):
+        self.assertEqual(self.client.post('/navigation/track/', {"driver_id": self.other.id}, format='json')
+                         .status_code, 403)
+        self.assertEqual(self.client.post('/navigation/track/', {"driver_id": "me"}, format='json').status_code, 400)
+        self.assertEqual(self.client.post('/navigation/track/', {"assignment_id": 999}, format='json').status_code,
+                         404)
+        self.assertEqual(APIClient().get('/navigation/track/not-a-token/').status_code, 404)
+
+    def test_finished_delivery_is_gone(self):
+        assignment = RouteAssignment.objects.create(driver=self.driver, polyline=ROUTE)
+        token = self.client.post('/navigation/track/', {"assignment_id": assignment.id}, format='json').data['token']
+        self.assertEqual(APIClient().get(f'/navigation/track/{token}/').data['assignment']['active'], True)
+        RouteAssignment.objects.update(is_active=False)
+        response = APIClient().get(f'/navigation/track/{token}/')
+        self.assertEqual(response.status_code, 410)
+        self.assertNotIn('position', response.data)
+        self.assertEqual(self.client.post('/navigation/track/', {"assignment_id": assignment.id}, format='json')
+                         .status_code, 404)
+
+
+class TrackingStreamTests(TestCase):
+    application = URLRouter([re_path(r"^navigation/track/(?P<token>[^/]+)/stream/$", TrackingStreamConsumer.as_asgi())])
+
+    def setUp(self):
+        self.driver = User.objects.create_user(email='driver@example.com')
+
+    def communicator(self, token):
+        return HttpCommunicator(self.application, 'GET', f'/navigation/track/{token}/stream/')
+
+    async def test_rejected_links(self):
+        response = await self.communicator('not-a-token').get_response()
+        self.assertEqual(response['status'], 404)
+        assignment = await RouteAssignment.objects.acreate(driver=self.driver, polyline=ROUTE, is_active=False)
+        response = await self.communicator(tracking.make_token(self.driver.id, assignment.id)).get_response()
+        self.assertEqual(response['status'], 410)
+
+    async def test_stream_opens_with_a_snapshot(self):
+        communicator = self.communicator(tracking.make_token(self.driver.id))
+        with mock.patch.object(tracking, 'ensure_keepalive_loop'):
+            await communicator.send_input({"type": "http.request", "body": b""})
+            start = await communicator.receive_output(timeout=5)
+            body = await communicator.receive_output(timeout=5)
+        self.assertEqual(start['status'], 200)
+        self.assertIn((b"Content-Type", b"text/event-stream"), start['headers'])
+        self.assertTrue(body['more_body'])
+        self.assertTrue(body['body'].startswith(b'retry: 5000\n\nevent: snapshot\ndata: {"driver_id":'))
+        await communicator.send_input({"type": "http.disconnect"})
+        await communicator.wait()
+
+    async def test_other_assignments_estimate_is_not_forwarded(self):
+        consumer = TrackingStreamConsumer()
+        consumer.assignment_id = 42
+        consumer.send_body = mock.AsyncMock()
+        await consumer.location_update({"lat": LAT, "lng": LNG, "eta": {"assignment_id": 43}})
+        self.assertIn(b'"eta":null', consumer.send_body.call_args.args[0])
+        await consumer.location_update({"lat": LAT, "lng": LNG, "eta": {"assignment_id": 42}})
+        self.assertIn(b'"eta":{"assignment_id":42}', consumer.send_body.call_args.args[0])
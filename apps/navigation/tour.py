@@ -0,0 +1,216 @@
+"""
+apps/navigation/tour.py
+
+Stop ordering for multi-drop routes.
+
+The first stop is the fixed start (depot or driver position); the rest are
+reordered to minimise total travel time over a precomputed cost matrix
+(node_matrix over the road graph, so rows are shared with the matrix cache).
+
+- Construction: nearest neighbour.
+- Local search: 2-opt (all segment reversals scored at once with NumPy,
+  using prefix sums so asymmetric matrices are handled) and Or-opt
+  (move a run of 1-3 stops elsewhere).
+- Until the time budget runs out the best tour is perturbed with a
+  double-bridge kick and re-optimised (iterated local search).
+"""
+import itertools
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .geo import encode_polyline, haversine_m_np
+from .matrix import node_matrix
+
+ROUTE_MAX_STOPS = getattr(settings, 'NAVIGATION_ROUTE_MAX_STOPS', 100)
+OPTIMIZE_BUDGET_MS = getattr(settings, 'NAVIGATION_OPTIMIZE_BUDGET_MS', 1000)
+FALLBACK_SPEED = 8.0  # m/s used for straight-line costs without a road graph
+UNREACHABLE = 1e9
+EXACT_MAX_MOVABLE = 7  # enumerate every order up to this many movable stops (7! = 5040)
+
+
+def tour_cost(order, cost, closed=False):
+    order = np.asarray(order)
+    total = float(cost[order[:-1], order[1:]].sum())
+    if closed:
+        total += float(cost[order[-1], order[0]])
+    return total
+
+
+def nearest_neighbour(cost, fix_end=False):
+    n = len(cost)
+    last = n - 1 if fix_end else None
+    order = [0]
+    remaining = set(range(1, n)) - {last}
+    while remaining:
+        here = order[-1]
+        nxt = min(remaining, key=lambda j: cost[here, j])
+        order.append(nxt)
+        remaining.discard(nxt)
+    if last is not None and last != 0:
+        order.append(last)
+    return order
+
+
+def two_opt(order, cost, fixed_tail):
+    """Best-improvement 2-opt until no reversal helps. Position 0 (and the tail if fixed) never moves."""
+    order = np.asarray(order)
+    n = len(order)
+    end = n - 1 if fixed_tail else n  # positions [1, end) may be reversed
+    while True:
+        forward = np.concatenate(([0.0], np.cumsum(cost[order[:-1], order[1:]])))
+        backward = np.concatenate(([0.0], np.cumsum(cost[order[1:], order[:-1]])))
+        i = np.arange(1, end)[:, None]  # segment start
+        j = np.arange(1, end)[None, :]  # segment end (inclusive)
+        valid = j > i
+        ii, jj = np.broadcast_arrays(i, j)
+        ii, jj = ii[valid], jj[valid]
+        if not len(ii):
+            return order
+        before = order[ii - 1]
+        first, last = order[ii], order[jj]
+        has_after = jj + 1 < n
+        after = order[np.minimum(jj + 1, n - 1)]
+        delta = (cost[before, last] - cost[before, first]
+                 + (backward[jj] - backward[ii]) - (forward[jj] - forward[ii])
+                 + np.where(has_after, cost[first, after] - cost[last, after], 0.0))
+        best = int(np.argmin(delta))
+        if delta[best] >= -1e-9:
+            return order
+        a, b = int(ii[best]), int(jj[best])
+        order = np.concatenate((order[:a], order[a:b + 1][::-1], order[b + 1:]))
+
+
+def or_opt(order, cost, fixed_tail):
+    """First-improvement Or-opt: relocate runs of 1-3 stops. Returns (order, improved)."""
+    order = list(order)
+    n = len(order)
+    end = n - 1 if fixed_tail else n
+    for length in (1, 2, 3):
+        for start in range(1, end - length + 1):
+            run = order[start:start + length]
+            prev, nxt = order[start - 1], order[start + length] if start + length < n else None
+            removed = cost[prev, run[0]] + (cost[run[-1], nxt] - cost[prev, nxt] if nxt is not None else 0.0)
+            rest = order[:start] + order[start + length:]
+            for pos in range(1, len(rest) + 1 if not fixed_tail else len(rest)):
+                if pos == start:
+                    continue
+                a = rest[pos - 1]
+                b = rest[pos] if pos < len(rest) else None
+                added = cost[a, run[0]] + (cost[run[-1], b] - cost[a, b] if b is not None else 0.0)
+                if added - removed < -1e-9:
+                    return rest[:pos] + run + rest[pos:], True
+    return order, False
+
+
+def local_search(order, cost, fixed_tail, deadline):
+    while True:
+        order = list(two_opt(order, cost, fixed_tail))
+        if time.monotonic() >= deadline:
+            return order
+        order, improved = or_opt(order, cost, fixed_tail)
+        if not improved:
+            return order
+
+
+def double_bridge(order, rng, fixed_tail):
+    """Cut the movable part into four pieces A B C D and reconnect as A C B D."""
+    head, body = order[:1], order[1:]
+    tail = []
+    if fixed_tail:
+        body, tail = body[:-1], body[-1:]
+    if len(body) < 4:
+        return None
+    a, b, c = sorted(rng.choice(np.arange(1, len(body)), size=3, replace=False).tolist())
+    return head + body[:a] + body[b:c] + body[a:b] + body[c:] + tail
+
+
+def optimize_order(cost, budget_ms=OPTIMIZE_BUDGET_MS, return_to_start=False, fix_end=False, seed=0):
+    """
+    Order for visiting every row of `cost` starting at 0 -> (order, cost).
+    return_to_start closes the tour back to stop 0; fix_end keeps the last stop last (not both).
+    """
+    if return_to_start and fix_end:
+        raise ValueError("return_to_start and fix_end cannot be combined")
+    cost = np.asarray(cost, dtype=np.float64)
+    n = len(cost)
+    if n <= 2:
+        order = list(range(n))
+        return order, tour_cost(order + ([0] if return_to_start else []), cost) if n else 0.0
+    if return_to_start:
+        # a closed tour is an open path that must end at a copy of the start
+        cost = np.vstack((np.hstack((cost, cost[:, :1])), np.hstack((cost[:1], [[0.0]]))))
+        n, fix_end = n + 1, True
+    movable = n - 2 if fix_end else n - 1
+    if movable <= EXACT_MAX_MOVABLE:
+        tail = [n - 1] if fix_end else []
+        orders = ([0, *p, *tail] for p in itertools.permutations(range(1, movable + 1)))
+        best = min(orders, key=lambda order: tour_cost(order, cost))
+        best_cost = tour_cost(best, cost)
+        if return_to_start:
+            best = best[:-1]
+        return best, best_cost
+    deadline = time.monotonic() + budget_ms / 1000.0
+    rng = np.random.default_rng(seed)
+    best = local_search(nearest_neighbour(cost, fix_end), cost, fix_end, deadline)
+    best_cost = tour_cost(best, cost)
+    while time.monotonic() < deadline:
+        kicked = double_bridge(best, rng, fix_end)
+        if kicked is None:
+            break
+        candidate = local_search(kicked, cost, fix_end, deadline)
+        candidate_cost = tour_cost(candidate, cost)
+        if candidate_cost < best_cost - 1e-9:
+            best, best_cost = candidate, candidate_cost
+    if return_to_start:
+        best = best[:-1]
+    return [int(i) for i in best], best_cost
+
+
+def stop_costs(graph, lats, lngs):
+    """(cost matrix in seconds, snapped nodes or None) between stops; straight-line time without a graph."""
+    if graph is None:
+        lats, lngs = np.asarray(lats), np.asarray(lngs)
+        return haversine_m_np(lats[:, None], lngs[:, None], lats[None, :], lngs[None, :]) / FALLBACK_SPEED, None
+    nodes = graph.snap_nodes(lats, lngs)
+    cost = node_matrix(graph, nodes, nodes, 'time_s')
+    return np.where(np.isfinite(cost), cost, UNREACHABLE), nodes
+
+
+def route_geometry(graph, nodes, lats, lngs):
+    """Encoded polyline through the stops in order, following roads when a graph is available."""
+    coords = []
+    for k in range(len(lats)):
+        if k and graph is not None:
+            path = graph.path(int(nodes[k - 1]), int(nodes[k]))
+            if path:
+                coords.extend((float(graph.node_lat[p]), float(graph.node_lng[p])) for p in path)
+        coords.append((lats[k], lngs[k]))
+    return encode_polyline(coords)
+
+
+def optimize_stops(graph, stops, budget_ms=OPTIMIZE_BUDGET_MS, return_to_start=False, fix_end=False):
+    """
+    stops: [{"lat", "lng", "service_s", ...}] with the start first.
+    Returns {"order", "duration_s", "initial_duration_s", "polyline"}; durations include service time.
+    """
+    lats = [s['lat'] for s in stops]
+    lngs = [s['lng'] for s in stops]
+    cost, nodes = stop_costs(graph, lats, lngs)
+    service = np.array([s.get('service_s', 0) for s in stops], dtype=np.float64)
+    cost = cost + service[None, :]  # arriving at j includes serving j
+    initial = tour_cost(list(range(len(stops))) + ([0] if return_to_start else []), cost)
+    order, total = optimize_order(cost, budget_ms, return_to_start, fix_end)
+    if total > initial:
+        order, total = list(range(len(stops))), initial
+    path = order + ([0] if return_to_start else [])
+    # serving the start is counted once: up front, or by the closing arc back into it
+    start_service = 0.0 if return_to_start else float(service[0])
+    return {
+        "order": order,
+        "duration_s": round(total + start_service, 1),
+        "initial_duration_s": round(initial + start_service, 1),
+        "polyline": route_geometry(graph, None if nodes is None else nodes[path],
+                                   [lats[i] for i in path], [lngs[i] for i in path]),
+    }
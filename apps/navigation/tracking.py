@@ -0,0 +1,119 @@
+"""
+apps/navigation/tracking.py
+
+Read-only live tracking for web embeds and "where's my delivery" pages.
+
+A share link carries a signed token (django.core.signing) naming a driver
+and optionally one RouteAssignment, so no JWT ever appears in a URL. The
+token opens two endpoints:
+
+- GET navigation/track/<token>/ returns a JSON snapshot of the last known
+  position, presence and ETA. It has an ETag and a short public max-age, so
+  browsers and CDNs can answer repeat page loads without reaching Django.
+- GET navigation/track/<token>/stream/ is a Server-Sent Events stream
+  (consumers.TrackingStreamConsumer) that joins the driver's `driver_{id}`
+  group and forwards location, presence and end-of-delivery events.
+
+Streams hold no send queue or writer task of their own; a single
+process-wide loop writes keep-alive comments to all of them.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import weakref
+
+from django.conf import settings
+from django.core import signing
+
+from . import eta, geocoder
+from .fleet import ONLINE, fleet
+
+TRACKING_LINK_MAX_AGE = getattr(settings, 'NAVIGATION_TRACKING_LINK_MAX_AGE', 86400)
+TRACKING_SNAPSHOT_MAX_AGE = getattr(settings, 'NAVIGATION_TRACKING_SNAPSHOT_MAX_AGE', 5)
+TRACKING_KEEPALIVE_SECONDS = getattr(settings, 'NAVIGATION_TRACKING_KEEPALIVE_SECONDS', 15)
+TRACKING_RETRY_MS = 5000  # client reconnect delay announced at the start of a stream
+TOKEN_SALT = 'navigation.tracking'
+
+streams = weakref.WeakSet()
+_keepalive_task = None
+
+
+def make_token(driver_id, assignment_id=None):
+    return signing.dumps({'d': driver_id, 'a': assignment_id}, salt=TOKEN_SALT, compress=True)
+
+
+def read_token(token):
+    """-> (driver_id, assignment_id or None), or None for a bad or expired token."""
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT, max_age=TRACKING_LINK_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    return data['d'], data['a']
+
+
+def snapshot(driver_id, assignment_id=None):
+    """
+    Last known state of a tracked driver; reads the live fleet table, else the database. For a
+    finished assignment only the assignment is filled in: its link no longer shows where the driver is.
+    """
+    from .models import DriverPresence, RouteAssignment, SavedRoute
+
+    assignment = None
+    if assignment_id is not None:
+        active = RouteAssignment.objects.filter(id=assignment_id, driver_id=driver_id).values_list(
+            'is_active', flat=True).first()
+        assignment = {"id": assignment_id, "active": bool(active)}
+        if not active:
+            return {"driver_id": driver_id, "online": False, "position": None, "eta": None,
+                    "assignment": assignment}
+
+    slot = fleet.slots.get(driver_id)
+    position, online = None, False
+    if slot is not None:
+        online = bool(fleet.status[slot] == ONLINE)
+        if not math.isnan(fleet.lat[slot]):
+            position = {"lat": float(fleet.lat[slot]), "lng": float(fleet.lng[slot]), "ts": float(fleet.ts[slot])}
+    else:
+        online = DriverPresence.objects.filter(user_id=driver_id, is_online=True).exists()
+    if position is None:
+        row = SavedRoute.objects.filter(user_id=driver_id, name="Current Location").values_list(
+            'latitude', 'longitude', 'updated_at').first()
+        if row is not None:
+            position = {"lat": row[0], "lng": row[1], "ts": row[2].timestamp()}
+    if position is not None:
+        position["place"] = geocoder.describe(position["lat"], position["lng"])
+
+    trip = eta.engine.get(driver_id)
+    estimate = trip.estimate if trip and (assignment_id is None or trip.assignment_id == assignment_id) else None
+    return {"driver_id": driver_id, "online": online, "position": position, "eta": estimate,
+            "assignment": assignment}
+
+
+def etag(data):
+    return '"%s"' % hashlib.md5(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def frame(event, data):
+    """One Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'), default=str)}\n\n".encode()
+
+
+async def keepalive_loop():
+    """Write an SSE comment to every open stream so proxies keep idle connections."""
+    while True:
+        await asyncio.sleep(TRACKING_KEEPALIVE_SECONDS)
+        for stream in list(streams):
+            try:
+                await stream.send_body(b": keepalive\n\n", more_body=True)
+            except Exception as e:
+                print(f"[Tracking] Keepalive failed: {type(e).__name__}: {e}")
+                streams.discard(stream)
+
+
+def ensure_keepalive_loop():
+    """Start the keep-alive loop once per process (called when a stream opens)."""
+    global _keepalive_task
+    if _keepalive_task is None or _keepalive_task.done():
+        _keepalive_task = asyncio.get_running_loop().create_task(keepalive_loop())
+    return _keepalive_task
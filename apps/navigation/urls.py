@@ -1,7 +1,35 @@
 from django.urls import path
+from rest_framework.routers import SimpleRouter
+
+from . import views
+
+router = SimpleRouter()
+router.register('routes', views.SavedRouteViewSet, basename='saved-route')
+router.register('loads', views.OversizedLoadViewSet, basename='oversized-load')
 
-# সরল স্টাব — পরে এখানে প্রকৃত রুট যোগ করবেন
 urlpatterns = [
-    # উদাহরণ:
-    # path('route/', some_view, name='navigation-route'),
-]
+    path('presence/', views.FleetPresenceView.as_view(), name='navigation-presence'),
+    path('fleet/', views.FleetLiveView.as_view(), name='navigation-fleet'),
+    path('assignments/', views.RouteAssignmentView.as_view(), name='navigation-assignments'),
+    path('assignments/<int:assignment_id>/complete/', views.RouteAssignmentCompleteView.as_view(),
+         name='navigation-assignment-complete'),
+    path('routes/viewport/', views.SavedRouteViewportView.as_view(), name='navigation-route-viewport'),
+    path('loads/search/', views.LoadSearchView.as_view(), name='navigation-load-search'),
+    path('loads/viewport/', views.LoadViewportView.as_view(), name='navigation-load-viewport'),
+    path('loads/<int:load_id>/escorts/', views.LoadEscortsView.as_view(), name='navigation-load-escorts'),
+    path('loads/<int:load_id>/escorts/<int:escort_id>/', views.LoadEscortDetailView.as_view(),
+         name='navigation-load-escort-detail'),
+    path('routes/<int:route_id>/stops/', views.RouteStopsView.as_view(), name='navigation-route-stops'),
+    path('routes/<int:route_id>/optimize/', views.RouteOptimizeView.as_view(), name='navigation-route-optimize'),
+    path('history/export/', views.HistoryExportView.as_view(), name='navigation-history-export'),
+    path('history/backfill/', views.HistoryBackfillView.as_view(), name='navigation-history-backfill'),
+    path('history/nearby/', views.HistoryNearbyView.as_view(), name='navigation-history-nearby'),
+    path('heatmap/', views.HeatmapView.as_view(), name='navigation-heatmap'),
+    path('teams/mileage/', views.TeamMileageView.as_view(), name='navigation-team-mileage'),
+    path('matrix/', views.TravelMatrixView.as_view(), name='navigation-matrix'),
+    path('isochrone/', views.IsochroneView.as_view(), name='navigation-isochrone'),
+    path('dispatch/', views.DispatchView.as_view(), name='navigation-dispatch'),
+    path('track/', views.TrackingLinkView.as_view(), name='navigation-tracking-link'),
+    path('track/<str:token>/', views.TrackingSnapshotView.as_view(), name='navigation-tracking-snapshot'),
+    path('live-stats/', views.LiveStatsView.as_view(), name='navigation-live-stats'),
+] + router.urls
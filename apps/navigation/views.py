@@ -67,3 +67,798 @@
 #             return Response({'detail': 'Cannot add oversized details to a route you do not own.'}, status=status.HTTP_403_FORBIDDEN)
 #         self.perform_create(serializer)
 #         return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import status, viewsets
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import corridor, escorts, geocoder, heatmap, history, outbox, presence, rollups, spatial_index, tracking
+from .backfill import BackfillError, ingest
+from .export import CONTENT_TYPES, EXTENSIONS, RENDERERS, aiterate
+from .dispatch import DISPATCH_CANDIDATES, DISPATCH_RADIUS_M, assign_jobs
+from .matrix import travel_matrix
+from .fleet import fleet
+from .isochrone import ISOCHRONE_MAX_MINUTES, isochrones
+from .models import LoadEscort, OversizedLoadDetail, RouteAssignment, RouteStop, SavedRoute
+from .pagination import OversizedLoadPagination, SavedRoutePagination
+from .roadgraph import get_road_graph
+from .tour import OPTIMIZE_BUDGET_MS, optimize_stops
+from .serializers import (
+    DispatchSerializer, LoadEscortSerializer, LoadFilterSerializer, OversizedLoadDetailSerializer,
+    OversizedLoadReviewSerializer, RouteAssignmentSerializer,
+    RouteOptimizeSerializer, RouteStopSerializer, RouteStopsSerializer, SavedRouteSerializer, TravelMatrixSerializer,
+)
+
+
+class FleetPresenceView(APIView):
+    """
+    API to get fleet online counts.
+
+    Served from the in-memory presence tracker, no table scan.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        team_id = presence.team_id_for_user(request.user.id)
+        data = presence.tracker.counts(team_id)
+        data['team_id'] = team_id
+        data['me_online'] = presence.tracker.is_online(request.user.id)
+        return Response(data, status=status.HTTP_200_OK)
+
+
+def parse_bbox(value):
+    """'min_lng,min_lat,max_lng,max_lat' -> (min_lat, min_lng, max_lat, max_lng) or None."""
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(v) for v in value.split(','))
+    except (AttributeError, ValueError):
+        return None
+    if min_lat > max_lat or min_lng > max_lng:
+        return None
+    return min_lat, min_lng, max_lat, max_lng
+
+
+class FleetLiveView(APIView):
+    """
+    API to query live driver positions from the in-memory fleet table.
+
+    Query params (all optional):
+    - bbox=min_lng,min_lat,max_lng,max_lat : drivers inside the box
+    - stale=<seconds> : drivers whose last fix is older than this
+
+    Without params returns the caller's team. Non-staff users only ever see their own team.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        team_id = None if request.user.is_staff else presence.team_id_for_user(request.user.id)
+        if team_id is None and not request.user.is_staff:
+            return Response({"drivers": []}, status=status.HTTP_200_OK)
+
+        bbox = request.query_params.get('bbox')
+        stale = request.query_params.get('stale')
+        if bbox is not None:
+            box = parse_bbox(bbox)
+            if box is None:
+                return Response({"error": "bbox must be min_lng,min_lat,max_lng,max_lat"},
+                                status=status.HTTP_400_BAD_REQUEST)
+            slots = fleet.in_bbox(*box, team_id=team_id)
+        elif stale is not None:
+            try:
+                slots = fleet.stale(float(stale))
+            except ValueError:
+                return Response({"error": "stale must be a number of seconds"}, status=status.HTTP_400_BAD_REQUEST)
+            if team_id is not None:
+                slots = slots[fleet.team[slots] == team_id]
+        elif team_id is not None:
+            slots = fleet.team_slots(team_id)
+        else:
+            slots = fleet.in_bbox(-90, -180, 90, 180)
+
+        return Response({"count": len(slots), "drivers": fleet.rows(slots)}, status=status.HTTP_200_OK)
+
+
+class LiveStatsView(APIView):
+    """
+    API to inspect live-tracking internals of this process (staff only).
+
+    Exposes outbound queue depth and drop/replace counters across connections.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            "presence": presence.tracker.counts(),
+            "send_queues": outbox.totals(),
+            "history": history.buffer.stats(),
+            "geocoder": geocoder.get_geocoder().stats() if geocoder.get_geocoder() else None,
+            "tracking_streams": len(tracking.streams),
+            "fleet": {"drivers": len(fleet), "capacity": fleet.capacity, "bytes": fleet.nbytes},
+        }, status=status.HTTP_200_OK)
+
+
+def can_manage_driver(user, driver_id):
+    """The driver themself, staff, or a member of the driver's team."""
+    if user.is_staff or user.id == driver_id:
+        return True
+    team_id = presence.team_id_for_user(driver_id)
+    return team_id is not None and team_id == presence.team_id_for_user(user.id)
+
+
+def notify_assignment_changed(driver_id):
+    """Tell the driver's live consumer to reload its route corridor."""
+    async_to_sync(get_channel_layer().group_send)(f'driver_{driver_id}', {
+        'type': 'assignment_changed',
+        'user_id': driver_id,
+    })
+
+
+class RouteAssignmentView(APIView):
+    """
+    API to list and create route assignments.
+
+    POST replaces the driver's active assignment; pings are then checked against its corridor.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        driver_id = request.query_params.get('driver_id', request.user.id)
+        try:
+            driver_id = int(driver_id)
+        except (TypeError, ValueError):
+            return Response({"error": "driver_id must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        if not can_manage_driver(request.user, driver_id):
+            return Response({"error": "Not allowed for this driver"}, status=status.HTTP_403_FORBIDDEN)
+        assignments = RouteAssignment.objects.filter(driver_id=driver_id, is_active=True)
+        return Response({"assignments": RouteAssignmentSerializer(assignments, many=True).data},
+                        status=status.HTTP_200_OK)
+
+    def post(self, request):
+        serializer = RouteAssignmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        driver = serializer.validated_data['driver']
+        if not can_manage_driver(request.user, driver.id):
+            return Response({"error": "Not allowed for this driver"}, status=status.HTTP_403_FORBIDDEN)
+        RouteAssignment.objects.filter(driver=driver, is_active=True).update(
+            is_active=False, completed_at=timezone.now()
+        )
+        assignment = serializer.save(assigned_by=request.user)
+        notify_assignment_changed(driver.id)
+        return Response(RouteAssignmentSerializer(assignment).data, status=status.HTTP_201_CREATED)
+
+
+class RouteAssignmentCompleteView(APIView):
+    """API to finish an assignment; deviation checks stop for the driver."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, assignment_id):
+        assignment = get_object_or_404(RouteAssignment, id=assignment_id, is_active=True)
+        if not can_manage_driver(request.user, assignment.driver_id):
+            return Response({"error": "Not allowed for this driver"}, status=status.HTTP_403_FORBIDDEN)
+        assignment.is_active = False
+        assignment.completed_at = timezone.now()
+        assignment.save(update_fields=['is_active', 'completed_at'])
+        notify_assignment_changed(assignment.driver_id)
+        return Response({"success": True, "id": assignment.id}, status=status.HTTP_200_OK)
+
+
+ROAD_GRAPH_MISSING = {"error": "Road graph not configured. Run manage.py build_road_graph."}
+
+
+class TravelMatrixView(APIView):
+    """
+    API to compute a many-to-many travel matrix in one request.
+
+    Body: {"origins": [[lat, lng], ...], "destinations": [...] (defaults to origins),
+           "metrics": ["duration", "distance"]}
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = TravelMatrixSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        graph = get_road_graph()
+        if graph is None:
+            return Response(ROAD_GRAPH_MISSING, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        data = serializer.validated_data
+        result = travel_matrix(graph, data['origins'], data['destinations'], sorted(data['metrics']))
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class DispatchView(APIView):
+    """
+    API to assign a batch of jobs to the nearest available drivers.
+
+    Body: {"jobs": [{"id": "...", "lat": .., "lng": ..}], "radius_m": 15000, "candidates": 8}
+    Drivers are online members of the caller's team (all drivers for staff)
+    without an active route assignment; the batch is solved optimally on travel time.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = DispatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        team_id = None if request.user.is_staff else presence.team_id_for_user(request.user.id)
+        if team_id is None and not request.user.is_staff:
+            return Response({"error": "Dispatch requires a team."}, status=status.HTTP_403_FORBIDDEN)
+        result = assign_jobs(
+            [dict(job) for job in data['jobs']],
+            graph=get_road_graph(),
+            team_id=team_id,
+            busy=set(corridor.monitor.routes),
+            radius_m=data.get('radius_m', DISPATCH_RADIUS_M),
+            k=data.get('candidates', DISPATCH_CANDIDATES),
+        )
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class IsochroneView(APIView):
+    """
+    API to get reachable-area polygons around a point.
+
+    Query params: lat, lng, minutes=15,30,60 (comma separated, up to NAVIGATION_ISOCHRONE_MAX_MINUTES).
+    Results are cached per snapped node and budget.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            lat = float(request.query_params['lat'])
+            lng = float(request.query_params['lng'])
+            minutes = [int(m) for m in request.query_params.get('minutes', '15,30,60').split(',')]
+        except (KeyError, ValueError):
+            return Response({"error": "lat and lng are required; minutes must be comma-separated integers"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return Response({"error": "lat/lng out of range"}, status=status.HTTP_400_BAD_REQUEST)
+        if not minutes or len(minutes) > 6 or any(m < 1 or m > ISOCHRONE_MAX_MINUTES for m in minutes):
+            return Response({"error": f"minutes must be 1-6 values between 1 and {ISOCHRONE_MAX_MINUTES}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        graph = get_road_graph()
+        if graph is None:
+            return Response(ROAD_GRAPH_MISSING, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response(isochrones(graph, lat, lng, minutes), status=status.HTTP_200_OK)
+
+
+class RouteStopsView(APIView):
+    """
+    API to read or replace the stops of a saved route.
+
+    PUT body: {"stops": [{"name": "..", "latitude": .., "longitude": .., "service_s": 0}, ...]}
+    List order becomes the visiting order; any stored geometry is cleared.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, route_id):
+        route = get_object_or_404(SavedRoute, id=route_id, user=request.user)
+        return Response({
+            "route_id": route.id,
+            "polyline": route.polyline,
+            "duration_s": route.duration_s,
+            "stops": RouteStopSerializer(route.stops.all(), many=True).data,
+        }, status=status.HTTP_200_OK)
+
+    def put(self, request, route_id):
+        route = get_object_or_404(SavedRoute, id=route_id, user=request.user)
+        serializer = RouteStopsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            route.stops.all().delete()
+            RouteStop.objects.bulk_create([
+                RouteStop(route=route, sequence=i, **stop)
+                for i, stop in enumerate(serializer.validated_data['stops'])
+            ])
+            route.polyline, route.duration_s = '', None
+            route.save(update_fields=['polyline', 'duration_s', 'updated_at'])
+            spatial_index.reindex(SavedRoute, [route.id])  # the box covers the stops
+        return Response({"route_id": route.id, "stops": RouteStopSerializer(route.stops.all(), many=True).data},
+                        status=status.HTTP_200_OK)
+
+
+class RouteOptimizeView(APIView):
+    """
+    API to reorder a route's stops for the least total travel time.
+
+    Body (all optional): {"budget_ms": 1000, "return_to_start": false, "fix_end": false, "apply": true}
+    The first stop stays first. With apply the new order and road geometry are saved on the route.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, route_id):
+        route = get_object_or_404(SavedRoute, id=route_id, user=request.user)
+        serializer = RouteOptimizeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        options = serializer.validated_data
+        stops = list(route.stops.all())
+        if len(stops) < 2:
+            return Response({"error": "A route needs at least two stops to optimise."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        result = optimize_stops(
+            get_road_graph(),
+            [{"lat": s.latitude, "lng": s.longitude, "service_s": s.service_s} for s in stops],
+            budget_ms=options.get('budget_ms', OPTIMIZE_BUDGET_MS),
+            return_to_start=options['return_to_start'],
+            fix_end=options['fix_end'],
+        )
+        ordered = [stops[i] for i in result['order']]
+        for sequence, stop in enumerate(ordered):
+            stop.sequence = sequence
+        if options['apply']:
+            with transaction.atomic():
+                RouteStop.objects.bulk_update(ordered, ['sequence'])
+                route.polyline, route.duration_s = result['polyline'], result['duration_s']
+                route.save(update_fields=['polyline', 'duration_s', 'updated_at'])
+        return Response({
+            "route_id": route.id,
+            "applied": options['apply'],
+            "duration_s": result['duration_s'],
+            "initial_duration_s": result['initial_duration_s'],
+            "polyline": result['polyline'],
+            "stops": RouteStopSerializer(ordered, many=True).data,
+        }, status=status.HTTP_200_OK)
+
+
+VIEWPORT_LIMIT = 500
+
+
+def viewport_filter(queryset, params):
+    """
+    Apply ?bbox=min_lng,min_lat,max_lng,max_lat or ?lat=&lng=&radius_m= through the spatial index.
+    Returns (queryset, error message).
+    """
+    if 'bbox' in params:
+        box = parse_bbox(params['bbox'])
+        if box is None:
+            return None, "bbox must be min_lng,min_lat,max_lng,max_lat"
+        return queryset.in_bbox(*box), None
+    try:
+        lat, lng, radius_m = float(params['lat']), float(params['lng']), float(params['radius_m'])
+    except (KeyError, ValueError):
+        return None, "Pass bbox=min_lng,min_lat,max_lng,max_lat or lat, lng and radius_m"
+    if radius_m <= 0 or radius_m > 500000:
+        return None, "radius_m must be between 0 and 500000"
+    return queryset.within_radius(lat, lng, radius_m), None
+
+
+class SavedRouteViewportView(APIView):
+    """API to list the caller's saved routes inside a map viewport (indexed lookup)."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        routes, error = viewport_filter(SavedRoute.objects.filter(user=request.user), request.query_params)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        rows = list(routes.values('id', 'name', 'latitude', 'longitude', 'duration_s', 'updated_at')[:VIEWPORT_LIMIT])
+        return Response({"count": len(rows), "routes": rows}, status=status.HTTP_200_OK)
+
+
+class LoadViewportView(APIView):
+    """API to list oversized loads inside a map viewport (own loads; all loads for staff)."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        loads = OversizedLoadDetail.objects.all()
+        if not request.user.is_staff:
+            loads = loads.filter(user=request.user)
+        loads, error = viewport_filter(loads, request.query_params)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        rows = list(loads.values('id', 'title', 'status', 'latitude', 'longitude', 'created_at')[:VIEWPORT_LIMIT])
+        return Response({"count": len(rows), "loads": rows}, status=status.HTTP_200_OK)
+
+
+class LoadSearchView(APIView):
+    """
+    API to filter oversized loads by status, weight and dimension ranges (own loads; all loads for staff).
+
+    Query params: status, min_/max_weight (kg), min_/max_length_m, min_/max_width_m, min_/max_height_m,
+    optional bbox or lat/lng/radius_m, limit (<= 500) and offset.
+    Served by the (status, <column>) composite indexes.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        serializer = LoadFilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        loads = OversizedLoadDetail.objects.filter(**serializer.lookups())
+        if not request.user.is_staff:
+            loads = loads.filter(user=request.user)
+        if 'bbox' in request.query_params or 'lat' in request.query_params:
+            loads, error = viewport_filter(loads, request.query_params)
+            if error:
+                return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        offset, limit = serializer.validated_data['offset'], serializer.validated_data['limit']
+        rows = list(loads.values(
+            'id', 'title', 'status', 'weight', 'length_m', 'width_m', 'height_m', 'dimension_unit',
+            'dimensions', 'latitude', 'longitude', 'created_at',
+        )[offset:offset + limit])
+        return Response({"count": len(rows), "offset": offset, "loads": rows}, status=status.HTTP_200_OK)
+
+
+class SavedRouteViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet for the caller's saved routes.
+
+    List is keyset-paginated on (updated_at, id), newest first; follow `next` for the following page.
+    """
+    serializer_class = SavedRouteSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = SavedRoutePagination
+
+    def get_queryset(self):
+        routes = SavedRoute.objects.filter(user=self.request.user)
+        if self.action == 'list':
+            routes = routes.only('id', 'user_id', 'name', 'latitude', 'longitude', 'snapped_latitude',
+                                 'snapped_longitude', 'polyline', 'duration_s', 'created_at', 'updated_at')
+        return routes
+
+
+class OversizedLoadViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet for the caller's oversized loads.
+
+    List is keyset-paginated on (created_at, id), newest first; follow `next` for the following page.
+    `status` is read-only for owners; staff can open any load and approve or reject it.
+    """
+    serializer_class = OversizedLoadDetailSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = OversizedLoadPagination
+
+    def get_serializer_class(self):
+        return OversizedLoadReviewSerializer if self.request.user.is_staff else OversizedLoadDetailSerializer
+
+    def perform_update(self, serializer):
+        previous = serializer.instance.status
+        load = serializer.save()
+        if load.status != previous:
+            escorts.monitor.invalidate()  # only approved loads are monitored
+
+    def get_queryset(self):
+        if self.request.user.is_staff and self.action != 'list':
+            return OversizedLoadDetail.objects.all()
+        loads = OversizedLoadDetail.objects.filter(user=self.request.user)
+        if self.action == 'list':
+            loads = loads.only('id', 'user_id', 'title', 'description', 'weight', 'dimensions', 'length_m', 'width_m',
+                               'height_m', 'dimension_unit', 'latitude', 'longitude', 'status',
+                               'created_at', 'updated_at')
+        return loads
+
+
+class LoadEscortsView(APIView):
+    """
+    API to list and assign the escort vehicles of one of the caller's loads.
+
+    POST body: {"escort": <user id>, "max_gap_m": 500}; the escort must be the caller or a team member.
+    Re-posting an escort reactivates it with the new gap. Gaps are checked once the load is approved.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, load_id):
+        load = get_object_or_404(OversizedLoadDetail, id=load_id, user=request.user)
+        return Response({"load_id": load.id, "escorts": LoadEscortSerializer(load.escorts.all(), many=True).data},
+                        status=status.HTTP_200_OK)
+
+    def post(self, request, load_id):
+        load = get_object_or_404(OversizedLoadDetail, id=load_id, user=request.user)
+        serializer = LoadEscortSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        escort = serializer.validated_data['escort']
+        if not can_manage_driver(request.user, escort.id):
+            return Response({"error": "Not allowed for this driver"}, status=status.HTTP_403_FORBIDDEN)
+        pair, created = LoadEscort.objects.update_or_create(
+            load=load, escort=escort,
+            defaults={"max_gap_m": serializer.validated_data.get('max_gap_m', 500), "is_active": True},
+        )
+        escorts.monitor.invalidate()
+        return Response(LoadEscortSerializer(pair).data,
+                        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+class LoadEscortDetailView(APIView):
+    """API to release an escort from a load; its gap checks stop."""
+    permission_classes = [IsAuthenticated]
+
+    def delete(self, request, load_id, escort_id):
+        pair = get_object_or_404(LoadEscort, load_id=load_id, load__user=request.user, escort_id=escort_id,
+                                 is_active=True)
+        pair.is_active = False
+        pair.save(update_fields=['is_active'])
+        escorts.monitor.invalidate()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def parse_when(value, end=False):
+    """ISO datetime or date (a bare date means the start, or with end=True the end, of that UTC day)."""
+    if not value:
+        return None
+    # dates first: parse_datetime also accepts a bare date, as midnight
+    day = parse_date(value)
+    if day is not None:
+        moment = datetime.combine(day, time.max if end else time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(value)
+    if timezone.is_naive(moment):
+        moment = moment.replace(tzinfo=dt_timezone.utc)
+    return moment
+
+
+class HistoryExportView(APIView):
+    """
+    API to stream location history as a file download.
+
+    Query params:
+    - driver_id=<id> (the caller, their team or staff) or team=<id> (own team; any team for staff)
+    - output=ndjson | geojson | gpx (default ndjson)
+    - start / end : ISO datetime or date, both optional
+    Rows are streamed from the history store (database cursor or segment files) in chunks.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        output = params.get('output', 'ndjson')
+        if output not in RENDERERS:
+            return Response({"error": f"output must be one of {', '.join(RENDERERS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start, end = parse_when(params.get('start')), parse_when(params.get('end'), end=True)
+        except ValueError:
+            return Response({"error": "start and end must be ISO dates or datetimes"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        scope = {}
+        if 'driver_id' in params:
+            try:
+                driver_id = int(params['driver_id'])
+            except ValueError:
+                return Response({"error": "driver_id must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+            if not can_manage_driver(request.user, driver_id):
+                return Response({"error": "Not allowed for this driver"}, status=status.HTTP_403_FORBIDDEN)
+            scope['driver_id'], label = driver_id, f'driver-{driver_id}'
+        elif 'team' in params:
+            own_team = presence.team_id_for_user(request.user.id)
+            try:
+                team_id = int(params['team']) if request.user.is_staff else own_team
+            except ValueError:
+                return Response({"error": "team must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+            if team_id is None:
+                return Response({"error": "You are not in a team"}, status=status.HTTP_403_FORBIDDEN)
+            scope['team_id'], label = team_id, f'team-{team_id}'
+        else:
+            return Response({"error": "Pass driver_id or team"}, status=status.HTTP_400_BAD_REQUEST)
+        rows = history.get_store().scan(start=start, end=end, **scope)
+        response = StreamingHttpResponse(aiterate(RENDERERS[output](rows)), content_type=CONTENT_TYPES[output])
+        response['Content-Disposition'] = f'attachment; filename="{label}-history.{EXTENSIONS[output]}"'
+        return response
+
+
+def advance_live_position(driver, previous_ts, latest):
+    """Move the driver's live position to the newest backfilled point if it is newer than what we had."""
+    ts, lat, lng, speed, heading = latest
+    slot = fleet.slots.get(driver.id)
+    live_ts = float(fleet.ts[slot]) if slot is not None else 0.0
+    if ts <= max(live_ts, previous_ts or 0.0):
+        return False
+    fleet.update(driver.id, lat, lng, ts, speed=speed, heading=heading)
+    SavedRoute.objects.update_or_create(user=driver, name="Current Location",
+                                        defaults={"latitude": lat, "longitude": lng})
+    async_to_sync(get_channel_layer().group_send)(f'driver_{driver.id}', {
+        'type': 'location_update',
+        'lat': lat,
+        'lng': lng,
+        'snapped': None,
+        'place': geocoder.describe(lat, lng),
+        'user_id': driver.id,
+        'email': driver.email,
+    })
+    return True
+
+
+class HistoryBackfillView(APIView):
+    """
+    API to upload positions buffered while offline.
+
+    Body: NDJSON lines {"ts", "lat", "lng", "speed"?, "heading"?}, gzip-compressed when sent with
+    Content-Encoding: gzip (or Content-Type: application/gzip). Parsed as a stream, deduplicated
+    against stored points and inserted in chunks. The live position only moves if the newest
+    uploaded point is newer than the driver's current one.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        encoding = request.headers.get('Content-Encoding', '').lower()
+        compressed = encoding == 'gzip' or request.content_type in ('application/gzip', 'application/x-gzip')
+        driver = request.user
+        previous = history.get_store().latest(driver.id)
+        team_id = presence.team_id_for_user(driver.id)
+        try:
+            with transaction.atomic():
+                stats = ingest(driver.id, team_id, request.stream, compressed=compressed)
+        except BackfillError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        latest = stats.pop('latest')
+        stats['live_position_updated'] = bool(
+            latest and advance_live_position(driver, previous.timestamp() if previous else None, latest)
+        )
+        return Response(stats, status=status.HTTP_200_OK)
+
+
+class HistoryNearbyView(APIView):
+    """
+    API to find drivers who were near a point during a time window.
+
+    Query params: lat, lng, radius_m (<= 5000), start, end (ISO datetimes, window <= NAVIGATION_HISTORY_QUERY_MAX_HOURS).
+    Answered from the (bucket, cell) index over location history. Non-staff callers only see their team.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            lat, lng = float(params['lat']), float(params['lng'])
+            radius_m = float(params.get('radius_m', 500))
+            start, end = parse_when(params['start']), parse_when(params['end'], end=True)
+            if start is None or end is None:
+                raise ValueError("empty start or end")
+        except (KeyError, ValueError):
+            return Response({"error": "lat, lng, start and end are required; radius_m is optional"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180) or not 0 < radius_m <= 5000:
+            return Response({"error": "lat/lng out of range or radius_m not in (0, 5000]"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if end <= start or (end - start).total_seconds() > history.HISTORY_QUERY_MAX_HOURS * 3600:
+            return Response({"error": f"end must be after start and within {history.HISTORY_QUERY_MAX_HOURS} hours"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        team_id = None
+        if not request.user.is_staff:
+            team_id = presence.team_id_for_user(request.user.id)
+            if team_id is None:
+                return Response({"error": "You are not in a team"}, status=status.HTTP_403_FORBIDDEN)
+        drivers = history.drivers_near(lat, lng, radius_m, start, end, team_id=team_id)
+        return Response({"count": len(drivers), "drivers": drivers}, status=status.HTTP_200_OK)
+
+
+
+class HeatmapView(APIView):
+    """
+    API for the fleet density heatmap (time drivers spent per grid cell).
+
+    Query params: bbox=min_lng,min_lat,max_lng,max_lat, start, end (window <= NAVIGATION_HEATMAP_MAX_DAYS),
+    zoom (optional map zoom; picks the grid size). Read from the hourly DwellCell counters only.
+    Non-staff callers see their team's drivers.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        box = parse_bbox(params.get('bbox'))
+        try:
+            start, end = parse_when(params['start']), parse_when(params['end'], end=True)
+            if start is None or end is None:
+                raise ValueError("empty start or end")
+            zoom = int(params['zoom']) if 'zoom' in params else None
+        except (KeyError, ValueError):
+            return Response({"error": "bbox, start and end are required; zoom must be an integer"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if box is None:
+            return Response({"error": "bbox must be min_lng,min_lat,max_lng,max_lat"}, status=status.HTTP_400_BAD_REQUEST)
+        if end <= start or (end - start).total_seconds() > heatmap.HEATMAP_MAX_DAYS * 86400:
+            return Response({"error": f"end must be after start and within {heatmap.HEATMAP_MAX_DAYS} days"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if zoom is not None and not 0 <= zoom <= 22:
+            return Response({"error": "zoom must be between 0 and 22"}, status=status.HTTP_400_BAD_REQUEST)
+        team_id = None
+        if not request.user.is_staff:
+            team_id = presence.team_id_for_user(request.user.id)
+            if team_id is None:
+                return Response({"error": "You are not in a team"}, status=status.HTTP_403_FORBIDDEN)
+        return Response(heatmap.grid(*box, start, end, zoom=zoom, team_id=team_id), status=status.HTTP_200_OK)
+
+
+class TeamMileageView(APIView):
+    """
+    API for the team dashboard: mileage and driving hours per driver and per day.
+
+    Query params: start / end (dates, default the last 30 days, at most NAVIGATION_ROLLUP_MAX_DAYS),
+    team (staff only; team owners get their own team). Read from the daily DriverDay rollups.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        from apps.subscriptions.models import Team
+
+        params = request.query_params
+        today = timezone.localdate()
+        try:
+            last_day = parse_date(params['end']) if 'end' in params else today
+            first_day = parse_date(params['start']) if 'start' in params else last_day and last_day - timedelta(days=29)
+            team_id = int(params['team']) if request.user.is_staff and 'team' in params else None
+        except ValueError:
+            return Response({"error": "start and end must be dates; team must be an integer"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if first_day is None or last_day is None or first_day > last_day \
+                or (last_day - first_day).days >= rollups.ROLLUP_MAX_DAYS:
+            return Response({"error": f"start and end must be dates at most {rollups.ROLLUP_MAX_DAYS} days apart"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if team_id is None:
+            team_id = Team.objects.filter(subscription__user=request.user).values_list('id', flat=True).first()
+            if team_id is None:
+                return Response({"error": "Only team owners can view the team dashboard"},
+                                status=status.HTTP_403_FORBIDDEN)
+        summary = rollups.team_summary(team_id, first_day, last_day)
+        return Response({"team": team_id, "start": first_day, "end": last_day, **summary}, status=status.HTTP_200_OK)
+
+
+class TrackingLinkView(APIView):
+    """
+    API to create a read-only tracking link for a driver or one of their deliveries.
+
+    Body: {"driver_id"} or {"assignment_id"}. The token is valid for NAVIGATION_TRACKING_LINK_MAX_AGE
+    seconds; a delivery link stops working once its assignment is completed.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        assignment_id = request.data.get('assignment_id')
+        try:
+            if assignment_id is not None:
+                assignment = get_object_or_404(RouteAssignment, id=int(assignment_id), is_active=True)
+                driver_id, assignment_id = assignment.driver_id, assignment.id
+            else:
+                driver_id = int(request.data.get('driver_id', request.user.id))
+        except (TypeError, ValueError):
+            return Response({"error": "driver_id and assignment_id must be integers"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not can_manage_driver(request.user, driver_id):
+            return Response({"error": "Not allowed for this driver"}, status=status.HTTP_403_FORBIDDEN)
+        token = tracking.make_token(driver_id, assignment_id)
+        snapshot_url = reverse('navigation-tracking-snapshot', args=[token])
+        return Response({
+            "token": token,
+            "snapshot": request.build_absolute_uri(snapshot_url),
+            "stream": request.build_absolute_uri(snapshot_url + 'stream/'),
+            "expires_in": tracking.TRACKING_LINK_MAX_AGE,
+        }, status=status.HTTP_201_CREATED)
+
+
+class TrackingSnapshotView(APIView):
+    """
+    Public API for the initial state of a tracking page, authorised by the share token in the URL.
+
+    Cacheable: answers with an ETag and a public max-age of NAVIGATION_TRACKING_SNAPSHOT_MAX_AGE
+    seconds, and 304 when If-None-Match still matches. Live updates come from the SSE stream.
+    A link to a finished delivery answers 410 and no longer reveals the driver's position.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request, token):
+        shared = tracking.read_token(token)
+        if shared is None:
+            return Response({"error": "Unknown or expired tracking link"}, status=status.HTTP_404_NOT_FOUND)
+        data = tracking.snapshot(*shared)
+        if data['assignment'] is not None and not data['assignment']['active']:
+            return Response({"error": "Delivery is complete"}, status=status.HTTP_410_GONE)
+        tag = tracking.etag(data)
+        if request.headers.get('If-None-Match') == tag:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data, status=status.HTTP_200_OK)
+        response['ETag'] = tag
+        response['Cache-Control'] = f'public, max-age={tracking.TRACKING_SNAPSHOT_MAX_AGE}'
+        return response
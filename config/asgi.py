@@ -6,12 +6,16 @@ from django.urls import re_path
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 django.setup()
+django_asgi_app = get_asgi_application()
 
-from apps.navigation.consumers import DriverConsumer
+from apps.navigation.consumers import DriverConsumer, TrackingStreamConsumer
 from apps.navigation.auth import JWTAuthMiddleware
 
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": URLRouter([
+        re_path(r"^navigation/track/(?P<token>[^/]+)/stream/$", TrackingStreamConsumer.as_asgi()),
+        re_path(r"", django_asgi_app),
+    ]),
     "websocket": JWTAuthMiddleware(
         URLRouter([
             re_path(r"^ws/driver/$", DriverConsumer.as_asgi()),
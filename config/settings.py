@@ -131,3 +131,56 @@ EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
+
+# Navigation / live tracking
+NAVIGATION_PRESENCE_TIMEOUT = int(os.getenv('NAVIGATION_PRESENCE_TIMEOUT', 30))  # seconds without heartbeat -> offline
+NAVIGATION_PRESENCE_TICK = 1.0  # timing-wheel resolution in seconds
+NAVIGATION_SEND_QUEUE_SIZE = 64  # max pending broadcast frames per WebSocket
+NAVIGATION_SEND_QUEUE_SATURATION_SECONDS = 10  # close viewers whose queue stays full this long
+NAVIGATION_REPORTING_STEPS = (1, 2, 3, 5, 10, 15, 30)  # allowed client reporting intervals (seconds)
+NAVIGATION_REPORTING_WATCHED_MAX = 3  # slowest interval while someone watches the driver
+NAVIGATION_REPORTING_SPACING_M = 75  # target distance between consecutive pings
+NAVIGATION_FILTER_MAX_SPEED = 70.0  # m/s, faster implied moves are rejected as GPS jumps
+NAVIGATION_FILTER_MIN_MOVE_M = 8.0  # jitter radius used when the client sends no accuracy
+NAVIGATION_ESCORT_REFRESH = 60.0  # seconds between reloads of active load/escort pairs
+NAVIGATION_CORRIDOR_M = 100  # default route corridor half-width in metres
+NAVIGATION_DEVIATION_CONFIRM_FIXES = 2  # consecutive off-corridor fixes before a deviation alert
+NAVIGATION_ROAD_GRAPH_DIR = os.getenv('NAVIGATION_ROAD_GRAPH_DIR', os.path.join(BASE_DIR, 'data', 'roadgraph'))  # build with manage.py build_road_graph
+NAVIGATION_MATCH_SIGMA_M = 10.0  # GPS noise for map matching emissions
+NAVIGATION_MATCH_RADIUS_M = 60.0  # candidate road search radius
+NAVIGATION_MATRIX_WORKERS = None  # process pool size for matrix searches (None = CPU count)
+NAVIGATION_MATRIX_CACHE_ROWS = 2048  # cached one-to-many rows (per origin node and metric)
+NAVIGATION_DISPATCH_RADIUS_M = 15000  # candidate search radius around each job
+NAVIGATION_DISPATCH_CANDIDATES = 8  # nearest free drivers considered per job
+NAVIGATION_ISOCHRONE_CACHE_SIZE = 512  # cached polygons (per origin node and time budget)
+NAVIGATION_ISOCHRONE_TOLERANCE_M = 50.0  # Douglas-Peucker tolerance for isochrone outlines
+NAVIGATION_ROUTE_MAX_STOPS = 100  # stops per multi-stop saved route
+NAVIGATION_OPTIMIZE_BUDGET_MS = 1000  # default local-search time budget for stop ordering
+NAVIGATION_HISTORY_BATCH_SIZE = 500  # buffered pings per bulk insert into the history table
+NAVIGATION_HISTORY_FLUSH_SECONDS = 2.0  # max delay before buffered pings are written
+NAVIGATION_EXPORT_CHUNK_SIZE = 2000  # rows fetched per database round trip when streaming exports
+NAVIGATION_BACKFILL_MAX_BYTES = 20 * 1024 * 1024  # decompressed size cap of one offline backfill upload
+NAVIGATION_BACKFILL_MAX_POINTS = 50000  # points per offline backfill upload
+NAVIGATION_HISTORY_BUCKET_SECONDS = 900  # time bucket of the history (bucket, cell) index; fixed once history exists
+NAVIGATION_HISTORY_CELL_DEG = 0.01  # spatial cell of the history index (~1.1 km); fixed once history exists
+NAVIGATION_HISTORY_QUERY_MAX_HOURS = 24  # longest window of a "who was near here" query
+NAVIGATION_HISTORY_RETENTION = ((7, 0), (90, 15), (None, 60))  # (max age days, resolution s) tiers; 0 = raw, None = forever
+NAVIGATION_HISTORY_STORE = 'orm'  # 'orm' (LocationPing rows) or 'segments' (binary day files, see navigation/segments.py)
+NAVIGATION_HISTORY_SEGMENT_DIR = os.path.join(BASE_DIR, 'data', 'history')  # segment store directory
+NAVIGATION_HEATMAP_LEVELS = (0.005, 0.02, 0.08, 0.32)  # heatmap grid sizes in degrees, finest first
+NAVIGATION_HEATMAP_MAX_GAP_S = 120  # longest gap between pings still counted as dwell time
+NAVIGATION_HEATMAP_MAX_CELLS = 4096  # cells per heatmap response before a coarser grid is used
+NAVIGATION_HEATMAP_MAX_DAYS = 31  # longest heatmap time window
+NAVIGATION_ROLLUP_MAX_GAP_S = 300  # longest gap between pings still counted as driving time
+NAVIGATION_ROLLUP_MOVING_MPS = 1.0  # slower implied speeds count as stopped
+NAVIGATION_ROLLUP_MAX_DAYS = 92  # longest team dashboard range
+NAVIGATION_GAZETTEER_PATH = os.path.join(BASE_DIR, 'data', 'gazetteer.csv')  # name,lat,lng[,region] CSV for reverse geocoding
+NAVIGATION_GEOCODER_CELL_DEG = 0.001  # reverse geocoding results are memoised per cell of this size
+NAVIGATION_GEOCODER_CACHE_SIZE = 65536  # memoised cells
+NAVIGATION_GEOCODER_MAX_DISTANCE_M = 30000  # no label when the nearest place is farther than this
+NAVIGATION_ETA_DEFAULT_SPEED_MPS = 8.3  # segment speed without enough history (~30 km/h)
+NAVIGATION_ETA_MIN_SAMPLES = 5  # moving pings a cell needs before its learned speed is used
+NAVIGATION_ETA_REROUTE_SECONDS = 30  # minimum time between ETA reroutes of one driver
+NAVIGATION_TRACKING_LINK_MAX_AGE = 86400  # seconds a shared tracking link stays valid
+NAVIGATION_TRACKING_SNAPSHOT_MAX_AGE = 5  # public Cache-Control max-age of tracking snapshots
+NAVIGATION_TRACKING_KEEPALIVE_SECONDS = 15  # comment written to idle SSE tracking streams